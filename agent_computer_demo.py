@@ -1,5 +1,6 @@
 # agent_computer_demo.py
 
+import sys
 import time
 
 from comms_hub_ai import extract_feature_ideas_from_chat
@@ -166,4 +167,9 @@ def main_demo():
     print("\nThank you for watching!")
 
 if __name__ == '__main__':
+    # `python agent_computer_demo.py --batch scenarios.jsonl [-o results.jsonl] [-c 32]`
+    # runs the same workflow headless over many scenarios (see batch_runner.py).
+    if len(sys.argv) > 1 and sys.argv[1] == "--batch":
+        import batch_runner
+        sys.exit(batch_runner.main(sys.argv[2:]))
     main_demo()
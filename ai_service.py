@@ -0,0 +1,361 @@
+# ai_service.py
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import llm_backend
+import scheduler
+from call_policy import LatencyTracker
+from comms_hub_ai import extract_feature_ideas_from_chat_async
+from presentation_builder_ai import generate_presentation_outline_async
+from task_manager_ai import breakdown_feature_into_tasks_async, suggest_sub_tasks_for_task_async
+
+# Long-lived local service exposing the AI functions as JSON over HTTP/1.1, on a TCP port or
+# a Unix socket. Modules, compiled templates and regexes, and the model backend stay warm
+# between requests, so a call from the Next.js front end costs a local round trip instead
+# of an interpreter start.
+#   POST /v1/extract_feature_ideas   {"chat_log": "..."}                        -> {"result": [...]}
+#   POST /v1/breakdown_feature       {"feature_idea": "..."}                    -> {"result": [...]}
+#   POST /v1/suggest_sub_tasks       {"task": "..."}                            -> {"result": [...]}
+#   POST /v1/presentation_outline    {"feature_idea": "...", "task_list": [...]} -> {"result": [...]}
+#   GET  /healthz                    liveness plus queue depth
+#   GET  /metrics                    per-endpoint counts, errors and latency percentiles
+# Connections are kept alive (HTTP/1.1 default) and may pipeline requests: each request is
+# queued as soon as it is read, and responses go back in request order. Requests are run by
+# a fixed pool of asyncio workers; when `max_queued` requests are already waiting, new ones
+# get 503 instead of piling up. Calls run as interactive scheduler work (see scheduler.py),
+# with the tenant taken from an optional X-Tenant header.
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+# Requests read ahead of the response being written, per connection.
+PIPELINE_DEPTH = 32
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+
+class HTTPError(Exception):
+    """A request the service answers with an error status instead of a result."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _text(payload: dict, field: str) -> str:
+    value = payload.get(field)
+    if not isinstance(value, str):
+        raise HTTPError(400, f"'{field}' must be a string")
+    return value
+
+async def _extract_feature_ideas(payload: dict) -> list[str]:
+    return await extract_feature_ideas_from_chat_async(_text(payload, "chat_log"))
+
+async def _breakdown_feature(payload: dict) -> list[str]:
+    return await breakdown_feature_into_tasks_async(_text(payload, "feature_idea"))
+
+async def _suggest_sub_tasks(payload: dict) -> list[str]:
+    return await suggest_sub_tasks_for_task_async(_text(payload, "task"))
+
+async def _presentation_outline(payload: dict) -> list[str]:
+    task_list = payload.get("task_list", [])
+    if not isinstance(task_list, list) or not all(isinstance(task, str) for task in task_list):
+        raise HTTPError(400, "'task_list' must be a list of strings")
+    return await generate_presentation_outline_async(_text(payload, "feature_idea"), task_list)
+
+ENDPOINTS = {
+    "/v1/extract_feature_ideas": _extract_feature_ideas,
+    "/v1/breakdown_feature": _breakdown_feature,
+    "/v1/suggest_sub_tasks": _suggest_sub_tasks,
+    "/v1/presentation_outline": _presentation_outline,
+}
+
+class _Request:
+    __slots__ = ("method", "path", "headers", "body", "keep_alive")
+
+    def __init__(self, method: str, path: str, headers: dict, body: bytes, keep_alive: bool):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+        self.keep_alive = keep_alive
+
+async def _read_request(reader: asyncio.StreamReader):
+    """Reads one request; returns None at a clean end of the connection."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if e.partial.strip():
+            raise HTTPError(400, "Incomplete request")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(413, "Request headers too large")
+    lines = head.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ")
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    if "transfer-encoding" in headers:
+        raise HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+    try:
+        length = int(headers.get("content-length", "0"))
+        if length < 0:
+            raise ValueError(length)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Request body over {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return _Request(method, target.split("?", 1)[0], headers, body, keep_alive)
+
+def _response(status: int, payload: dict, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+class _EndpointStats:
+    __slots__ = ("requests", "errors", "latencies")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.latencies = LatencyTracker()
+
+class AIService:
+    """The request handling side of the service: a worker pool plus per-endpoint metrics."""
+
+    def __init__(self, workers: int = 32, max_queued: int = 1024):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.max_queued = max_queued
+        self.started = time.time()
+        self.connections = 0
+        self.in_flight = 0
+        self.rejected = 0
+        self.stats = {path: _EndpointStats() for path in ENDPOINTS}
+        self._queue = None
+        self._worker_tasks = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def _worker(self) -> None:
+        while True:
+            handler, payload, tenant, future = await self._queue.get()
+            if future.cancelled():
+                continue
+            self.in_flight += 1
+            try:
+                with scheduler.request_context(scheduler.INTERACTIVE, tenant):
+                    result = await handler(payload)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            except BaseException as e:
+                # A CancelledError escaping a handler must not leave its request waiting forever,
+                # nor stop the worker: only cancelling the worker itself does that.
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Request handler stopped: {e!r}"))
+                if not isinstance(e, asyncio.CancelledError) or asyncio.current_task().cancelling():
+                    raise
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self.in_flight -= 1
+
+    def health(self) -> dict:
+        return {"status": "ok", "uptime_seconds": time.time() - self.started, "pid": os.getpid(),
+                "queued": self._queue.qsize() if self._queue else 0, "in_flight": self.in_flight}
+
+    def metrics(self) -> dict:
+        endpoints = {}
+        for path, stats in self.stats.items():
+            endpoints[path] = {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "p50_seconds": stats.latencies.percentile(0.50),
+                "p99_seconds": stats.latencies.percentile(0.99),
+            }
+        return {**self.health(), "connections": self.connections, "rejected": self.rejected,
+                "workers": self.workers, "endpoints": endpoints}
+
+    async def handle(self, request: _Request) -> tuple:
+        """Returns (status, payload) for one request."""
+        if request.path in ("/healthz", "/metrics"):
+            if request.method != "GET":
+                raise HTTPError(405, "Use GET")
+            return 200, self.health() if request.path == "/healthz" else self.metrics()
+        handler = ENDPOINTS.get(request.path)
+        if handler is None:
+            raise HTTPError(404, f"No endpoint {request.path}")
+        if request.method != "POST":
+            raise HTTPError(405, "Use POST")
+        stats = self.stats[request.path]
+        stats.requests += 1
+        started = time.perf_counter()
+        try:
+            try:
+                payload = json.loads(request.body or b"{}")
+            except ValueError as e:
+                raise HTTPError(400, f"Invalid JSON: {e}")
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "The request body must be a JSON object")
+            future = asyncio.get_running_loop().create_future()
+            try:
+                self._queue.put_nowait((handler, payload, request.headers.get("x-tenant"), future))
+            except asyncio.QueueFull:
+                self.rejected += 1
+                raise HTTPError(503, "Too many queued requests")
+            result = await future
+        except Exception:
+            stats.errors += 1
+            raise
+        stats.latencies.record(time.perf_counter() - started)
+        return 200, {"result": result}
+
+    async def _respond(self, request: _Request) -> bytes:
+        try:
+            status, payload = await self.handle(request)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            status, payload = 500, {"error": repr(e)}
+        return _response(status, payload, request.keep_alive)
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Reads pipelined requests as they arrive and writes their responses back in order."""
+        self.connections += 1
+        responses = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+
+        async def write_responses():
+            while True:
+                response = await responses.get()
+                if response is None:
+                    return
+                writer.write(response if isinstance(response, bytes) else await response)
+                if responses.empty():
+                    await writer.drain()
+
+        async def queue_response(response) -> None:
+            """Waits for room in the pipeline, or raises the writer's error if it stops first."""
+            if not responses.full():
+                responses.put_nowait(response)
+                return
+            put = asyncio.ensure_future(responses.put(response))
+            try:
+                await asyncio.wait((put, writer_task), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                queued = put.done()
+                put.cancel()
+            if not queued:
+                # The writer failed (e.g. drain() raised ConnectionError), so nothing will
+                # ever take from the queue again.
+                put.cancel()
+                if isinstance(response, asyncio.Future):
+                    response.cancel()
+                await writer_task
+                raise ConnectionResetError("The response writer stopped")
+
+        writer_task = asyncio.create_task(write_responses())
+        try:
+            while not writer_task.done():
+                try:
+                    request = await _read_request(reader)
+                except HTTPError as e:
+                    await queue_response(_response(e.status, {"error": str(e)}, False))
+                    break
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # A request the parser did not anticipate still gets an answer.
+                    await queue_response(_response(500, {"error": repr(e)}, False))
+                    break
+                if request is None:
+                    break
+                await queue_response(asyncio.ensure_future(self._respond(request)))
+                if not request.keep_alive:
+                    break
+            await queue_response(None)
+            await writer_task
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer_task.cancel()
+            while not responses.empty():
+                response = responses.get_nowait()
+                if isinstance(response, asyncio.Future):
+                    response.cancel()
+            self.connections -= 1
+            writer.close()
+
+async def serve(host: str = "127.0.0.1", port: int = 8765, unix_socket: str = None, workers: int = 32,
+                max_queued: int = 1024, ready=None) -> None:
+    """
+    Runs the service until cancelled, on `unix_socket` if given, else on host:port.
+    `ready`, if given, is called with the asyncio server once it is listening.
+    """
+    service = AIService(workers, max_queued)
+    await service.start()
+    if unix_socket:
+        server = await asyncio.start_unix_server(service.serve_connection, unix_socket, limit=MAX_HEADER_BYTES)
+    else:
+        server = await asyncio.start_server(service.serve_connection, host, port, limit=MAX_HEADER_BYTES)
+    if ready is not None:
+        ready(server)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the Agent Computer AI functions as local JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port to listen on")
+    parser.add_argument("--unix-socket", default=None, help="listen on this Unix socket path instead of TCP")
+    parser.add_argument("-w", "--workers", type=int, default=32, help="requests handled at once")
+    parser.add_argument("--max-queued", type=int, default=1024, help="waiting requests before answering 503")
+    parser.add_argument("--max-model-calls", type=int, default=None, help="model calls in flight at once")
+    args = parser.parse_args(argv)
+
+    if args.max_model_calls:
+        scheduler.install(scheduler.Scheduler(max_concurrency=args.max_model_calls))
+
+    def ready(server):
+        where = args.unix_socket or f"http://{args.host}:{args.port}"
+        print(f"Serving {', '.join(ENDPOINTS)} on {where} with {args.workers} workers "
+              f"(backend: {llm_backend.get_default_backend().name})", file=sys.stderr)
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix_socket, args.workers, args.max_queued, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
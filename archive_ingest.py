@@ -0,0 +1,233 @@
+# archive_ingest.py
+
+import heapq
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from comms_hub_ai import (extract_feature_ideas_from_chat, iter_chat_lines, iter_chat_windows,
+                          merge_feature_ideas)
+
+# Multi-process ingestion of a chat archive with many channels.
+# Parsing chat lines, windowing them and building/parsing extraction prompts is CPU-bound
+# Python, so one process only ever uses one core. ingest_archive() spreads the channels over
+# a process pool instead. Channel data is never pickled to the workers:
+#   - a directory archive (one "<channel>.txt" or ".log" file of "Sender: text" lines per
+#     channel) is mmap'd by each worker straight from the page cache;
+#   - an in-memory archive ({channel: text or lines}) is copied once into a shared memory
+#     block, and workers read their channels from it by (offset, length).
+# Each task sent to a worker is just a list of channel names and byte ranges. Channels are
+# balanced over the shards by size (largest first onto the least loaded shard). Workers
+# return each channel's merged feature ideas, and the parent merges across channels.
+
+CHANNEL_SUFFIXES = (".txt", ".log")
+# Channel data is decoded this many bytes (cut at a line end) at a time, not as one string.
+LINE_CHUNK_BYTES = 1024 * 1024
+
+class ChannelResult:
+    """Feature ideas and ingestion counts for one channel."""
+
+    __slots__ = ("channel", "ideas", "messages", "windows", "prompt_chars")
+
+    def __init__(self, channel: str, ideas: list[str], messages: int, windows: int, prompt_chars: int):
+        self.channel = channel
+        self.ideas = ideas
+        self.messages = messages
+        self.windows = windows
+        self.prompt_chars = prompt_chars
+
+    def __repr__(self):
+        return f"ChannelResult({self.channel!r}, ideas={len(self.ideas)}, messages={self.messages}, windows={self.windows})"
+
+class ArchiveResult:
+    """Per-channel results plus the ideas merged across every channel."""
+
+    def __init__(self, channels: dict[str, ChannelResult], ideas: list[str], elapsed: float, workers: int):
+        self.channels = channels
+        self.ideas = ideas
+        self.elapsed = elapsed
+        self.workers = workers
+
+    @property
+    def messages(self) -> int:
+        return sum(result.messages for result in self.channels.values())
+
+    def __repr__(self):
+        return (f"ArchiveResult(channels={len(self.channels)}, messages={self.messages}, "
+                f"ideas={len(self.ideas)}, elapsed={self.elapsed:.2f}s, workers={self.workers})")
+
+# --- Worker side ---
+
+def _iter_lines(data, chunk_bytes: int = LINE_CHUNK_BYTES):
+    """Lines of a UTF-8 buffer, copied and decoded a chunk of whole lines at a time."""
+    tail = b""
+    for start in range(0, len(data), chunk_bytes):
+        chunk = tail + data[start:start + chunk_bytes]
+        cut = chunk.rfind(b"\n") + 1
+        tail = chunk[cut:]
+        yield from str(memoryview(chunk)[:cut], "utf-8", "replace").splitlines()
+    if tail:
+        yield from str(tail, "utf-8", "replace").splitlines()
+
+def _process_channel(channel: str, data, token_budget: int, overlap_lines: int,
+                     max_ideas: int) -> ChannelResult:
+    """Parses one channel's raw bytes, extracts ideas per window and merges them."""
+    lines = iter_chat_lines(_iter_lines(data))
+    messages = 0
+    windows = 0
+    prompt_chars = 0
+    idea_lists = []
+
+    def counted(lines):
+        nonlocal messages
+        for line in lines:
+            messages += 1
+            yield line
+
+    for window in iter_chat_windows(counted(lines), token_budget, overlap_lines):
+        chat_log = "\n".join(window)
+        windows += 1
+        prompt_chars += len(chat_log)
+        idea_lists.append(extract_feature_ideas_from_chat(chat_log))
+    return ChannelResult(channel, merge_feature_ideas(idea_lists, max_ideas), messages, windows, prompt_chars)
+
+def _run_file_shard(paths: list[tuple], token_budget: int, overlap_lines: int, max_ideas: int) -> list[ChannelResult]:
+    results = []
+    for channel, path in paths:
+        with open(path, "rb") as channel_file:
+            if os.fstat(channel_file.fileno()).st_size == 0:
+                results.append(ChannelResult(channel, [], 0, 0, 0))
+                continue
+            with mmap.mmap(channel_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                results.append(_process_channel(channel, mapped, token_budget, overlap_lines, max_ideas))
+    return results
+
+def _run_shared_shard(block_name: str, ranges: list[tuple], token_budget: int, overlap_lines: int,
+                      max_ideas: int) -> list[ChannelResult]:
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        results = []
+        for channel, start, length in ranges:
+            view = block.buf[start:start + length]
+            try:
+                results.append(_process_channel(channel, view, token_budget, overlap_lines, max_ideas))
+            finally:
+                view.release()
+        return results
+    finally:
+        block.close()
+
+# --- Parent side ---
+
+def balance_shards(sizes: dict[str, int], shard_count: int) -> list[list[str]]:
+    """Splits channels into `shard_count` lists of roughly equal total size (largest first)."""
+    shards = [[] for _ in range(max(1, shard_count))]
+    loads = [(0, number) for number in range(len(shards))]  # heap of (total size, shard number)
+    for channel in sorted(sizes, key=sizes.get, reverse=True):
+        load, lightest = loads[0]
+        shards[lightest].append(channel)
+        heapq.heapreplace(loads, (load + sizes[channel], lightest))
+    return [shard for shard in shards if shard]
+
+def _directory_channels(directory: str) -> dict[str, str]:
+    """
+    Channel name -> file path. A channel is named after its file without the suffix, except
+    when several files share that name (general.txt and general.log), which then keep their
+    full file names so that neither is skipped.
+    """
+    files_by_stem = {}
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name):
+        stem, suffix = os.path.splitext(entry.name)
+        if entry.is_file() and suffix in CHANNEL_SUFFIXES:
+            files_by_stem.setdefault(stem, []).append(entry)
+    channels = {}
+    for stem, entries in files_by_stem.items():
+        if len(entries) == 1:
+            channels[stem] = entries[0].path
+        else:
+            channels.update((entry.name, entry.path) for entry in entries)
+    return channels
+
+def _encode_channel(content) -> bytes:
+    if isinstance(content, str):
+        return content.encode("utf-8")
+    return "\n".join(iter_chat_lines(content)).encode("utf-8")
+
+def ingest_archive(archive, workers: int = None, token_budget: int = 2000, overlap_lines: int = 3,
+                   max_ideas: int = None, shards_per_worker: int = 4) -> ArchiveResult:
+    """
+    Extracts feature ideas from every channel of `archive` (a directory of channel files or a
+    {channel: text or lines} dict) using `workers` processes (os.cpu_count() by default;
+    0 runs everything in this process). Returns an ArchiveResult whose `ideas` are merged
+    across channels, ranked by how many channels (and windows) raised them.
+    Workers use the default model backend of their own process.
+    """
+    started = time.perf_counter()
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    settings = (token_budget, overlap_lines, max_ideas)
+    block = None
+    if isinstance(archive, (str, os.PathLike)):
+        paths = _directory_channels(archive)
+        sizes = {channel: os.path.getsize(path) for channel, path in paths.items()}
+        shards = balance_shards(sizes, max(1, workers) * shards_per_worker)
+        jobs = [(_run_file_shard, [(channel, paths[channel]) for channel in shard]) for shard in shards]
+    else:
+        encoded = {channel: _encode_channel(content) for channel, content in archive.items()}
+        offsets = {}
+        position = 0
+        for channel, data in encoded.items():
+            offsets[channel] = (position, len(data))
+            position += len(data)
+        block = shared_memory.SharedMemory(create=True, size=max(1, position))
+        for channel, data in encoded.items():
+            start, length = offsets[channel]
+            block.buf[start:start + length] = data
+        del encoded
+        shards = balance_shards({channel: length for channel, (_, length) in offsets.items()},
+                                max(1, workers) * shards_per_worker)
+        jobs = [(_run_shared_shard, block.name, [(channel, *offsets[channel]) for channel in shard])
+                for shard in shards]
+
+    try:
+        if workers == 0:
+            shard_results = [func(*args, *settings) for func, *args in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(func, *args, *settings) for func, *args in jobs]
+                shard_results = [future.result() for future in futures]
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+
+    channels = {result.channel: result for results in shard_results for result in results}
+    channels = {channel: channels[channel] for channel in sorted(channels)}
+    ideas = merge_feature_ideas((result.ideas for result in channels.values()), max_ideas)
+    return ArchiveResult(channels, ideas, time.perf_counter() - started, workers)
+
+if __name__ == '__main__':
+    import tempfile
+
+    mock_lines = [
+        "Alice: Hey team, I was thinking about how we manage our project discussions.",
+        "Bob: Yeah, it gets messy. Sometimes important decisions get lost in the chat.",
+        "Charlie: Maybe we could have a way to tag messages? Like #decision or #actionitem.",
+        "Alice: And a calendar integration would be amazing for scheduling follow-ups!",
+    ]
+    archive = {f"channel-{number:03d}": [mock_lines[(number + i) % 4] for i in range(4000)] for number in range(64)}
+
+    in_process = ingest_archive(archive, workers=0)
+    print(f"In-process:   {in_process}")
+    pooled = ingest_archive(archive)
+    print(f"Process pool: {pooled}")
+    print(f"Same ideas: {pooled.ideas == in_process.ideas}")
+    for i, idea in enumerate(pooled.ideas, 1):
+        print(f"{i}. {idea}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for channel, lines in archive.items():
+            with open(os.path.join(directory, f"{channel}.txt"), "w", encoding="utf-8") as channel_file:
+                channel_file.write("\n".join(lines))
+        print(f"From files:   {ingest_archive(directory)}")
@@ -0,0 +1,219 @@
+# batch_runner.py
+
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import sys
+import time
+from itertools import islice
+
+import llm_backend
+import scheduler
+from pipeline import PipelineError, build_feature_planning_pipeline
+
+# Headless, non-interactive driver for the agent_computer_demo workflow.
+# Reads scenarios from a JSONL file, one per line:
+#   {"id": "channel-42", "chat_log": "Alice: ...\nBob: ..."}
+#   {"id": "idea-7", "feature_idea": "Dark mode", "tenant": "acme"}
+# runs the full planning pipeline for each with bounded concurrency, and streams one JSON
+# result per line as scenarios finish (not necessarily in input order). Scenarios are read
+# lazily, so memory is bounded by the concurrency, not by the size of the file, and in a
+# worker thread a chunk at a time, so a slow file or an idle stdin pipe never blocks the
+# event loop (and the scenarios in flight on it).
+# A summary with scenarios/sec and per-stage latency percentiles is returned at the end.
+
+STAGES = ("feature_ideas", "high_level_tasks", "sub_tasks", "presentation_outline")
+INPUTS = ("feature_idea", "chat_log")
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values (0.0 for an empty list)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def scenario_input(scenario) -> tuple:
+    """The (name, value) of a scenario's input; raises ValueError unless exactly one is a non-empty string."""
+    if not isinstance(scenario, dict):
+        raise ValueError("scenario must be a JSON object")
+    given = [(name, scenario[name]) for name in INPUTS if scenario.get(name) is not None]
+    if len(given) != 1:
+        raise ValueError("scenario needs exactly one of chat_log or feature_idea")
+    name, value = given[0]
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"{name} must be a non-empty string")
+    return name, value
+
+def read_scenarios(path: str):
+    """Yields (line_number, scenario) pairs; malformed lines yield an "error" key instead."""
+    # Standard input is read but left open for the caller.
+    opened = contextlib.nullcontext(sys.stdin) if path == "-" else open(path, encoding="utf-8")
+    with opened as scenario_file:
+        for line_number, line in enumerate(scenario_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                scenario = json.loads(line)
+                scenario_input(scenario)
+            except ValueError as e:
+                scenario = {"error": f"line {line_number}: {e}"}
+            yield line_number, scenario
+
+class BatchStats:
+    """Collects per-stage latencies and outcome counts for a batch run."""
+
+    def __init__(self):
+        self.stage_latencies: dict[str, list[float]] = {stage: [] for stage in (*STAGES, "total")}
+        self.succeeded = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, result: dict) -> None:
+        if result["status"] == "ok":
+            self.succeeded += 1
+            for stage, seconds in result["timings"].items():
+                self.stage_latencies.setdefault(stage, []).append(seconds)
+            self.stage_latencies["total"].append(result["elapsed"])
+        else:
+            self.failed += 1
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        total = self.succeeded + self.failed
+        stages = {}
+        for stage, values in self.stage_latencies.items():
+            if not values:
+                continue
+            values = sorted(values)
+            stages[stage] = {
+                "count": len(values),
+                "p50": percentile(values, 0.50),
+                "p90": percentile(values, 0.90),
+                "p99": percentile(values, 0.99),
+                "max": values[-1],
+            }
+        return {
+            "scenarios": total,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "elapsed_seconds": elapsed,
+            "scenarios_per_second": total / elapsed if elapsed > 0 else 0.0,
+            "stage_latency_seconds": stages,
+        }
+
+async def run_scenario(pipeline, line_number: int, scenario: dict) -> dict:
+    result = {"id": scenario.get("id", line_number), "line": line_number}
+    if "error" in scenario:
+        result.update(status="error", error=scenario["error"])
+        return result
+    try:
+        name, value = scenario_input(scenario)
+        # Batch work yields to interactive calls when a scheduler is installed.
+        with scheduler.request_context(scheduler.BATCH, scenario.get("tenant")):
+            run = await pipeline.run({name: value})
+    except PipelineError as e:
+        result.update(status="error", error=str(e), stage=e.node)
+        return result
+    except Exception as e:
+        # One bad scenario must not take down its worker and the rest of the batch.
+        result.update(status="error", error=f"{type(e).__name__}: {e}")
+        return result
+    result.update(
+        status="ok",
+        feature_idea=run["feature_idea"],
+        feature_ideas=run.results.get("feature_ideas"),
+        high_level_tasks=run["high_level_tasks"],
+        sub_tasks=dict(zip(run["high_level_tasks"], run["sub_tasks"])),
+        presentation_outline=run["presentation_outline"],
+        timings={stage: seconds for stage, seconds in run.durations().items() if stage in STAGES},
+        elapsed=run.elapsed,
+    )
+    return result
+
+async def run_batch(scenarios, output, concurrency: int = 16, backend: llm_backend.ModelBackend = None,
+                    stage_timeout: float = None) -> dict:
+    """
+    Runs every (line_number, scenario) pair through the planning pipeline with at most
+    `concurrency` scenarios in flight, writing one JSON line per result to `output`.
+    Returns the BatchStats summary.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    pipeline = build_feature_planning_pipeline(backend, stage_timeout)
+    stats = BatchStats()
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            result = await run_scenario(pipeline, *item)
+            stats.record(result)
+            output.write(json.dumps(result) + "\n")
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    scenarios = iter(scenarios)
+    try:
+        while True:
+            chunk = await asyncio.to_thread(list, islice(scenarios, concurrency))
+            if not chunk:
+                break
+            for item in chunk:
+                await queue.put(item)  # Blocks while the workers are saturated.
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        for task in workers:
+            task.cancel()
+    output.flush()
+    stats.finished = time.perf_counter()
+    return stats.summary()
+
+def format_summary(summary: dict) -> str:
+    lines = [
+        f"{summary['scenarios']} scenarios ({summary['succeeded']} ok, {summary['failed']} failed) "
+        f"in {summary['elapsed_seconds']:.2f}s = {summary['scenarios_per_second']:.1f} scenarios/sec",
+        f"{'stage':22s} {'p50':>9s} {'p90':>9s} {'p99':>9s} {'max':>9s}",
+    ]
+    for stage, stats in summary["stage_latency_seconds"].items():
+        lines.append(f"{stage:22s} " + " ".join(f"{stats[key] * 1000:7.1f}ms" for key in ("p50", "p90", "p99", "max")))
+    return "\n".join(lines)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run the Agent Computer planning workflow over a JSONL scenario file.")
+    parser.add_argument("scenarios", help="JSONL file of scenarios ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL results file ('-' for stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="scenarios in flight at once")
+    parser.add_argument("--stage-timeout", type=float, default=None, help="per-stage timeout in seconds")
+    parser.add_argument("--summary", default=None, help="also write the summary as JSON to this file")
+    parser.add_argument("--max-model-calls", type=int, default=None, help="model calls in flight at once")
+    parser.add_argument("--requests-per-minute", type=float, default=None, help="model call rate limit")
+    parser.add_argument("--tokens-per-minute", type=float, default=None, help="estimated token rate limit")
+    args = parser.parse_args(argv)
+
+    if args.max_model_calls or args.requests_per_minute or args.tokens_per_minute:
+        scheduler.install(scheduler.Scheduler(max_concurrency=args.max_model_calls or 8,
+                                              requests_per_minute=args.requests_per_minute,
+                                              tokens_per_minute=args.tokens_per_minute))
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        summary = asyncio.run(run_batch(read_scenarios(args.scenarios), output, args.concurrency,
+                                        stage_timeout=args.stage_timeout))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(format_summary(summary), file=sys.stderr)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as summary_file:
+            json.dump(summary, summary_file, indent=2)
+    return 0 if summary["failed"] == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+# batching.py
+
+import asyncio
+import re
+
+import llm_backend
+import prompt_builder
+from llm_backend import estimate_tokens
+
+# Batched model calls: many small inputs packed into one prompt.
+# Each item is written under a stable "[[ITEM n]]" header line, and the model is asked to
+# start each answer with the same header. pack_batches() groups items so every prompt stays
+# under a token budget, split_batch_response() cuts the response back into per-item text,
+# and run_batched()/arun_batched() parse each part with the stage's normal parser. Items
+# whose answer is missing or does not parse are retried on their own with the single-item
+# function. Identical items are sent once.
+
+ITEM_HEADER = "[[ITEM {number}]]"
+_ITEM_HEADER = re.compile(r"^[^\S\n]*\[\[ITEM (\d+)\]\][^\S\n]*$", re.MULTILINE)
+_WHITESPACE = re.compile(r"\s+")
+
+DEFAULT_MAX_ITEMS = 20
+# Room reserved per item for its answer when sizing a batch.
+RESPONSE_TOKENS_PER_ITEM = 96
+
+def _item_block(number: int, item: str) -> str:
+    return f"{ITEM_HEADER.format(number=number)}\n    {_WHITESPACE.sub(' ', item).strip()}"
+
+def render_batch_prompt(template: prompt_builder.PromptTemplate, items: list[str]) -> str:
+    """Renders `template`'s {items} slot as one header line plus one text line per item."""
+    return template.render(items="\n    ".join(_item_block(number, item) for number, item in enumerate(items, 1)))
+
+def pack_batches(items: list[str], template: prompt_builder.PromptTemplate, token_budget: int = None,
+                 max_items: int = DEFAULT_MAX_ITEMS) -> list[list[int]]:
+    """
+    Groups item indexes, in order, into batches whose prompt (plus expected answers) fits
+    `token_budget` (prompt_builder.DEFAULT_TOKEN_BUDGET by default) and holds at most
+    `max_items` items. An item too large to share a prompt gets a batch of its own.
+    """
+    token_budget = prompt_builder.DEFAULT_TOKEN_BUDGET if token_budget is None else token_budget
+    available = token_budget - template.fixed_tokens
+    batches = []
+    batch = []
+    used = 0
+    for index, item in enumerate(items):
+        cost = estimate_tokens(item) + 8 + RESPONSE_TOKENS_PER_ITEM
+        if batch and (used + cost > available or len(batch) >= max_items):
+            batches.append(batch)
+            batch = []
+            used = 0
+        batch.append(index)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def split_batch_response(response: str, count: int) -> list:
+    """
+    Splits a batched response into `count` per-item answers by their "[[ITEM n]]" headers.
+    Answers the model left out (or numbered out of range) come back as None.
+    """
+    answers = [None] * count
+    headers = list(_ITEM_HEADER.finditer(response))
+    for position, header in enumerate(headers):
+        number = int(header.group(1))
+        if not 1 <= number <= count or answers[number - 1] is not None:
+            continue
+        end = headers[position + 1].start() if position + 1 < len(headers) else len(response)
+        answers[number - 1] = response[header.end():end]
+    return answers
+
+def simulated_batch_response(single_response: str):
+    """A StubModel response callable answering every item of a batch prompt with `single_response`."""
+    def respond(prompt: str) -> str:
+        count = len(_ITEM_HEADER.findall(prompt))
+        return "\n".join(f"    {ITEM_HEADER.format(number=number)}{single_response}" for number in range(1, count + 1))
+    return respond
+
+def _plan(items: list[str], template, token_budget, max_items):
+    # Identical items are sent once; `slots` maps each distinct item back to its positions.
+    slots = {}
+    for position, item in enumerate(items):
+        slots.setdefault(item, []).append(position)
+    distinct = list(slots)
+    return distinct, slots, pack_batches(distinct, template, token_budget, max_items)
+
+def _collect(batch, answers, parse, parsed, retry) -> None:
+    for index, answer in zip(batch, answers):
+        result = parse(answer) if answer is not None else []
+        if result:
+            parsed[index] = result
+        else:
+            retry.append(index)
+
+def _spread(items, distinct, slots, parsed) -> list:
+    results = [None] * len(items)
+    for index, item in enumerate(distinct):
+        for position in slots[item]:
+            results[position] = parsed[index]
+    return results
+
+def run_batched(stage: str, items: list[str], template: prompt_builder.PromptTemplate, parse, single,
+                backend: llm_backend.ModelBackend = None, token_budget: int = None,
+                max_items: int = DEFAULT_MAX_ITEMS) -> list:
+    """
+    Runs a batched stage: packs `items` into as few prompts as fit, parses every item's
+    answer with parse(text) and falls back to single(item, backend) for items whose answer
+    is missing or empty. Returns one result per item, in input order.
+    """
+    distinct, slots, batches = _plan(items, template, token_budget, max_items)
+    parsed = [None] * len(distinct)
+    retry = []
+    for batch in batches:
+        batch_items = [distinct[index] for index in batch]
+        answers = llm_backend.run_stage(f"{stage}.batch", render_batch_prompt, (template, batch_items),
+                                        lambda response: split_batch_response(response, len(batch)), backend)
+        _collect(batch, answers, parse, parsed, retry)
+    for index in retry:
+        parsed[index] = single(distinct[index], backend)
+    return _spread(items, distinct, slots, parsed)
+
+async def arun_batched(stage: str, items: list[str], template: prompt_builder.PromptTemplate, parse, single,
+                       backend: llm_backend.ModelBackend = None, token_budget: int = None,
+                       max_items: int = DEFAULT_MAX_ITEMS) -> list:
+    """
+    Async counterpart of run_batched(); `single` is an async function. All batches are in
+    flight at once, and so are the single-item retries.
+    """
+    distinct, slots, batches = _plan(items, template, token_budget, max_items)
+    parsed = [None] * len(distinct)
+    retry = []
+
+    async def run_batch(batch):
+        batch_items = [distinct[index] for index in batch]
+        answers = await llm_backend.arun_stage(f"{stage}.batch", render_batch_prompt, (template, batch_items),
+                                               lambda response: split_batch_response(response, len(batch)), backend)
+        _collect(batch, answers, parse, parsed, retry)
+
+    tasks = [asyncio.ensure_future(run_batch(batch)) for batch in batches]
+    try:
+        await asyncio.gather(*tasks)
+        tasks = [asyncio.ensure_future(single(distinct[index], backend)) for index in retry]
+        retried = await asyncio.gather(*tasks)
+    finally:
+        # After a failure, the batches (or retries) still running are stopped and their errors retrieved.
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for index, result in zip(retry, retried):
+        parsed[index] = result
+    return _spread(items, distinct, slots, parsed)
+
+if __name__ == '__main__':
+    import time
+
+    from task_manager_ai import (BATCH_FEATURE_PROMPT_MARKER, FEATURE_PROMPT_MARKER, breakdown_feature_into_tasks,
+                                 breakdown_features_into_tasks)
+
+    features = [f"Feature idea number {i}: smarter notifications for channel {i % 7}" for i in range(200)]
+    stub = llm_backend.StubModel(latency=0.02)
+
+    started = time.perf_counter()
+    one_by_one = [breakdown_feature_into_tasks(feature, stub) for feature in features]
+    single_calls, single_seconds = stub.call_count, time.perf_counter() - started
+
+    stub.call_count = 0
+    started = time.perf_counter()
+    batched = breakdown_features_into_tasks(features, stub)
+    batch_calls, batch_seconds = stub.call_count, time.perf_counter() - started
+
+    print(f"One call per feature: {single_calls} calls in {single_seconds:.2f}s")
+    print(f"Batched:              {batch_calls} calls in {batch_seconds:.2f}s")
+    print(f"Same results: {batched == one_by_one}")
+
+    # An answer the model leaves out is retried on its own.
+    partial = llm_backend.StubModel(responses=[
+        (BATCH_FEATURE_PROMPT_MARKER, "    [[ITEM 1]]\n    1. Answered in the batch"),
+        (FEATURE_PROMPT_MARKER, "1. Retried on its own"),
+    ])
+    print(breakdown_features_into_tasks(["Dark mode", "Offline sync"], partial))
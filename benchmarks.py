@@ -0,0 +1,268 @@
+# benchmarks.py
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import time
+
+import demo_models
+import list_parser
+import llm_backend
+from comms_hub_ai import build_feature_extraction_prompt, parse_feature_ideas
+from pipeline import plan_feature
+from presentation_builder_ai import build_outline_prompt, parse_slide_titles
+from task_manager_ai import parse_feature_tasks, parse_sub_tasks
+
+# Micro and macro benchmarks for the Python hot paths:
+#   parse.*     list parsing on large synthetic model responses
+#   store.*     chat/task/slide store writes and reads at increasing record counts
+#   prompt.*    prompt construction with large inputs
+#   pipeline.*  the end-to-end planning flow against the stub model
+#
+#   python benchmarks.py                         run everything, print a table
+#   python benchmarks.py -o results.json         also write machine-readable results
+#   python benchmarks.py --save-baseline b.json  store results as the baseline
+#   python benchmarks.py --baseline b.json       compare; exits 1 if anything regressed
+#   python benchmarks.py -k store --max-records 10000000   larger store sizes
+#
+# Each case is timed `repeat` times; the median time per operation is compared
+# against the baseline, and anything slower by more than --threshold is flagged.
+
+_BENCHMARKS = []
+
+def benchmark(name: str, sizes=(None,)):
+    """Registers fn(size) -> (setup-free callable, ops per call) as a benchmark case per size."""
+    def register(fn):
+        for size in sizes:
+            _BENCHMARKS.append((name if size is None else f"{name}[{size}]", fn, size))
+        return fn
+    return register
+
+def _synthetic_response(items: int, bullet: str) -> str:
+    lines = ["Okay, here is the list you asked for:"]
+    for i in range(1, items + 1):
+        marker = f"{i}." if bullet == "numbered" else "-"
+        lines.append(f"    {marker} Synthetic item {i} describing a moderately long piece of work (Tasks: A, B)")
+    return "\n".join(lines)
+
+# --- Parsers ---
+
+PARSE_SIZES = (100, 10_000)
+
+@benchmark("parse.feature_ideas", PARSE_SIZES)
+def _(size):
+    response = _synthetic_response(size, "numbered")
+    return lambda: parse_feature_ideas(response), size
+
+@benchmark("parse.feature_tasks", PARSE_SIZES)
+def _(size):
+    response = _synthetic_response(size, "numbered")
+    return lambda: parse_feature_tasks(response), size
+
+@benchmark("parse.sub_tasks", PARSE_SIZES)
+def _(size):
+    response = _synthetic_response(size, "bulleted")
+    return lambda: parse_sub_tasks(response), size
+
+@benchmark("parse.slide_titles", PARSE_SIZES)
+def _(size):
+    response = _synthetic_response(size, "numbered")
+    return lambda: parse_slide_titles(response), size
+
+@benchmark("parse.streamed_16_char_chunks", PARSE_SIZES)
+def _(size):
+    response = _synthetic_response(size, "numbered")
+    chunks = [response[i:i + 16] for i in range(0, len(response), 16)]
+    return lambda: list(list_parser.iter_list_items(chunks)), size
+
+# --- Stores ---
+# Store sizes are filtered by --max-records at run time.
+
+STORE_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+_SENDERS = ("Alice", "Bob", "Charlie", "David")
+
+@benchmark("store.add_chat_message", STORE_SIZES)
+def _(size):
+    def run():
+        demo_models.set_chat_store(demo_models.ChatStore())
+        add = demo_models.add_chat_message
+        for i in range(size):
+            add(_SENDERS[i & 3], "Maybe we could flag messages as tasks?", 0.0)
+    return run, size
+
+@benchmark("store.get_chat_history_iterate", STORE_SIZES)
+def _(size):
+    store = demo_models.ChatStore()
+    for i in range(size):
+        store.append(_SENDERS[i & 3], "Maybe we could flag messages as tasks?", 0.0)
+
+    def run():
+        demo_models.set_chat_store(store)
+        for _ in demo_models.get_chat_history():
+            pass
+    return run, size
+
+@benchmark("store.get_chat_history_page", STORE_SIZES)
+def _(size):
+    store = demo_models.ChatStore()
+    for i in range(size):
+        store.append(_SENDERS[i & 3], "Maybe we could flag messages as tasks?", 0.0)
+
+    def run():
+        demo_models.set_chat_store(store)
+        for offset in range(0, size, max(1, size // 100)):
+            list(demo_models.get_chat_history(offset=offset, limit=50))
+    return run, 100
+
+@benchmark("store.create_project_task", STORE_SIZES)
+def _(size):
+    def run():
+        demo_models._project_tasks.clear()
+        for i in range(size):
+            demo_models.create_project_task(f"Task {i}", ["Write code", "Write tests"])
+    return run, size
+
+@benchmark("store.query_tasks_by_status", STORE_SIZES)
+def _(size):
+    def setup():
+        demo_models._project_tasks.clear()
+        for i in range(size):
+            demo_models.create_project_task(f"Task {i}", ["Write code"])
+        for i in range(0, size, 10):
+            demo_models.update_task_status(i, "In Progress")
+    setup()
+
+    def run():
+        if len(demo_models.get_project_tasks()) != size:
+            setup()
+        for _ in range(100):
+            demo_models.count_tasks_by_status("In Progress")
+            demo_models.query_tasks(status="In Progress")[:20]
+    return run, 100
+
+@benchmark("store.add_presentation_slide", STORE_SIZES)
+def _(size):
+    def run():
+        demo_models._presentation_slides.clear()
+        for i in range(size):
+            demo_models.add_presentation_slide(f"Slide {i}", ["Point A", "Point B"])
+    return run, size
+
+# --- Prompt construction ---
+
+@benchmark("prompt.outline", (10, 1_000, 100_000))
+def _(size):
+    tasks = [f"Task {i}: build and ship a moderately sized component" for i in range(size)]
+    return lambda: build_outline_prompt("AI-powered In-Chat Meeting Scheduler & Summarizer", tasks), 1
+
+@benchmark("prompt.feature_extraction", (10, 1_000, 100_000))
+def _(size):
+    chat_log = "\n".join(f"{_SENDERS[i & 3]}: message {i} about tagging and calendars" for i in range(size))
+    return lambda: build_feature_extraction_prompt(chat_log), 1
+
+# --- End-to-end ---
+
+@benchmark("pipeline.plan_feature", (1, 100))
+def _(size):
+    stub = llm_backend.StubModel()
+
+    async def run_many():
+        await asyncio.gather(*(plan_feature(chat_log=f"Alice: idea {i}", backend=stub) for i in range(size)))
+    return lambda: asyncio.run(run_many()), size
+
+# --- Runner ---
+
+def run_case(fn, size, repeat: int, min_time: float) -> dict:
+    call, ops = fn(size)
+    call()  # Warm-up (also excluded from the timings).
+    samples = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < repeat or (time.perf_counter() < deadline and len(samples) < repeat * 10):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) / ops)
+    return {
+        "ops_per_call": ops,
+        "samples": len(samples),
+        "seconds_per_op_median": statistics.median(samples),
+        "seconds_per_op_min": min(samples),
+    }
+
+def run_benchmarks(selector: str = None, max_records: int = 100_000, repeat: int = 5,
+                   min_time: float = 0.2, progress=None) -> dict:
+    results = {}
+    for name, fn, size in _BENCHMARKS:
+        if selector and selector not in name:
+            continue
+        if name.startswith("store.") and size is not None and size > max_records:
+            continue
+        results[name] = run_case(fn, size, repeat, min_time)
+        if progress:
+            progress(name, results[name])
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[tuple]:
+    """Returns (name, baseline, current, ratio) for every case slower than baseline by > threshold."""
+    regressions = []
+    for name, current in results["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        ratio = current["seconds_per_op_median"] / previous["seconds_per_op_median"]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous["seconds_per_op_median"], current["seconds_per_op_median"], ratio))
+    return regressions
+
+def _format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f}{unit}"
+    return f"{seconds / 1e-9:8.1f}ns"
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark parsers, stores, prompt building and the pipeline.")
+    parser.add_argument("-k", "--select", default=None, help="only run cases whose name contains this text")
+    parser.add_argument("--max-records", type=int, default=100_000, help="largest store size to run")
+    parser.add_argument("--repeat", type=int, default=5, help="minimum timed runs per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="keep sampling a case for at least this long")
+    parser.add_argument("-o", "--output", default=None, help="write results as JSON to this file")
+    parser.add_argument("--baseline", default=None, help="compare against this results file")
+    parser.add_argument("--save-baseline", default=None, help="write results to this file as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before flagging (0.10 = 10%%)")
+    args = parser.parse_args(argv)
+
+    def progress(name, result):
+        print(f"{name:45s} {_format_seconds(result['seconds_per_op_median'])}/op "
+              f"(min {_format_seconds(result['seconds_per_op_min'])}, {result['samples']} samples)")
+
+    results = run_benchmarks(args.select, args.max_records, args.repeat, args.min_time, progress)
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as results_file:
+                json.dump(results, results_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for name, before, after, ratio in regressions:
+                print(f"  {name:45s} {_format_seconds(before)} -> {_format_seconds(after)} ({ratio:.2f}x)")
+            return 1
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
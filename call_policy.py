@@ -0,0 +1,283 @@
+# call_policy.py
+
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+
+import llm_backend
+import tracing
+
+# Call-execution policy for model calls, aimed at tail latency.
+#   HedgingBackend  tracks recent call latencies. Its timeout adapts to them (p99 times a
+#                   factor, within bounds). Once a call has run longer than the p95 latency,
+#                   it sends one duplicate request; the first answer wins and the other is
+#                   cancelled.
+#   RetryPolicy     exponential backoff with full jitter, for llm_backend.set_retry_policy():
+#                   stages whose response parses to nothing are asked again.
+# The latency distributions below plug into llm_backend.StubModel(latency=...), which gives
+# a local stub model with realistic long-tail latency (and failure_rate=... for
+# unparseable answers), for trying policies out without a real model.
+
+class ModelCallTimeout(TimeoutError):
+    """A model call (including any hedge) did not answer within the adaptive timeout."""
+
+# --- Latency distributions for StubModel ---
+
+def constant(seconds: float):
+    return lambda: seconds
+
+def lognormal(median: float, sigma: float = 0.5, seed: int = None):
+    """Log-normal latencies around `median` seconds; larger sigma means a longer tail."""
+    rng = random.Random(seed)
+    mu = math.log(median)
+    return lambda: rng.lognormvariate(mu, sigma)
+
+def long_tail(fast: float, slow: float, slow_fraction: float = 0.05, seed: int = None):
+    """Mostly ~`fast` seconds (jittered), but `slow_fraction` of calls take ~`slow` seconds."""
+    rng = random.Random(seed)
+    return lambda: (slow if rng.random() < slow_fraction else fast) * rng.uniform(0.8, 1.2)
+
+# --- Retries ---
+
+class RetryPolicy:
+    """Up to `attempts` tries, sleeping uniform(0, min(max_delay, base_delay * 2**n)) in between."""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.05, max_delay: float = 1.0, seed: int = None):
+        if attempts < 1:
+            raise ValueError("attempts must be at least 1")
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random.Random(seed)
+
+    def delay(self, attempt: int) -> float:
+        # Full jitter spreads simultaneous retries out instead of having them collide again.
+        return self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+# --- Adaptive timeouts and hedging ---
+
+class LatencyTracker:
+    """Sliding window of the most recent call latencies."""
+
+    def __init__(self, window: int = 512):
+        self._samples = deque(maxlen=window)
+        self._sorted = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self._sorted = None
+
+    def percentile(self, fraction: float) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            if self._sorted is None:
+                self._sorted = sorted(self._samples)
+            rank = max(1, math.ceil(fraction * len(self._sorted)))
+            return self._sorted[rank - 1]
+
+class HedgingBackend(llm_backend.ModelBackend):
+    """
+    Wraps a backend with an adaptive timeout and hedged requests. Until `min_samples`
+    latencies have been seen, calls use `initial_timeout` and are not hedged.
+    Streams are passed through unchanged.
+    """
+
+    def __init__(self, backend: llm_backend.ModelBackend, hedge_percentile: float = 0.95,
+                 timeout_percentile: float = 0.99, timeout_factor: float = 3.0, initial_timeout: float = 60.0,
+                 min_timeout: float = 1.0, max_timeout: float = 120.0, min_samples: int = 20,
+                 hedge: bool = True, window: int = 512):
+        self.backend = backend
+        self.name = backend.name
+        self.hedge_percentile = hedge_percentile
+        self.timeout_percentile = timeout_percentile
+        self.timeout_factor = timeout_factor
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.latencies = LatencyTracker(window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def timeout(self) -> float:
+        if len(self.latencies) < self.min_samples:
+            return self.initial_timeout
+        adaptive = self.latencies.percentile(self.timeout_percentile) * self.timeout_factor
+        return min(self.max_timeout, max(self.min_timeout, adaptive))
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging, or None while hedging is off or still warming up."""
+        if not self.hedge or len(self.latencies) < self.min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+
+    def _won(self, is_hedge: bool, latency: float) -> None:
+        self.latencies.record(latency)
+        if is_hedge:
+            self.hedge_wins += 1
+
+    def _timed_out(self, timeout: float) -> ModelCallTimeout:
+        self.timeouts += 1
+        # The timeout is a lower bound on this call's latency; recording it lets the
+        # timeout grow when the backend slows down instead of timing out forever.
+        self.latencies.record(timeout)
+        return ModelCallTimeout(f"Model call timed out after {timeout:.2f}s")
+
+    async def agenerate(self, prompt: str) -> str:
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout()
+        hedge_delay = self.hedge_delay()
+        started = loop.time()
+        deadline = started + timeout
+        attempts = {asyncio.ensure_future(self.backend.agenerate(prompt)): (False, started)}
+        pending = set(attempts)
+        error = None
+        try:
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, pending = await asyncio.wait(pending, timeout=hedge_delay)
+                if not done:
+                    self.hedged += 1
+                    tracing.current_span().set("hedged", True)
+                    hedge = asyncio.ensure_future(self.backend.agenerate(prompt))
+                    attempts[hedge] = (True, loop.time())
+                    pending.add(hedge)
+            while True:
+                for task in attempts:
+                    if task.done() and not task.cancelled() and task.exception() is None:
+                        is_hedge, task_started = attempts[task]
+                        self._won(is_hedge, loop.time() - task_started)
+                        return task.result()
+                    if task.done() and not task.cancelled():
+                        error = task.exception()
+                if not pending:
+                    raise error
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise self._timed_out(timeout)
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise self._timed_out(timeout)
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedged-call")
+            return self._executor
+
+    def generate(self, prompt: str) -> str:
+        # Threads cannot be cancelled: a losing attempt finishes in the background and is ignored.
+        self.calls += 1
+        pool = self._pool()
+        timeout = self.timeout()
+        hedge_delay = self.hedge_delay()
+        started = time.monotonic()
+        deadline = started + timeout
+        attempts = {pool.submit(self.backend.generate, prompt): (False, started)}
+        pending = set(attempts)
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, pending = wait_futures(pending, timeout=hedge_delay)
+            if not done:
+                self.hedged += 1
+                tracing.current_span().set("hedged", True)
+                hedge = pool.submit(self.backend.generate, prompt)
+                attempts[hedge] = (True, time.monotonic())
+                pending.add(hedge)
+        error = None
+        while True:
+            for future in attempts:
+                if future.done() and future.exception() is None:
+                    is_hedge, future_started = attempts[future]
+                    self._won(is_hedge, time.monotonic() - future_started)
+                    return future.result()
+                if future.done():
+                    error = future.exception()
+            if not pending:
+                raise error
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise self._timed_out(timeout)
+            done, pending = wait_futures(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                raise self._timed_out(timeout)
+
+    def stream(self, prompt: str):
+        return self.backend.stream(prompt)
+
+    def astream(self, prompt: str):
+        return self.backend.astream(prompt)
+
+    def discard(self, prompt: str) -> None:
+        self.backend.discard(prompt)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "timeouts": self.timeouts,
+            "p50": self.latencies.percentile(0.50),
+            "p95": self.latencies.percentile(0.95),
+            "p99": self.latencies.percentile(0.99),
+            "timeout": self.timeout(),
+        }
+
+if __name__ == '__main__':
+    from batch_runner import percentile
+    from task_manager_ai import breakdown_feature_into_tasks_async
+
+    async def measure(backend, calls: int = 400, concurrency: int = 20) -> list[float]:
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(i):
+            async with semaphore:
+                started = time.perf_counter()
+                await backend.agenerate(f"Prompt {i}")
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        return sorted(latencies)
+
+    async def demo():
+        # 5% of calls take ~0.5s instead of ~0.02s.
+        plain = await measure(llm_backend.StubModel(latency=long_tail(0.02, 0.5, 0.05, seed=1)))
+        hedging = HedgingBackend(llm_backend.StubModel(latency=long_tail(0.02, 0.5, 0.05, seed=1)))
+        hedged = await measure(hedging)
+        for label, latencies in (("No hedging", plain), ("Hedged", hedged)):
+            print(f"{label:11s} p50={percentile(latencies, 0.5) * 1000:6.1f}ms "
+                  f"p99={percentile(latencies, 0.99) * 1000:6.1f}ms max={latencies[-1] * 1000:6.1f}ms")
+        stats = hedging.stats()
+        print(f"Hedged {stats['hedged']} of {stats['calls']} calls ({stats['hedge_wins']} hedges won); "
+              f"adaptive timeout now {stats['timeout'] * 1000:.0f}ms")
+
+        # A third of the answers are unusable; with retries every breakdown still succeeds.
+        flaky = llm_backend.StubModel(failure_rate=0.3, seed=2)
+        without = [await breakdown_feature_into_tasks_async(f"Idea {i}", flaky) for i in range(100)]
+        llm_backend.set_retry_policy(RetryPolicy(attempts=4, base_delay=0.001, seed=3))
+        with_retry = [await breakdown_feature_into_tasks_async(f"Idea {i}", flaky) for i in range(100)]
+        llm_backend.set_retry_policy(None)
+        print(f"Empty results with a 30% failure rate: {sum(not tasks for tasks in without)}/100 without retries, "
+              f"{sum(not tasks for tasks in with_retry)}/100 with up to 4 attempts")
+
+    asyncio.run(demo())
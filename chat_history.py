@@ -0,0 +1,255 @@
+# chat_history.py
+
+import time
+from collections import Counter
+
+import demo_models
+from demo_models import ChatMessage, RecordView
+from prompt_builder import topic_words
+
+# Memory-bounded chat history for long-lived channels.
+# A BoundedChatStore keeps only the most recent `capacity` messages of a channel in a ring.
+# When the ring is full, the oldest `compact_every` messages are evicted in one go and
+# folded into a rolling ChatSummary: message count, time range, most active senders and
+# frequent topics, with both tallies capped. Memory and the size of the prompt built by
+# chat_log() (summary line plus recent messages) therefore stay constant however long a
+# channel runs. A `summarize(previous_text, evicted_lines)` callable can add free-text
+# summaries on top (e.g. a model call per compaction).
+#
+# BoundedChatStore implements the demo_models chat store interface, so
+# demo_models.set_chat_store(BoundedChatStore(...)) bounds the default history. Record
+# indexes (and len()) are positions among the retained messages and shift when old messages
+# are evicted; `first_index` counts the evicted messages, so first_index + position is an
+# absolute index that never shifts. Consumers of the default history handle this as follows:
+# - comms_hub_ai.IncrementalFeatureExtractor keeps its offset as an absolute index and skips
+#   messages evicted before it read them (they are in the summary);
+# - demo_models.add_chat_messages_encoded() (and so chat_ingest's IngestStats) returns
+#   absolute indexes;
+# - chat_search.ChatSearchIndex is rebuilt from the retained messages after each eviction,
+#   so its hits are positions in the store as it is now.
+# ChannelHistories keeps one bounded store per channel.
+
+# Tallies are pruned back to this many entries once they grow to twice that.
+MAX_SENDERS = 64
+MAX_TOPICS = 256
+
+def _prune(counts: Counter, limit: int) -> int:
+    """Keeps the `limit` largest counts and returns the total of the dropped ones."""
+    if len(counts) < 2 * limit:
+        return 0
+    kept = dict(counts.most_common(limit))
+    dropped = sum(counts.values()) - sum(kept.values())
+    counts.clear()
+    counts.update(kept)
+    return dropped
+
+def _format_time(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d %H:%M UTC", time.gmtime(timestamp))
+
+class ChatSummary:
+    """Rolling summary of evicted messages, of bounded size."""
+
+    __slots__ = ("messages", "first_timestamp", "last_timestamp", "senders", "other_sender_messages",
+                 "topics", "text")
+
+    def __init__(self):
+        self.messages = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.senders = Counter()
+        self.other_sender_messages = 0  # messages from senders pruned out of `senders`
+        self.topics = Counter()
+        self.text = ""
+
+    def fold(self, messages) -> None:
+        """Adds (sender, text, timestamp) tuples to the summary."""
+        for sender, text, timestamp in messages:
+            self.messages += 1
+            if timestamp:
+                if self.first_timestamp is None:
+                    self.first_timestamp = timestamp
+                self.last_timestamp = timestamp
+            self.senders[sender] += 1
+            self.topics.update(topic_words(text))
+        self.other_sender_messages += _prune(self.senders, MAX_SENDERS)
+        _prune(self.topics, MAX_TOPICS)
+
+    def render(self, max_senders: int = 5, max_topics: int = 8) -> str:
+        """One summary line, or "" if nothing has been evicted yet."""
+        if not self.messages:
+            return ""
+        note = f"[Summary of {self.messages} earlier messages"
+        if self.first_timestamp is not None:
+            note += f", {_format_time(self.first_timestamp)} to {_format_time(self.last_timestamp)}"
+        active = self.senders.most_common(max_senders)
+        note += "; most active: " + ", ".join(f"{sender} ({count})" for sender, count in active)
+        if len(self.senders) > len(active) or self.other_sender_messages:
+            note += " and others"
+        if self.topics:
+            note += f"; frequent topics: {', '.join(word for word, _ in self.topics.most_common(max_topics))}"
+        return note + "]"
+
+    def __repr__(self):
+        return f"ChatSummary(messages={self.messages}, senders={len(self.senders)}, topics={len(self.topics)})"
+
+class BoundedChatStore:
+    """
+    Chat store holding the `capacity` most recent messages plus a rolling summary of the rest.
+    Compaction evicts `compact_every` messages at once (a quarter of the capacity by default).
+    """
+
+    def __init__(self, capacity: int = 1000, compact_every: int = None, summarize=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        compact_every = max(1, capacity // 4) if compact_every is None else compact_every
+        if not 1 <= compact_every <= capacity:
+            raise ValueError("compact_every must be between 1 and capacity")
+        self.capacity = capacity
+        self.compact_every = compact_every
+        self.summarize = summarize
+        self._ring: list = [None] * capacity  # (sender, text, timestamp) tuples
+        self._start = 0
+        self._count = 0
+        self._senders: dict[str, str] = {}  # one shared string object per sender
+        self.summary = ChatSummary()
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def evicted(self) -> int:
+        """How many messages have been folded into the summary so far."""
+        return self.summary.messages
+
+    @property
+    def first_index(self) -> int:
+        """Absolute index of the oldest retained message (position 0)."""
+        return self.summary.messages
+
+    def append(self, sender: str, text: str, timestamp: float = 0.0) -> int:
+        """Appends a message, compacting first if the ring is full, and returns its index."""
+        if self._count == self.capacity:
+            self._compact()
+        sender = self._senders.setdefault(sender, sender)
+        self._ring[(self._start + self._count) % self.capacity] = (sender, text, timestamp)
+        self._count += 1
+        return self._count - 1
+
+    def _compact(self) -> None:
+        evicted = [self._row(index) for index in range(self.compact_every)]
+        for index in range(self.compact_every):
+            self._ring[(self._start + index) % self.capacity] = None
+        self._start = (self._start + self.compact_every) % self.capacity
+        self._count -= self.compact_every
+        self.summary.fold(evicted)
+        if self.summarize is not None:
+            self.summary.text = self.summarize(self.summary.text, [f"{sender}: {text}" for sender, text, _ in evicted])
+        if len(self._senders) > 2 * MAX_SENDERS:
+            self._senders = {sender: sender for sender, _, _ in map(self._row, range(self._count))}
+
+    def _row(self, index: int) -> tuple:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("chat history index out of range")
+        return self._ring[(self._start + index) % self.capacity]
+
+    def sender(self, index: int) -> str:
+        return self._row(index)[0]
+
+    def text(self, index: int) -> str:
+        return self._row(index)[1]
+
+    def timestamp(self, index: int) -> float:
+        return self._row(index)[2]
+
+    def record(self, index: int) -> ChatMessage:
+        return ChatMessage(*self._row(index))
+
+    def iter_rows(self, start: int = 0, stop: int = None):
+        """Yields (sender, text) tuples without building ChatMessage objects."""
+        stop = self._count if stop is None else min(stop, self._count)
+        for index in range(start, stop):
+            sender, text, _ = self._row(index)
+            yield sender, text
+
+    def view(self, offset: int = 0, limit: int = None) -> RecordView:
+        return RecordView(self, demo_models._page(self._count, offset, limit, False))
+
+    def chat_log(self) -> str:
+        """The summary line (and any free-text summary) followed by the retained messages."""
+        lines = [line for line in (self.summary.render(), self.summary.text) if line]
+        lines.extend(f"{sender}: {text}" for sender, text in self.iter_rows())
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        self._ring = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self._senders = {}
+        self.summary = ChatSummary()
+
+class ChannelHistories:
+    """One BoundedChatStore per channel, created on first use with shared settings."""
+
+    def __init__(self, capacity: int = 1000, compact_every: int = None, summarize=None):
+        self.capacity = capacity
+        self.compact_every = compact_every
+        self.summarize = summarize
+        self._channels: dict[str, BoundedChatStore] = {}
+
+    def __len__(self):
+        return len(self._channels)
+
+    def __contains__(self, channel: str):
+        return channel in self._channels
+
+    def channel(self, channel: str) -> BoundedChatStore:
+        store = self._channels.get(channel)
+        if store is None:
+            store = self._channels[channel] = BoundedChatStore(self.capacity, self.compact_every, self.summarize)
+        return store
+
+    def channels(self) -> list[str]:
+        return list(self._channels)
+
+    def add_message(self, channel: str, sender: str, text: str, timestamp: float = None) -> ChatMessage:
+        """Adds a message to a channel's history. `timestamp` defaults to the current time."""
+        message = ChatMessage(sender, text, time.time() if timestamp is None else timestamp)
+        self.channel(channel).append(message.sender, message.text, message.timestamp)
+        return message
+
+    def chat_log(self, channel: str) -> str:
+        return self.channel(channel).chat_log()
+
+if __name__ == '__main__':
+    import tracemalloc
+
+    from comms_hub_ai import build_feature_extraction_prompt, extract_feature_ideas_from_history
+
+    lines = [
+        ("Alice", "I keep losing track of action items, could we flag messages as tasks?"),
+        ("Bob", "Messages get buried. Tagging them by project would help."),
+        ("Charlie", "A calendar integration for meeting reminders would be amazing."),
+        ("David", "Notifications are too noisy, I want to customise them per channel."),
+    ]
+    histories = ChannelHistories(capacity=200)
+    tracemalloc.start()
+    added = 0
+    for count in (1_000, 10_000, 100_000):
+        for i in range(added, count):
+            for channel in ("general", "random"):
+                sender, text = lines[i % len(lines)]
+                histories.add_message(channel, sender, f"{text} (#{i})", 1_700_000_000.0 + i * 60)
+        added = count
+        general = histories.channel("general")
+        prompt = build_feature_extraction_prompt(general.chat_log())
+        print(f"{count:>7} messages per channel: {len(general)} kept, {general.evicted} summarized, "
+              f"prompt {len(prompt)} chars, traced memory {tracemalloc.get_traced_memory()[0] / 1e6:.2f} MB")
+    print(histories.channel("general").summary.render())
+
+    demo_models.set_chat_store(BoundedChatStore(capacity=50))
+    for i in range(1_000):
+        demo_models.add_chat_message(*lines[i % len(lines)])
+    print(f"Default history: {demo_models.get_chat_message_count()} messages kept; "
+          f"ideas: {extract_feature_ideas_from_history()}")
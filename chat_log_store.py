@@ -0,0 +1,301 @@
+# chat_log_store.py
+
+import bisect
+import mmap
+import os
+import struct
+from array import array
+
+import demo_models
+from demo_models import ChatMessage
+
+# Durable chat history backend for demo_models: an append-only log split into segment files,
+# read through mmap, with a per-segment offset index.
+#
+# Layout of a log directory:
+#   00000000.log  records: <f64 timestamp><u32 sender_len><u32 text_len><sender utf-8><text utf-8>
+#   00000000.idx  u64 byte offset of every record in the matching .log, in native byte order
+#   00000001.log  ...
+# A segment is sealed once it grows past `segment_bytes`. Opening a store maps the index
+# files of sealed segments and reads the active segment's index; only the active log's tail,
+# from its last indexed record on, is scanned to recover from a crash, so cold start time
+# does not depend on history size.
+# Reads slice the mapped segment directly and only decode the records that are asked for.
+# The active segment is remapped only when it has doubled in size since its last mapping;
+# records appended since then are read with pread().
+#
+# Use it via demo_models.set_chat_store(ChatLogStore(path)).
+
+_RECORD_HEADER = struct.Struct("<dII")
+_OFFSET = array("Q").itemsize
+
+class _Segment:
+    """One .log/.idx pair. Sealed segments are read-only; the last one takes appends."""
+
+    def __init__(self, log_path: str, idx_path: str):
+        self.log_path = log_path
+        self.idx_path = idx_path
+        self._log_map = None
+        self._idx_map = None
+        self._offsets = None  # memoryview (sealed, mmap-backed) or array (active)
+        self.size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def open_sealed(self) -> None:
+        self._idx_map = _map(self.idx_path)
+        self._offsets = memoryview(self._idx_map).cast("Q") if self._idx_map is not None else memoryview(b"").cast("Q")
+
+    def open_active(self) -> None:
+        offsets = array("Q")
+        with open(self.idx_path, "ab+") as idx_file:
+            idx_file.seek(0)
+            data = idx_file.read()
+        offsets.frombytes(data[:len(data) - len(data) % _OFFSET])
+        self._offsets = offsets
+        self._recover(len(data) % _OFFSET != 0)
+        self._log_file = open(self.log_path, "ab+", buffering=0)
+        self._idx_file = open(self.idx_path, "ab", buffering=0)
+
+    def _recover(self, idx_damaged: bool) -> None:
+        """
+        Repairs the tail after a crash: indexes records that were written to the log but not
+        the index, and truncates a partially written final record. Only the log from the last
+        indexed record on is read.
+        """
+        indexed = len(self._offsets)
+        with open(self.log_path, "ab+") as log_file:
+            size = log_file.seek(0, os.SEEK_END)
+            while self._offsets and self._offsets[-1] >= size:
+                self._offsets.pop()
+                idx_damaged = True
+            # The last indexed record is scanned again, since it may be incomplete.
+            base = self._offsets.pop() if self._offsets else 0
+            log_file.seek(base)
+            data = log_file.read()
+        position = 0
+        while position + _RECORD_HEADER.size <= len(data):
+            _, sender_len, text_len = _RECORD_HEADER.unpack_from(data, position)
+            end = position + _RECORD_HEADER.size + sender_len + text_len
+            if end > len(data):
+                break
+            self._offsets.append(base + position)
+            position = end
+        if position != len(data):
+            os.truncate(self.log_path, base + position)
+        if idx_damaged or len(self._offsets) != indexed:
+            with open(self.idx_path, "wb") as idx_file:
+                self._offsets.tofile(idx_file)
+        self.size = base + position
+
+    def append(self, sender: bytes, text: bytes, timestamp: float) -> None:
+        offset = self.size
+        record = _RECORD_HEADER.pack(timestamp, len(sender), len(text)) + sender + text
+        self._log_file.write(record)
+        self._idx_file.write(struct.pack("Q", offset))
+        self._offsets.append(offset)
+        self.size += len(record)
+
+    def sync(self) -> None:
+        os.fsync(self._log_file.fileno())
+        os.fsync(self._idx_file.fileno())
+
+    def seal(self) -> None:
+        self._log_file.close()
+        self._idx_file.close()
+        self._close_maps()
+        self.open_sealed()
+
+    def _mapped(self, end: int):
+        """
+        The log mapping, if it covers bytes up to `end`. The active segment keeps growing, so
+        it is remapped only once it has doubled since the last mapping; records appended in
+        between are read with pread() (None is returned for them).
+        """
+        if self._log_map is None or len(self._log_map) < end:
+            if self._log_map is not None and self.size < 2 * len(self._log_map):
+                return None
+            self._close_log_map()
+            self._log_map = _map(self.log_path)
+        return self._log_map
+
+    def _record(self, local_index: int) -> tuple:
+        """(buffer, start) holding one whole record: the mapped log, or the record read on its own."""
+        start = self._offsets[local_index]
+        end = self._offsets[local_index + 1] if local_index + 1 < len(self._offsets) else self.size
+        log_map = self._mapped(end)
+        if log_map is None:
+            return os.pread(self._log_file.fileno(), end - start, start), 0
+        return log_map, start
+
+    def raw(self, local_index: int) -> tuple:
+        """Returns (sender, text) as memoryviews into the mapped log (or a copy of a new record)."""
+        buffer, start = self._record(local_index)
+        _, sender_len, text_len = _RECORD_HEADER.unpack_from(buffer, start)
+        view = memoryview(buffer)
+        sender_start = start + _RECORD_HEADER.size
+        text_start = sender_start + sender_len
+        return view[sender_start:text_start], view[text_start:text_start + text_len]
+
+    def timestamp(self, local_index: int) -> float:
+        return _RECORD_HEADER.unpack_from(*self._record(local_index))[0]
+
+    def _close_log_map(self) -> None:
+        if self._log_map is not None:
+            try:
+                self._log_map.close()
+            except BufferError:
+                # A caller still holds a view into the old mapping; let GC release it.
+                pass
+            self._log_map = None
+
+    def _close_maps(self) -> None:
+        self._close_log_map()
+        if self._idx_map is not None:
+            if isinstance(self._offsets, memoryview):
+                self._offsets.release()
+            try:
+                self._idx_map.close()
+            except BufferError:
+                pass
+            self._idx_map = None
+
+    def close(self) -> None:
+        if hasattr(self, "_log_file"):
+            self._log_file.close()
+            self._idx_file.close()
+        self._close_maps()
+
+def _map(path: str):
+    """Maps a file read-only; returns None for empty files, which mmap cannot map."""
+    with open(path, "rb") as mapped_file:
+        if os.fstat(mapped_file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(mapped_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+class ChatLogStore:
+    """
+    Append-only, memory-mapped chat store. Implements the same interface as
+    demo_models.ChatStore (append, __len__, record, iter_rows, clear).
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024, fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._segments: list[_Segment] = []
+        self._segment_starts: list[int] = []  # global index of each segment's first record
+        self._open()
+
+    def _segment_paths(self, number: int) -> tuple:
+        base = os.path.join(self.directory, f"{number:08d}")
+        return f"{base}.log", f"{base}.idx"
+
+    def _open(self) -> None:
+        numbers = sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                         if name.endswith(".log") and name[:-4].isdigit())
+        if not numbers:
+            numbers = [0]
+        total = 0
+        for position, number in enumerate(numbers):
+            segment = _Segment(*self._segment_paths(number))
+            if position == len(numbers) - 1:
+                segment.open_active()
+            else:
+                segment.open_sealed()
+            self._segments.append(segment)
+            self._segment_starts.append(total)
+            total += len(segment)
+        self._length = total
+
+    def __len__(self):
+        return self._length
+
+    def append(self, sender: str, text: str, timestamp: float = 0.0) -> int:
+        """Appends a message and returns its index."""
+        active = self._segments[-1]
+        if active.size >= self.segment_bytes and len(active):
+            active.seal()
+            active = _Segment(*self._segment_paths(len(self._segments)))
+            active.open_active()
+            self._segments.append(active)
+            self._segment_starts.append(self._length)
+        active.append(sender.encode("utf-8"), text.encode("utf-8"), timestamp)
+        if self.fsync:
+            active.sync()
+        self._length += 1
+        return self._length - 1
+
+    def _locate(self, index: int) -> tuple:
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("chat log index out of range")
+        segment_number = bisect.bisect_right(self._segment_starts, index) - 1
+        return self._segments[segment_number], index - self._segment_starts[segment_number]
+
+    def raw(self, index: int) -> tuple:
+        """Returns (sender, text) UTF-8 memoryviews into the log for one message."""
+        segment, local_index = self._locate(index)
+        return segment.raw(local_index)
+
+    def sender(self, index: int) -> str:
+        return str(self.raw(index)[0], "utf-8")
+
+    def text(self, index: int) -> str:
+        return str(self.raw(index)[1], "utf-8")
+
+    def timestamp(self, index: int) -> float:
+        segment, local_index = self._locate(index)
+        return segment.timestamp(local_index)
+
+    def record(self, index: int) -> ChatMessage:
+        segment, local_index = self._locate(index)
+        sender, text = segment.raw(local_index)
+        return ChatMessage(str(sender, "utf-8"), str(text, "utf-8"), segment.timestamp(local_index))
+
+    def iter_rows(self, start: int = 0, stop: int = None):
+        """Yields (sender, text) tuples without building ChatMessage objects."""
+        stop = self._length if stop is None else min(stop, self._length)
+        for index in range(start, stop):
+            sender, text = self.raw(index)
+            yield str(sender, "utf-8"), str(text, "utf-8")
+
+    def sync(self) -> None:
+        """Forces appended records to disk."""
+        self._segments[-1].sync()
+
+    def clear(self) -> None:
+        """Deletes every segment and starts an empty log."""
+        self.close()
+        for name in os.listdir(self.directory):
+            if name.endswith((".log", ".idx")) and name[:-4].isdigit():
+                os.remove(os.path.join(self.directory, name))
+        self._segments = []
+        self._segment_starts = []
+        self._open()
+
+    def close(self) -> None:
+        for segment in self._segments:
+            segment.close()
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+
+    directory = tempfile.mkdtemp()
+    store = ChatLogStore(directory, segment_bytes=1024 * 1024)
+    demo_models.set_chat_store(store)
+    for i in range(100_000):
+        demo_models.add_chat_message(("Alice", "Bob", "Charlie")[i % 3], f"Message number {i}")
+    store.close()
+
+    started = time.perf_counter()
+    reopened = ChatLogStore(directory, segment_bytes=1024 * 1024)
+    demo_models.set_chat_store(reopened)
+    print(f"Reopened {demo_models.get_chat_message_count()} messages in "
+          f"{len(reopened._segments)} segments in {time.perf_counter() - started:.4f}s")
+    print("Messages 50000-50001:", list(demo_models.get_chat_history(offset=50_000, limit=2)))
+    print("Newest first:", list(demo_models.get_chat_history(limit=2, reverse=True)))
@@ -0,0 +1,340 @@
+# chat_search.py
+
+import bisect
+import math
+import re
+from array import array
+
+import demo_models
+import llm_backend
+from comms_hub_ai import extract_feature_ideas_from_chat
+
+# Inverted full-text index over demo_models chat messages.
+# Each term maps to a compressed posting list: for every message containing the term,
+# the gap from the previous message id, the number of occurrences, and the gaps between
+# token positions, all as varints in one bytearray. Message ids are chat store indexes,
+# so postings are append-only and stay sorted. Queries are ranked with BM25; quoted
+# phrases must match exactly (consecutive positions). Sender and time filters are applied
+# from per-message columns kept alongside the postings.
+# Every SKIP_INTERVAL documents a posting list records a skip entry (doc id, byte offset),
+# so a phrase query decodes its rarest term in full and only seeks into the other terms'
+# postings for the documents still in the running.
+
+_TOKEN = re.compile(r"\w+")
+_QUERY_PART = re.compile(r'"([^"]*)"|(\S+)')
+SKIP_INTERVAL = 64
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+def _write_varint(buffer: bytearray, value: int) -> None:
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _read_varint(buffer, position: int) -> tuple:
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+class _PostingList:
+    """Compressed postings for one term: (doc gap, tf, position gaps...) varints."""
+
+    __slots__ = ("data", "last_doc", "doc_count", "skip_docs", "skip_offsets")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.last_doc = -1
+        self.doc_count = 0
+        # First doc id and byte offset of every SKIP_INTERVAL-th entry; None until the second block.
+        self.skip_docs = None
+        self.skip_offsets = None
+
+    def add(self, doc_id: int, positions: list[int]) -> None:
+        if self.doc_count and self.doc_count % SKIP_INTERVAL == 0:
+            if self.skip_docs is None:
+                self.skip_docs = array("Q")
+                self.skip_offsets = array("Q")
+            self.skip_docs.append(doc_id)
+            self.skip_offsets.append(len(self.data))
+        _write_varint(self.data, doc_id - self.last_doc - 1)
+        _write_varint(self.data, len(positions))
+        previous = 0
+        for position in positions:
+            _write_varint(self.data, position - previous)
+            previous = position
+        self.last_doc = doc_id
+        self.doc_count += 1
+
+    def decode(self, start: int = 0):
+        """Yields (doc_id, positions) in ascending doc id order, from the first doc id >= `start`."""
+        data = self.data
+        position = 0
+        doc_id = -1
+        if start > 0 and self.skip_docs is not None:
+            block = bisect.bisect_right(self.skip_docs, start) - 1
+            if block >= 0:
+                position = self.skip_offsets[block]
+                gap, _ = _read_varint(data, position)
+                doc_id = self.skip_docs[block] - gap - 1
+        while position < len(data):
+            gap, position = _read_varint(data, position)
+            doc_id += gap + 1
+            count, position = _read_varint(data, position)
+            positions = []
+            token_position = 0
+            for _ in range(count):
+                delta, position = _read_varint(data, position)
+                token_position += delta
+                positions.append(token_position)
+            if doc_id >= start:
+                yield doc_id, positions
+
+    def select(self, doc_ids: list[int]) -> dict:
+        """{doc_id: positions} for those of the ascending `doc_ids` that contain the term."""
+        if len(doc_ids) * SKIP_INTERVAL >= self.doc_count:
+            wanted = set(doc_ids)
+            return {doc_id: positions for doc_id, positions in self.decode() if doc_id in wanted}
+        found = {}
+        for wanted in doc_ids:
+            for doc_id, positions in self.decode(wanted):
+                if doc_id == wanted:
+                    found[doc_id] = positions
+                break
+        return found
+
+class SearchHit:
+    __slots__ = ("message_index", "score")
+
+    def __init__(self, message_index: int, score: float):
+        self.message_index = message_index
+        self.score = score
+
+    def __repr__(self):
+        return f"SearchHit(message_index={self.message_index}, score={self.score:.3f})"
+
+class ChatSearchIndex:
+    """
+    Incrementally maintained inverted index over the chat history.
+    Call attach() to index the existing history and follow add_chat_message from then on.
+    The index resyncs itself from the chat store when the store is cleared or replaced.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.reset()
+        self._attached = False
+
+    def reset(self) -> None:
+        """Drops everything indexed so far."""
+        self._postings: dict[str, _PostingList] = {}
+        self._doc_lengths = array("I")
+        self._doc_senders = array("I")
+        self._doc_timestamps = array("d")
+        self._sender_ids: dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._doc_lengths)
+
+    def attach(self) -> "ChatSearchIndex":
+        """Indexes messages already in the chat store, then indexes new ones as they are added."""
+        store = demo_models.get_chat_store()
+        if len(store) < len(self):
+            self.reset()
+        self._backfill(len(store))
+        if not self._attached:
+            demo_models.add_chat_listener(self.add)
+            self._attached = True
+        return self
+
+    def detach(self) -> None:
+        if self._attached:
+            demo_models.remove_chat_listener(self.add)
+            self._attached = False
+
+    def _backfill(self, stop: int) -> None:
+        store = demo_models.get_chat_store()
+        for index in range(len(self), min(stop, len(store))):
+            self._add(index, store.record(index))
+
+    def add(self, message_index: int, message) -> None:
+        """
+        Indexes the message at `message_index`. A lower index than expected means the chat
+        store was cleared or replaced (or a bounded store evicted messages), so the index
+        is rebuilt; messages skipped over are read from the store.
+        """
+        if message_index < len(self):
+            self.reset()
+        self._backfill(message_index)
+        if message_index == len(self):
+            self._add(message_index, message)
+
+    def _add(self, message_index: int, message) -> None:
+        tokens = tokenize(message.text)
+        positions_by_term: dict[str, list[int]] = {}
+        for position, token in enumerate(tokens):
+            positions_by_term.setdefault(token, []).append(position)
+        for term, positions in positions_by_term.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _PostingList()
+            postings.add(message_index, positions)
+        sender_id = self._sender_ids.setdefault(message.sender.lower(), len(self._sender_ids))
+        self._doc_lengths.append(len(tokens))
+        self._doc_senders.append(sender_id)
+        self._doc_timestamps.append(message.timestamp)
+        self._total_length += len(tokens)
+
+    def _accepts(self, doc_id: int, sender_ids, since: float, until: float) -> bool:
+        if sender_ids is not None and self._doc_senders[doc_id] not in sender_ids:
+            return False
+        timestamp = self._doc_timestamps[doc_id]
+        if since is not None and timestamp < since:
+            return False
+        if until is not None and timestamp >= until:
+            return False
+        return True
+
+    def search(self, query: str, senders=None, since: float = None, until: float = None,
+               limit: int = 20) -> list[SearchHit]:
+        """
+        Ranks messages for `query`. Bare words are scored with BM25 (any word may match);
+        "quoted phrases" must appear verbatim. `senders` limits results to those senders,
+        and `since`/`until` to timestamps in [since, until).
+        """
+        terms = []
+        phrases = []
+        for phrase, word in _QUERY_PART.findall(query):
+            if phrase:
+                phrase_terms = tokenize(phrase)
+                if phrase_terms:
+                    phrases.append(phrase_terms)
+                    terms.extend(phrase_terms)
+            else:
+                terms.extend(tokenize(word))
+        if not terms:
+            return []
+
+        sender_ids = None
+        if senders is not None:
+            if isinstance(senders, str):
+                senders = [senders]
+            sender_ids = {self._sender_ids[s.lower()] for s in senders if s.lower() in self._sender_ids}
+
+        # term -> {doc_id: positions}, decoded once per query and only as far as needed.
+        decoded = {}
+        candidates = None
+        if phrases:
+            required = {term for phrase in phrases for term in phrase}
+            if any(term not in self._postings for term in required):
+                return []  # A phrase containing an unknown term cannot match.
+            # Intersect rarest first: the rarest term is decoded in full, the others are
+            # only looked up for the documents that are still candidates.
+            required = sorted(required, key=lambda term: self._postings[term].doc_count)
+            decoded[required[0]] = {doc_id: positions for doc_id, positions in self._postings[required[0]].decode()
+                                    if self._accepts(doc_id, sender_ids, since, until)}
+            candidates = sorted(decoded[required[0]])
+            for term in required[1:]:
+                if not candidates:
+                    return []
+                decoded[term] = self._postings[term].select(candidates)
+                candidates = [doc_id for doc_id in candidates if doc_id in decoded[term]]
+            candidates = [doc_id for doc_id in candidates
+                          if all(self._phrase_at(phrase, doc_id, decoded) for phrase in phrases)]
+        for term in set(terms):
+            postings = self._postings.get(term)
+            if postings is None or term in decoded:
+                continue
+            if candidates is not None:
+                decoded[term] = postings.select(candidates)
+            else:
+                decoded[term] = {doc_id: positions for doc_id, positions in postings.decode()
+                                 if self._accepts(doc_id, sender_ids, since, until)}
+        if candidates is None:
+            candidates = set()
+            for docs in decoded.values():
+                candidates.update(docs)
+        else:
+            candidates = set(candidates)
+
+        doc_count = len(self)
+        average_length = self._total_length / doc_count if doc_count else 0.0
+        scores = {}
+        for term in set(terms):
+            docs = decoded.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (doc_count - self._postings[term].doc_count + 0.5) / (self._postings[term].doc_count + 0.5))
+            for doc_id, positions in docs.items():
+                if doc_id not in candidates:
+                    continue
+                tf = len(positions)
+                norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / (average_length or 1))
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [SearchHit(doc_id, score) for doc_id, score in ranked[:limit]]
+
+    @staticmethod
+    def _phrase_at(phrase: list[str], doc_id: int, decoded: dict) -> bool:
+        """Whether the terms of `phrase` appear at consecutive positions in the document."""
+        following = [set(decoded[term][doc_id]) for term in phrase[1:]]
+        return any(all(start + offset in positions for offset, positions in enumerate(following, 1))
+                   for start in decoded[phrase[0]][doc_id])
+
+    @property
+    def posting_bytes(self) -> int:
+        return sum(len(postings.data) for postings in self._postings.values())
+
+def search_messages(index: ChatSearchIndex, query: str, **filters) -> list:
+    """Returns the matching ChatMessage objects, best match first."""
+    store = demo_models.get_chat_store()
+    return [store.record(hit.message_index) for hit in index.search(query, **filters)]
+
+def relevant_chat_log(index: ChatSearchIndex, query: str, limit: int = 50, **filters) -> str:
+    """Builds a "Sender: text" chat log of the `limit` best matches, in chronological order."""
+    store = demo_models.get_chat_store()
+    hits = sorted(hit.message_index for hit in index.search(query, limit=limit, **filters))
+    lines = []
+    for message_index in hits:
+        message = store.record(message_index)
+        lines.append(f"{message.sender}: {message.text}")
+    return "\n".join(lines)
+
+def extract_feature_ideas_for_query(index: ChatSearchIndex, query: str, limit: int = 50,
+                                    backend: llm_backend.ModelBackend = None, **filters) -> list[str]:
+    """Runs feature extraction on only the messages relevant to `query` instead of the whole log."""
+    chat_log = relevant_chat_log(index, query, limit, **filters)
+    if not chat_log:
+        return []
+    return extract_feature_ideas_from_chat(chat_log, backend)
+
+if __name__ == '__main__':
+    mock_chat_log = [
+        ("Alice", "Hey team, I'm finding it hard to keep track of action items from our chats."),
+        ("Bob", "I agree! Messages just get buried. Maybe we could flag messages as tasks?"),
+        ("Charlie", "Or a way to categorize conversations by project? That would help too."),
+        ("Alice", "Good idea, Charlie! And what about important dates? I missed that meeting reminder yesterday."),
+        ("Bob", "Oh, a calendar view or integration would be amazing."),
+        ("David", "I also think the notifications are a bit much. Can we customize them?"),
+        ("Alice", "Yes, like only get notified for direct mentions in some chats."),
+        ("UserA", "This app is great, but I wish I could just search for old messages."),
+    ]
+    index = ChatSearchIndex().attach()
+    for sender, text in mock_chat_log:
+        demo_models.add_chat_message(sender, text)
+
+    for query, filters in [("messages", {}), ('"calendar view"', {}), ("chats", {"senders": "Alice"})]:
+        print(f"Search {query} {filters}:")
+        for message in search_messages(index, query, **filters):
+            print(f"  {message.sender}: {message.text}")
+    print("Feature ideas for 'notifications':", extract_feature_ideas_for_query(index, "notifications notified"))
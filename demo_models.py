@@ -1,67 +1,848 @@
 # demo_models.py
 
-# In-memory storage
-_chat_messages: list[dict] = []
-_project_tasks: list[dict] = []
-_presentation_slides: list[dict] = []
+import bisect
+import time
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate, islice
+
+# Records are kept in compact column stores instead of one dict per record:
+# - strings live back to back in a single UTF-8 buffer, addressed by an offsets array
+# - repeated strings (senders, statuses) are interned and stored as small integer ids
+# - lists of strings (sub-tasks, bullet points) are flattened into one string column
+# Reads return lightweight views that only build a model object for the records accessed.
+# Columns are plain buffers, so store_snapshot.py can write them out as-is and map them
+# back in; a store restored that way reads straight from the mapped file and copies its
+# columns into growable buffers on the first write.
+
+def _owned_array(typecode: str, buffer) -> array:
+    owned = array(typecode)
+    owned.frombytes(memoryview(buffer).cast("B"))
+    return owned
+
+class _StringColumn:
+    """Strings stored back to back in one UTF-8 buffer, addressed by an offsets array."""
+
+    __slots__ = ("_data", "_offsets")
+
+    def __init__(self):
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def append(self, value: str) -> None:
+        self._data += value.encode("utf-8")
+        self._offsets.append(len(self._data))
+
+    def extend_encoded(self, values: list[bytes]) -> None:
+        """Appends already UTF-8 encoded strings in one pass."""
+        self._offsets.extend(islice(accumulate(map(len, values), initial=len(self._data)), 1, None))
+        self._data += b"".join(values)
+
+    def __getitem__(self, index: int) -> str:
+        # Bulk-ingested text is stored unvalidated; invalid UTF-8 is replaced when read.
+        return self.raw(index).tobytes().decode("utf-8", "replace")
+
+    def raw(self, index: int) -> memoryview:
+        """Returns the UTF-8 bytes of one string without copying them."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("string column index out of range")
+        return memoryview(self._data)[self._offsets[index]:self._offsets[index + 1]]
+
+    def clear(self) -> None:
+        self._data = bytearray()
+        self._offsets = array("Q", [0])
+
+    @classmethod
+    def _from_buffers(cls, data, offsets):
+        column = cls.__new__(cls)
+        column._data = data
+        column._offsets = offsets
+        return column
+
+    def _detach(self) -> None:
+        """Copies mapped (read-only) buffers into owned ones so the column can grow."""
+        self._data = bytearray(self._data)
+        self._offsets = _owned_array("Q", self._offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._data) + self._offsets.itemsize * len(self._offsets)
+
+class _StringListColumn:
+    """A list of strings per record, flattened into one _StringColumn plus start offsets."""
+
+    __slots__ = ("_items", "_starts")
+
+    def __init__(self):
+        self._items = _StringColumn()
+        self._starts = array("Q", [0])
+
+    def __len__(self):
+        return len(self._starts) - 1
+
+    def append(self, values) -> None:
+        for value in values or ():
+            self._items.append(value)
+        self._starts.append(len(self._items))
+
+    def __getitem__(self, index: int) -> list[str]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("string list column index out of range")
+        return [self._items[i] for i in range(self._starts[index], self._starts[index + 1])]
+
+    def clear(self) -> None:
+        self._items.clear()
+        self._starts = array("Q", [0])
+
+    @classmethod
+    def _from_buffers(cls, data, offsets, starts):
+        column = cls.__new__(cls)
+        column._items = _StringColumn._from_buffers(data, offsets)
+        column._starts = starts
+        return column
+
+    def _detach(self) -> None:
+        self._items._detach()
+        self._starts = _owned_array("Q", self._starts)
+
+    @property
+    def nbytes(self) -> int:
+        return self._items.nbytes + self._starts.itemsize * len(self._starts)
+
+class _InternTable:
+    """Maps repeated strings to small integer ids and back."""
+
+    __slots__ = ("_values", "_ids", "_limit")
+
+    def __init__(self, initial=(), limit: int = None):
+        self._values: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._limit = limit
+        for value in initial:
+            self.intern(value)
+
+    def intern(self, value: str) -> int:
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = len(self._values)
+            if self._limit is not None and value_id >= self._limit:
+                raise ValueError(f"Too many distinct values (limit {self._limit})")
+            self._values.append(value)
+            self._ids[value] = value_id
+        return value_id
+
+    def lookup(self, value: str):
+        """Returns the id of an already interned value, or None."""
+        return self._ids.get(value)
+
+    def __getitem__(self, value_id: int) -> str:
+        return self._values[value_id]
+
+    def __len__(self):
+        return len(self._values)
+
+class RecordView(Sequence):
+    """
+    Read-only, lazily materialized sequence over records in a store, addressed by a
+    range (or any sequence) of record indexes. Slicing returns another view; nothing
+    is copied until a record is accessed.
+    """
+
+    __slots__ = ("_store", "_indexes")
+
+    def __init__(self, store, indexes):
+        self._store = store
+        self._indexes = indexes
+
+    def __len__(self):
+        return len(self._indexes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return RecordView(self._store, self._indexes[index])
+        return self._store.record(self._indexes[index])
+
+    def __iter__(self):
+        record = self._store.record
+        for index in self._indexes:
+            yield record(index)
+
+    def __eq__(self, other):
+        if isinstance(other, (RecordView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        return repr(list(self))
 
 # --- ChatMessage Model and Functions ---
 class ChatMessage:
-    def __init__(self, sender: str, text: str):
+    __slots__ = ("sender", "text", "timestamp")
+
+    def __init__(self, sender: str, text: str, timestamp: float = 0.0):
         self.sender = sender
         self.text = text
+        self.timestamp = timestamp  # Seconds since the epoch; 0.0 when unknown.
+
+    def __eq__(self, other):
+        if not isinstance(other, ChatMessage):
+            return NotImplemented
+        return self.sender == other.sender and self.text == other.text
+
+    # Hashes follow __eq__, so records stay usable in sets and as dict keys.
+    def __hash__(self):
+        return hash((self.sender, self.text))
 
     def __repr__(self):
         return f"ChatMessage(sender='{self.sender}', text='{self.text}')"
 
-def add_chat_message(sender: str, text: str) -> ChatMessage:
-    """Adds a new chat message to the history."""
-    message = ChatMessage(sender, text)
-    _chat_messages.append(vars(message)) # Store as dict for simplicity in demo
+class ChatStore:
+    """Column store for chat messages: interned sender ids, timestamps and one contiguous text buffer."""
+
+    # Column kinds in snapshot order: "T" string table, "s" raw UTF-8, otherwise an array typecode.
+    _SNAPSHOT_LAYOUT = ("T", "I", "d", "s", "Q")
+
+    def __init__(self):
+        self._senders = _InternTable()
+        self._sender_ids = array("I")
+        self._timestamps = array("d")
+        self._texts = _StringColumn()
+        self._mapped = False
+
+    def __len__(self):
+        return len(self._sender_ids)
+
+    def append(self, sender: str, text: str, timestamp: float = 0.0) -> int:
+        """Appends a message and returns its index."""
+        if self._mapped:
+            self._detach()
+        self._sender_ids.append(self._senders.intern(sender))
+        self._timestamps.append(timestamp)
+        self._texts.append(text)
+        return len(self._sender_ids) - 1
+
+    def extend_encoded(self, senders: list[str], texts: list[bytes], timestamp: float = 0.0) -> range:
+        """Appends many messages (texts already UTF-8 encoded) at once and returns their indexes."""
+        if self._mapped:
+            self._detach()
+        start = len(self._sender_ids)
+        sender_ids = {sender: self._senders.intern(sender) for sender in dict.fromkeys(senders)}
+        self._sender_ids.extend(map(sender_ids.__getitem__, senders))
+        self._timestamps.extend(array("d", [timestamp]) * len(texts))
+        self._texts.extend_encoded(texts)
+        return range(start, len(self._sender_ids))
+
+    def sender(self, index: int) -> str:
+        return self._senders[self._sender_ids[index]]
+
+    def text(self, index: int) -> str:
+        return self._texts[index]
+
+    def timestamp(self, index: int) -> float:
+        return self._timestamps[index]
+
+    def record(self, index: int) -> ChatMessage:
+        return ChatMessage(self._senders[self._sender_ids[index]], self._texts[index], self._timestamps[index])
+
+    def iter_rows(self, start: int = 0, stop: int = None):
+        """Yields (sender, text) tuples without building ChatMessage objects."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        senders, sender_ids, texts = self._senders, self._sender_ids, self._texts
+        for index in range(start, stop):
+            yield senders[sender_ids[index]], texts[index]
+
+    def view(self, offset: int = 0, limit: int = None) -> RecordView:
+        return RecordView(self, _page(len(self), offset, limit, False))
+
+    def clear(self) -> None:
+        self._senders = _InternTable()
+        self._sender_ids = array("I")
+        self._timestamps = array("d")
+        self._texts.clear()
+        self._mapped = False
+
+    def _snapshot_columns(self) -> list:
+        return [self._senders._values, self._sender_ids, self._timestamps, self._texts._data, self._texts._offsets]
+
+    @classmethod
+    def _from_snapshot(cls, columns: list, mapped: bool):
+        senders, sender_ids, timestamps, texts, text_offsets = columns
+        store = cls()
+        store._senders = _InternTable(senders)
+        store._sender_ids = sender_ids
+        store._timestamps = timestamps
+        store._texts = _StringColumn._from_buffers(texts, text_offsets)
+        store._mapped = mapped
+        return store
+
+    def _detach(self) -> None:
+        self._sender_ids = _owned_array("I", self._sender_ids)
+        self._timestamps = _owned_array("d", self._timestamps)
+        self._texts._detach()
+        self._mapped = False
+
+    @property
+    def nbytes(self) -> int:
+        return (self._texts.nbytes + self._sender_ids.itemsize * len(self._sender_ids)
+                + self._timestamps.itemsize * len(self._timestamps))
+
+def _page(length: int, offset: int, limit: int, reverse: bool) -> range:
+    """Record indexes for a page; with `reverse`, `offset` counts back from the newest record."""
+    offset = max(0, offset)
+    count = max(0, length - offset)
+    if limit is not None:
+        count = min(count, limit)
+    if reverse:
+        newest = length - 1 - offset
+        return range(newest, newest - count, -1)
+    return range(offset, offset + count)
+
+def set_chat_store(store) -> None:
+    """
+    Replaces the chat message store. Any object with append(sender, text, timestamp), __len__,
+    record(index) and clear() works, e.g. chat_log_store.ChatLogStore for durable history.
+    """
+    global _chat_messages
+    _chat_messages = store
+
+def get_chat_store():
+    """Returns the active chat message store."""
+    return _chat_messages
+
+# Callbacks invoked as callback(index, message) after every add_chat_message, e.g. search indexes.
+_chat_listeners: list = []
+
+def add_chat_listener(callback) -> None:
+    """Registers a callback run after each message is added to the chat history."""
+    _chat_listeners.append(callback)
+
+def remove_chat_listener(callback) -> None:
+    _chat_listeners.remove(callback)
+
+def add_chat_message(sender: str, text: str, timestamp: float = None) -> ChatMessage:
+    """Adds a new chat message to the history. `timestamp` defaults to the current time."""
+    message = ChatMessage(sender, text, time.time() if timestamp is None else timestamp)
+    index = _chat_messages.append(message.sender, message.text, message.timestamp)
+    for callback in _chat_listeners:
+        callback(index, message)
     return message
 
-def get_chat_history() -> list[ChatMessage]:
-    """Retrieves the entire chat history."""
-    return [ChatMessage(**msg) for msg in _chat_messages]
+def add_chat_messages_encoded(senders: list[str], texts: list[bytes], timestamp: float = None) -> range:
+    """
+    Bulk counterpart of add_chat_message() for ingestion: texts are UTF-8 encoded and all
+    messages share one timestamp (the current time by default). Returns the absolute indexes
+    of the new messages (see get_chat_first_index()); listeners get store positions, as
+    with add_chat_message().
+    """
+    timestamp = time.time() if timestamp is None else timestamp
+    if hasattr(_chat_messages, "extend_encoded"):
+        positions = _chat_messages.extend_encoded(senders, texts, timestamp)
+    else:
+        for sender, text in zip(senders, texts):
+            _chat_messages.append(sender, str(text, "utf-8", "replace"), timestamp)
+        # A bounded store may have evicted messages during the batch, including some of the
+        # new ones, so positions are taken from the end once the batch is in.
+        length = len(_chat_messages)
+        positions = range(length - min(len(texts), length), length)
+    for callback in _chat_listeners:
+        for position in positions:
+            callback(position, _chat_messages.record(position))
+    end = get_chat_first_index() + len(_chat_messages)
+    return range(end - len(texts), end)
+
+def get_chat_history(offset: int = 0, limit: int = None, reverse: bool = False) -> Sequence[ChatMessage]:
+    """
+    Returns a view of the chat history, optionally only `limit` messages starting at `offset`.
+    With `reverse`, messages are returned newest first and `offset` counts back from the newest.
+    """
+    return RecordView(_chat_messages, _page(len(_chat_messages), offset, limit, reverse))
+
+def get_chat_message_count() -> int:
+    """Returns how many messages are in the chat history."""
+    return len(_chat_messages)
+
+def get_chat_first_index() -> int:
+    """
+    Absolute index of the oldest stored message: how many messages a bounded store
+    (chat_history.BoundedChatStore) has evicted, 0 for stores that keep everything.
+    A message's absolute index is this plus its position, and does not shift on eviction.
+    """
+    return getattr(_chat_messages, "first_index", 0)
 
 # --- ProjectTask Model and Functions ---
+TASK_STATUSES = ("To Do", "In Progress", "Done")
+
 class ProjectTask:
-    def __init__(self, task_name: str, sub_tasks: list[str] = None, status: str = "To Do"):
+    __slots__ = ("task_name", "sub_tasks", "status", "task_id", "parent_id")
+
+    def __init__(self, task_name: str, sub_tasks: list[str] = None, status: str = "To Do", task_id: int = None,
+                 parent_id: int = None):
         self.task_name = task_name
         self.sub_tasks = sub_tasks if sub_tasks is not None else []
         self.status = status
+        self.task_id = task_id  # Index in the task store, set once the task is stored.
+        self.parent_id = parent_id  # Task id of the parent in a task tree (None for top-level tasks).
+
+    def __eq__(self, other):
+        if not isinstance(other, ProjectTask):
+            return NotImplemented
+        return (self.task_name, self.sub_tasks, self.status) == (other.task_name, other.sub_tasks, other.status)
+
+    def __hash__(self):
+        return hash((self.task_name, tuple(self.sub_tasks), self.status))
 
     def __repr__(self):
         return f"ProjectTask(task_name='{self.task_name}', sub_tasks={self.sub_tasks}, status='{self.status}')"
 
+def _index_key(text: str) -> str:
+    """Case- and whitespace-insensitive key used by the task name and sub-task indexes."""
+    return " ".join(text.split()).casefold()
+
+class TaskStore:
+    """
+    Column store for project tasks; statuses are kept as one-byte codes.
+    Maintains secondary indexes so queries never scan every task:
+    - status code -> task ids, which also gives O(1) per-status counts
+    - sorted (name key, task id) pairs for exact and prefix lookups on task_name
+    - sub-task key -> ids of the tasks that contain it
+    Status changes and appends are O(1): a bucket or the name list that falls out of order
+    is re-sorted by the next query that reads it (Timsort merges the out-of-order tail).
+    Task trees are stored as ordinary tasks plus a parent id column (4 bytes per task) and
+    a parent -> child ids index; a parent's child names are reported as its sub_tasks, so
+    each name is stored only once.
+    A store restored from a snapshot rebuilds these indexes on the first query that needs them.
+    """
+
+    _SNAPSHOT_LAYOUT = ("T", "B", "s", "Q", "s", "Q", "Q", "i")
+
+    def __init__(self):
+        self._names = _StringColumn()
+        self._statuses = _InternTable(TASK_STATUSES, limit=256)
+        self._status_codes = array("B")
+        self._sub_tasks = _StringListColumn()
+        self._parent_ids = array("i")  # -1 for top-level tasks
+        self._children: dict[int, list[int]] = {}
+        self._by_status: list[dict] = [{} for _ in TASK_STATUSES]
+        self._unsorted_statuses: set[int] = set()  # status codes whose bucket is out of id order
+        self._by_name: list[tuple] = []
+        self._by_name_sorted = True
+        self._by_sub_task: dict[str, list[int]] = {}
+        self._mapped = False
+
+    def __len__(self):
+        return len(self._status_codes)
+
+    def append(self, task_name: str, sub_tasks: list[str] = None, status: str = "To Do",
+               parent_id: int = None) -> int:
+        """Appends a task (as a child of `parent_id` if given), updates the indexes and returns its id."""
+        if parent_id is not None:
+            self._check_id(parent_id)
+        if self._mapped:
+            self._detach()
+        self._ensure_indexes()
+        task_id = len(self._status_codes)
+        status_code = self._status_code(status)
+        self._names.append(task_name)
+        self._status_codes.append(status_code)
+        self._sub_tasks.append(sub_tasks)
+        self._parent_ids.append(-1 if parent_id is None else parent_id)
+
+        self._by_status[status_code][task_id] = None
+        name_entry = (_index_key(task_name), task_id)
+        if self._by_name and self._by_name[-1] > name_entry:
+            self._by_name_sorted = False
+        self._by_name.append(name_entry)
+        for sub_task in sub_tasks or ():
+            self._index_sub_task(sub_task, task_id)
+        if parent_id is not None:
+            self._children.setdefault(parent_id, []).append(task_id)
+            self._index_sub_task(task_name, parent_id)
+        return task_id
+
+    def _index_sub_task(self, sub_task: str, task_id: int) -> None:
+        parents = self._by_sub_task.setdefault(_index_key(sub_task), [])
+        position = bisect.bisect_left(parents, task_id)
+        if position == len(parents) or parents[position] != task_id:
+            parents.insert(position, task_id)
+
+    def _child_index(self) -> dict[int, list[int]]:
+        if self._children is None:
+            children = {}
+            for task_id, parent_id in enumerate(self._parent_ids):
+                if parent_id >= 0:
+                    children.setdefault(parent_id, []).append(task_id)
+            self._children = children
+        return self._children
+
+    def _ensure_indexes(self) -> None:
+        """Builds the status, name and sub-task indexes of a restored store."""
+        if self._by_name is not None:
+            return
+        names = self._names
+        by_status = [{} for _ in range(max(len(TASK_STATUSES), len(self._statuses)))]
+        for task_id, status_code in enumerate(self._status_codes):
+            by_status[status_code][task_id] = None
+        self._by_status = by_status
+        self._unsorted_statuses = set()
+        self._by_sub_task = {}
+        for task_id in range(len(self)):
+            for sub_task in self._sub_tasks[task_id]:
+                self._index_sub_task(sub_task, task_id)
+        for parent_id, child_ids in self._child_index().items():
+            for child_id in child_ids:
+                self._index_sub_task(names[child_id], parent_id)
+        self._by_name = sorted((_index_key(names[task_id]), task_id) for task_id in range(len(self)))
+        self._by_name_sorted = True
+
+    def _status_bucket(self, status_code: int) -> dict:
+        """The ids with a status, in ascending order."""
+        bucket = self._by_status[status_code]
+        if status_code in self._unsorted_statuses:
+            ids = sorted(bucket)
+            bucket.clear()
+            bucket.update(dict.fromkeys(ids))
+            self._unsorted_statuses.discard(status_code)
+        return bucket
+
+    def _name_index(self) -> list[tuple]:
+        if not self._by_name_sorted:
+            self._by_name.sort()
+            self._by_name_sorted = True
+        return self._by_name
+
+    def _status_code(self, status: str) -> int:
+        status_code = self._statuses.intern(status)
+        while len(self._by_status) <= status_code:
+            self._by_status.append({})
+        return status_code
+
+    def _check_id(self, task_id: int) -> None:
+        if not 0 <= task_id < len(self):
+            raise IndexError(f"No task with id {task_id}")
+
+    def record(self, index: int) -> ProjectTask:
+        if index < 0:
+            index += len(self)
+        sub_tasks = self._sub_tasks[index]
+        for child_id in self._child_index().get(index, ()):
+            sub_tasks.append(self._names[child_id])
+        parent_id = self._parent_ids[index]
+        return ProjectTask(self._names[index], sub_tasks, self._statuses[self._status_codes[index]], index,
+                           None if parent_id < 0 else parent_id)
+
+    def parent_of(self, task_id: int):
+        self._check_id(task_id)
+        parent_id = self._parent_ids[task_id]
+        return None if parent_id < 0 else parent_id
+
+    def children_of(self, task_id: int) -> list[int]:
+        self._check_id(task_id)
+        return list(self._child_index().get(task_id, ()))
+
+    def view(self, offset: int = 0, limit: int = None) -> RecordView:
+        return RecordView(self, _page(len(self), offset, limit, False))
+
+    def set_status(self, task_id: int, status: str) -> None:
+        """Changes a task's status, moving it between the per-status indexes."""
+        self._check_id(task_id)
+        if self._mapped:
+            self._detach()
+        self._ensure_indexes()
+        new_code = self._status_code(status)
+        old_code = self._status_codes[task_id]
+        if new_code == old_code:
+            return
+        del self._by_status[old_code][task_id]
+        bucket = self._by_status[new_code]
+        if bucket and next(reversed(bucket)) > task_id:
+            # Status queries return ids in ascending order; the bucket is sorted when next read.
+            self._unsorted_statuses.add(new_code)
+        bucket[task_id] = None
+        self._status_codes[task_id] = new_code
+
+    def ids_with_status(self, status: str) -> list[int]:
+        self._ensure_indexes()
+        status_code = self._statuses.lookup(status)
+        if status_code is None:
+            return []
+        return list(self._status_bucket(status_code))
+
+    def count_with_status(self, status: str) -> int:
+        self._ensure_indexes()
+        status_code = self._statuses.lookup(status)
+        return 0 if status_code is None else len(self._by_status[status_code])
+
+    def status_counts(self) -> dict[str, int]:
+        self._ensure_indexes()
+        return {self._statuses[code]: len(ids) for code, ids in enumerate(self._by_status)}
+
+    def ids_with_name(self, name: str = None, prefix: str = None) -> list[int]:
+        """Task ids whose name equals `name` or starts with `prefix` (case-insensitive), sorted by name."""
+        self._ensure_indexes()
+        key = _index_key(name if name is not None else prefix)
+        by_name = self._name_index()
+        start = bisect.bisect_left(by_name, (key, -1))
+        ids = []
+        for index in range(start, len(by_name)):
+            name_key, task_id = by_name[index]
+            if (name_key != key) if name is not None else (not name_key.startswith(key)):
+                break
+            ids.append(task_id)
+        return ids
+
+    def ids_with_sub_task(self, sub_task: str) -> list[int]:
+        self._ensure_indexes()
+        return list(self._by_sub_task.get(_index_key(sub_task), ()))
+
+    def clear(self) -> None:
+        self._names.clear()
+        self._statuses = _InternTable(TASK_STATUSES, limit=256)
+        self._status_codes = array("B")
+        self._sub_tasks.clear()
+        self._parent_ids = array("i")
+        self._children = {}
+        self._by_status = [{} for _ in TASK_STATUSES]
+        self._unsorted_statuses = set()
+        self._by_name = []
+        self._by_name_sorted = True
+        self._by_sub_task = {}
+        self._mapped = False
+
+    def _snapshot_columns(self) -> list:
+        return [self._statuses._values, self._status_codes, self._names._data, self._names._offsets,
+                self._sub_tasks._items._data, self._sub_tasks._items._offsets, self._sub_tasks._starts,
+                self._parent_ids]
+
+    @classmethod
+    def _from_snapshot(cls, columns: list, mapped: bool):
+        statuses, status_codes, names, name_offsets, sub_tasks, sub_task_offsets, sub_task_starts, parent_ids = columns
+        store = cls()
+        store._statuses = _InternTable(statuses, limit=256)
+        store._status_codes = status_codes
+        store._names = _StringColumn._from_buffers(names, name_offsets)
+        store._sub_tasks = _StringListColumn._from_buffers(sub_tasks, sub_task_offsets, sub_task_starts)
+        store._parent_ids = parent_ids
+        store._children = None
+        store._by_status = None
+        store._by_name = None
+        store._by_sub_task = None
+        store._mapped = mapped
+        return store
+
+    def _detach(self) -> None:
+        self._names._detach()
+        self._status_codes = _owned_array("B", self._status_codes)
+        self._sub_tasks._detach()
+        self._parent_ids = _owned_array("i", self._parent_ids)
+        self._mapped = False
+
 def create_project_task(task_name: str, sub_tasks: list[str] = None) -> ProjectTask:
     """Creates a new project task."""
     task = ProjectTask(task_name, sub_tasks)
-    _project_tasks.append(vars(task)) # Store as dict
+    task.task_id = _project_tasks.append(task.task_name, task.sub_tasks, task.status)
     return task
 
-def get_project_tasks() -> list[ProjectTask]:
-    """Retrieves all project tasks."""
-    return [ProjectTask(**task) for task in _project_tasks]
+def get_project_tasks() -> Sequence[ProjectTask]:
+    """Returns a view of all project tasks."""
+    return _project_tasks.view()
+
+def update_task_status(task_id: int, status: str) -> ProjectTask:
+    """Changes the status of a stored task and returns the updated task."""
+    _project_tasks.set_status(task_id, status)
+    return _project_tasks.record(task_id)
+
+def query_tasks(status: str = None, name: str = None, name_prefix: str = None,
+                sub_task: str = None) -> Sequence[ProjectTask]:
+    """
+    Returns a view of the tasks matching every given filter, using the task indexes.
+    `name` and `name_prefix` match case-insensitively; `sub_task` matches tasks containing
+    that sub-task. Results are in task id order, or name order for name-only queries.
+    """
+    candidates = []
+    if status is not None:
+        candidates.append(_project_tasks.ids_with_status(status))
+    if name is not None or name_prefix is not None:
+        candidates.append(_project_tasks.ids_with_name(name=name, prefix=name_prefix))
+    if sub_task is not None:
+        candidates.append(_project_tasks.ids_with_sub_task(sub_task))
+    if not candidates:
+        return _project_tasks.view()
+    if len(candidates) == 1:
+        return RecordView(_project_tasks, candidates[0])
+    # Intersect starting from the smallest candidate list.
+    candidates.sort(key=len)
+    matching = set(candidates[0])
+    for ids in candidates[1:]:
+        matching.intersection_update(ids)
+    return RecordView(_project_tasks, sorted(matching))
+
+def count_tasks_by_status(status: str = None):
+    """Returns the number of tasks with `status`, or a {status: count} dict for all statuses. O(1)."""
+    if status is None:
+        return _project_tasks.status_counts()
+    return _project_tasks.count_with_status(status)
+
+def set_task_store(store: TaskStore) -> None:
+    """Replaces the project task store, e.g. with one restored by store_snapshot."""
+    global _project_tasks
+    _project_tasks = store
+
+def get_task_store() -> TaskStore:
+    return _project_tasks
+
+def find_parent_tasks(sub_task: str) -> Sequence[ProjectTask]:
+    """Returns a view of the tasks whose sub-task list contains `sub_task`."""
+    return RecordView(_project_tasks, _project_tasks.ids_with_sub_task(sub_task))
+
+# --- Task trees ---
+class TaskNode:
+    """A task and its sub-task nodes, as produced by task_planner before it is stored."""
+
+    __slots__ = ("task_name", "children")
+
+    def __init__(self, task_name: str, children: list["TaskNode"] = None):
+        self.task_name = task_name
+        self.children = children if children is not None else []
+
+    def __eq__(self, other):
+        if not isinstance(other, TaskNode):
+            return NotImplemented
+        return self.task_name == other.task_name and self.children == other.children
+
+    def __hash__(self):
+        return hash((self.task_name, tuple(self.children)))
+
+    def __repr__(self):
+        return f"TaskNode(task_name='{self.task_name}', children={self.children})"
+
+def create_task_tree(root: TaskNode, parent_id: int = None) -> ProjectTask:
+    """Stores a task tree (under `parent_id` if given) and returns its root task."""
+    root_id = _project_tasks.append(root.task_name, parent_id=parent_id)
+    stack = [(root, root_id)]
+    while stack:
+        node, task_id = stack.pop()
+        for child in node.children:
+            stack.append((child, _project_tasks.append(child.task_name, parent_id=task_id)))
+    return _project_tasks.record(root_id)
+
+def get_task_tree(task_id: int) -> TaskNode:
+    """Rebuilds the tree of stored tasks below (and including) `task_id`."""
+    root = TaskNode(_project_tasks.record(task_id).task_name)
+    stack = [(root, task_id)]
+    while stack:
+        node, node_id = stack.pop()
+        for child_id in _project_tasks.children_of(node_id):
+            child = TaskNode(_project_tasks.record(child_id).task_name)
+            node.children.append(child)
+            stack.append((child, child_id))
+    return root
+
+def get_sub_task_ids(task_id: int) -> list[int]:
+    """Ids of the tasks stored directly below `task_id` in its tree."""
+    return _project_tasks.children_of(task_id)
 
 # --- PresentationSlide Model and Functions ---
 class PresentationSlide:
+    __slots__ = ("slide_title", "bullet_points")
+
     def __init__(self, slide_title: str, bullet_points: list[str] = None):
         self.slide_title = slide_title
         self.bullet_points = bullet_points if bullet_points is not None else []
 
+    def __eq__(self, other):
+        if not isinstance(other, PresentationSlide):
+            return NotImplemented
+        return self.slide_title == other.slide_title and self.bullet_points == other.bullet_points
+
+    def __hash__(self):
+        return hash((self.slide_title, tuple(self.bullet_points)))
+
     def __repr__(self):
         return f"PresentationSlide(slide_title='{self.slide_title}', bullet_points={self.bullet_points})"
 
+class SlideStore:
+    """Column store for presentation slides."""
+
+    _SNAPSHOT_LAYOUT = ("s", "Q", "s", "Q", "Q")
+
+    def __init__(self):
+        self._titles = _StringColumn()
+        self._bullet_points = _StringListColumn()
+        self._mapped = False
+
+    def __len__(self):
+        return len(self._titles)
+
+    def append(self, title: str, bullet_points: list[str] = None) -> int:
+        """Appends a slide and returns its index."""
+        if self._mapped:
+            self._detach()
+        self._titles.append(title)
+        self._bullet_points.append(bullet_points)
+        return len(self._titles) - 1
+
+    def record(self, index: int) -> PresentationSlide:
+        return PresentationSlide(self._titles[index], self._bullet_points[index])
+
+    def view(self, offset: int = 0, limit: int = None) -> RecordView:
+        return RecordView(self, _page(len(self), offset, limit, False))
+
+    def clear(self) -> None:
+        self._titles.clear()
+        self._bullet_points.clear()
+        self._mapped = False
+
+    def _snapshot_columns(self) -> list:
+        return [self._titles._data, self._titles._offsets, self._bullet_points._items._data,
+                self._bullet_points._items._offsets, self._bullet_points._starts]
+
+    @classmethod
+    def _from_snapshot(cls, columns: list, mapped: bool):
+        titles, title_offsets, bullet_points, bullet_point_offsets, bullet_point_starts = columns
+        store = cls()
+        store._titles = _StringColumn._from_buffers(titles, title_offsets)
+        store._bullet_points = _StringListColumn._from_buffers(bullet_points, bullet_point_offsets,
+                                                               bullet_point_starts)
+        store._mapped = mapped
+        return store
+
+    def _detach(self) -> None:
+        self._titles._detach()
+        self._bullet_points._detach()
+        self._mapped = False
+
 def add_presentation_slide(title: str, bullet_points: list[str] = None) -> PresentationSlide:
     """Adds a new presentation slide."""
     slide = PresentationSlide(title, bullet_points)
-    _presentation_slides.append(vars(slide)) # Store as dict
+    _presentation_slides.append(slide.slide_title, slide.bullet_points)
     return slide
 
-def get_presentation_slides() -> list[PresentationSlide]:
-    """Retrieves all presentation slides."""
-    return [PresentationSlide(**slide) for slide in _presentation_slides]
+def get_presentation_slides() -> Sequence[PresentationSlide]:
+    """Returns a view of all presentation slides."""
+    return _presentation_slides.view()
+
+def set_slide_store(store: SlideStore) -> None:
+    """Replaces the presentation slide store, e.g. with one restored by store_snapshot."""
+    global _presentation_slides
+    _presentation_slides = store
+
+def get_slide_store() -> SlideStore:
+    return _presentation_slides
+
+# In-memory storage
+_chat_messages = ChatStore()
+_project_tasks = TaskStore()
+_presentation_slides = SlideStore()
 
 if __name__ == '__main__':
     # Example Usage (optional, for testing)
@@ -0,0 +1,238 @@
+# idea_dedup.py
+
+import hashlib
+import operator
+import re
+from array import array
+from functools import lru_cache
+
+# Near-duplicate clustering for feature ideas and task lists.
+# Extraction over many windows or channels returns the same idea phrased many ways.
+# Comparing every pair is quadratic, so each text gets a MinHash signature over its
+# normalized words instead, and the signature is cut into LSH bands. Texts sharing a band
+# are candidate duplicates, and a candidate joins a cluster only when the estimated
+# Jaccard similarity of the signatures clears the threshold. Exact repeats (ignoring case
+# and punctuation) skip hashing entirely. DedupIndex is incremental: new ideas can be
+# checked against, or added to, the clusters built so far.
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the this to via with our your "
+    "their its new better more".split()
+)
+_SUFFIXES = ("izations", "ization", "izing", "ized", "izes", "ize", "ations", "ation",
+             "ings", "ing", "ed", "es", "s", "e")
+# Members kept per LSH bucket. Past this, a bucket only takes members of clusters it does
+# not hold yet, so every cluster that reached a bucket stays reachable through it while a
+# popular idea's many rephrasings do not make every lookup compare against all of them.
+_BUCKET_LIMIT = 8
+
+@lru_cache(maxsize=65536)
+def _stem(word: str) -> str:
+    """Crude suffix stripping: "categorizing", "categorization" -> "categor"; "tagging" -> "tag"."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            if word[-1] == word[-2] and word[-1] not in "aeiouls":
+                word = word[:-1]
+            break
+    return word
+
+def normalize(text: str) -> str:
+    """Case- and punctuation-insensitive key used for exact-duplicate detection."""
+    return " ".join(_WORD.findall(text.lower()))
+
+def shingles(text: str) -> set[str]:
+    """The set of stemmed content words a signature is computed over."""
+    return {_stem(word) for word in _WORD.findall(text.lower()) if word not in _STOPWORDS}
+
+@lru_cache(maxsize=65536)
+def _token_values(token: str, num_perm: int, seed: int) -> array:
+    # One independent 32-bit hash per permutation, derived from a single SHAKE digest. Stable
+    # across processes (unlike hash()), so signatures can be stored and compared later.
+    return array("I", hashlib.shake_128(f"{seed}:{token}".encode("utf-8")).digest(4 * num_perm))
+
+class MinHasher:
+    """
+    MinHash signatures of `num_perm` values. Each token's per-permutation hashes are
+    computed once (and cached), so a signature is an element-wise min across its tokens.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        self.num_perm = num_perm
+        self.seed = seed
+
+    def signature(self, tokens) -> tuple:
+        """Signature of a token set; an empty set gets an empty signature."""
+        values = [_token_values(token, self.num_perm, self.seed) for token in tokens]
+        if not values:
+            return ()
+        return tuple(values[0]) if len(values) == 1 else tuple(map(min, *values))
+
+def similarity(first: tuple, second: tuple) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    if not first or not second:
+        return 1.0 if first == second else 0.0
+    return sum(map(operator.eq, first, second)) / len(first)
+
+class DedupIndex:
+    """
+    Incremental near-duplicate clusters. `threshold` is the estimated Jaccard similarity
+    above which two texts count as the same idea; `bands` x (num_perm / bands) rows set the
+    LSH sensitivity (the defaults catch pairs from roughly 0.5 similarity upwards).
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._hasher = MinHasher(num_perm, seed)
+        self._buckets = [{} for _ in range(bands)]
+        self._by_key = {}      # normalized text -> member id
+        self._texts = []       # member id -> first spelling seen
+        self._counts = []      # member id -> times added
+        self._parents = []     # union-find over member ids
+        self._signatures = []  # member id -> MinHash signature
+        self.bucket_skips = 0  # members left out of a full bucket that already held their cluster
+
+    def __len__(self):
+        return len(self._texts)
+
+    def _root(self, member: int) -> int:
+        parents = self._parents
+        while parents[member] != member:
+            parents[member] = parents[parents[member]]
+            member = parents[member]
+        return member
+
+    def _union(self, first: int, second: int) -> None:
+        first, second = self._root(first), self._root(second)
+        if first != second:
+            # The earlier member stays the root, so cluster ids follow first-seen order.
+            if second < first:
+                first, second = second, first
+            self._parents[second] = first
+
+    def _band_keys(self, signature: tuple):
+        rows = self.rows
+        return [(band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def _matching_clusters(self, signature: tuple, band_keys: list) -> set[int]:
+        # Candidates already known to be in a matching cluster are not compared again, so a
+        # large cluster costs one comparison rather than one per bucket member.
+        roots = set()
+        rejected = set()
+        for band, key in band_keys:
+            for member in self._buckets[band].get(key, ()):
+                if member in rejected:
+                    continue
+                root = self._root(member)
+                if root in roots:
+                    continue
+                if similarity(signature, self._signatures[member]) >= self.threshold:
+                    roots.add(root)
+                else:
+                    rejected.add(member)
+        return roots
+
+    def add(self, text: str, count: int = 1) -> int:
+        """Adds `text` (seen `count` times) and returns the id of the cluster it joined."""
+        key = normalize(text)
+        member = self._by_key.get(key)
+        if member is not None:
+            self._counts[member] += count
+            return self._root(member)
+        signature = self._hasher.signature(shingles(text))
+        member = len(self._texts)
+        self._by_key[key] = member
+        self._texts.append(text)
+        self._counts.append(count)
+        self._parents.append(member)
+        self._signatures.append(signature)
+        band_keys = self._band_keys(signature) if signature else []
+        for root in self._matching_clusters(signature, band_keys):
+            self._union(member, root)
+        root = self._root(member)
+        for band, band_key in band_keys:
+            bucket = self._buckets[band].setdefault(band_key, [])
+            if len(bucket) < _BUCKET_LIMIT or root not in {self._root(other) for other in bucket}:
+                bucket.append(member)
+            else:
+                self.bucket_skips += 1
+        return root
+
+    def cluster_of(self, text: str):
+        """The cluster id `text` would join, or None if it is new; the index is not changed."""
+        member = self._by_key.get(normalize(text))
+        if member is not None:
+            return self._root(member)
+        signature = self._hasher.signature(shingles(text))
+        band_keys = self._band_keys(signature) if signature else []
+        return min(self._matching_clusters(signature, band_keys), default=None)
+
+    def clusters(self) -> dict[int, list[int]]:
+        """Cluster id -> member ids, both in first-seen order."""
+        clusters = {}
+        for member in range(len(self._texts)):
+            clusters.setdefault(self._root(member), []).append(member)
+        return clusters
+
+    def representative(self, cluster_id: int) -> str:
+        """The most frequently added spelling in a cluster (earliest on ties)."""
+        members = self.clusters()[cluster_id]
+        return self._texts[max(members, key=lambda member: (self._counts[member], -member))]
+
+    def groups(self) -> list[tuple]:
+        """(representative, total count, member texts) per cluster, in first-seen order."""
+        groups = []
+        for members in self.clusters().values():
+            best = max(members, key=lambda member: (self._counts[member], -member))
+            groups.append((self._texts[best], sum(self._counts[member] for member in members),
+                           [self._texts[member] for member in members]))
+        return groups
+
+    def representatives(self) -> list[str]:
+        return [representative for representative, _, _ in self.groups()]
+
+def dedupe(texts, threshold: float = 0.5) -> list[str]:
+    """Collapses near-duplicate ideas or tasks to one representative each, in first-seen order."""
+    index = DedupIndex(threshold)
+    for text in texts:
+        index.add(text)
+    return index.representatives()
+
+if __name__ == '__main__':
+    import time
+
+    ideas = [
+        "Message tagging or categorization system.",
+        "A system for tagging and categorizing messages",
+        "Message tagging / categorization system",
+        "message tagging or categorization system",
+        "Tagging system for categorizing chat messages.",
+        "Enhanced notification preferences for different chat types.",
+        "Notification preferences for different chat types",
+        "Calendar integration for scheduling discussed events.",
+        "Integration with a calendar for scheduling events",
+        "Dark mode.",
+    ]
+    index = DedupIndex()
+    for idea in ideas:
+        index.add(idea)
+    for representative, count, members in index.groups():
+        print(f"{representative!r} x{count}: {members}")
+    print(f"New idea 'Categorize messages with a tagging system' joins cluster "
+          f"{index.cluster_of('Categorize messages with a tagging system')}")
+
+    # 20k rephrasings of the ideas above plus 20k unrelated ideas built from random words.
+    import random
+    rng = random.Random(7)
+    vocabulary = [f"{rng.choice('bcdfgklmnprstvz')}{rng.choice('aeiou')}{rng.choice('bcdfgklmnprstvz')}{i}"
+                  for i in range(5000)]
+    variants = [f"{ideas[i % len(ideas)]} (variant {i % 7})" for i in range(20_000)]
+    variants += [" ".join(rng.sample(vocabulary, 5)) for _ in range(20_000)]
+    started = time.perf_counter()
+    representatives = dedupe(variants)
+    print(f"{len(variants)} ideas -> {len(representatives)} clusters in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,103 @@
+# list_parser.py
+
+import re
+
+# Shared parser for the numbered ("1. item") and bulleted ("- item", "* item", "• item") lists
+# Gemini returns. The patterns are compiled once here instead of in every *_ai module.
+# ListParser is incremental: feed it response chunks as they stream in and it returns each
+# item as soon as the line holding it is complete, so downstream work can start on the
+# first item while the model is still generating the rest.
+
+NUMBERED = "numbered"
+BULLETED = "bulleted"
+ANY = "any"
+
+# [^\S\n] is whitespace other than a newline, so a match never spans lines and the one-pass
+# parse_list() agrees with the line-by-line ListParser.
+_PATTERNS = {
+    NUMBERED: re.compile(r"^[^\S\n]*\d+\.[^\S\n]+(.+)"),
+    BULLETED: re.compile(r"^[^\S\n]*[-\*•][^\S\n]+(.+)"),
+    ANY: re.compile(r"^[^\S\n]*(?:\d+\.|[-\*•])[^\S\n]+(.+)"),
+}
+_MULTILINE_PATTERNS = {style: re.compile(pattern.pattern, re.MULTILINE) for style, pattern in _PATTERNS.items()}
+
+class ListParser:
+    """
+    Incremental list-item parser.
+    `clean`, if given, is applied to each item's text before it is stripped and returned.
+    """
+
+    __slots__ = ("_pattern", "_clean", "_pending")
+
+    def __init__(self, style: str = NUMBERED, clean=None):
+        if style not in _PATTERNS:
+            raise ValueError(f"Unknown list style {style!r}; expected one of {sorted(_PATTERNS)}")
+        self._pattern = _PATTERNS[style]
+        self._clean = clean
+        self._pending = ""
+
+    def _item(self, line: str):
+        match = self._pattern.match(line)
+        if match is None:
+            return None
+        text = match.group(1)
+        if self._clean is not None:
+            text = self._clean(text)
+        text = text.strip()
+        return text or None
+
+    def feed(self, chunk: str) -> list[str]:
+        """Consumes a chunk of response text and returns the items completed by it."""
+        if "\n" not in chunk:
+            self._pending += chunk
+            return []
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        items = []
+        for line in lines:
+            item = self._item(line)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def close(self) -> list[str]:
+        """Flushes the final, unterminated line."""
+        line, self._pending = self._pending, ""
+        item = self._item(line)
+        return [item] if item is not None else []
+
+def parse_list(text: str, style: str = NUMBERED, clean=None) -> list[str]:
+    """Parses a complete response in one pass."""
+    if style not in _MULTILINE_PATTERNS:
+        raise ValueError(f"Unknown list style {style!r}; expected one of {sorted(_MULTILINE_PATTERNS)}")
+    items = []
+    for text_item in _MULTILINE_PATTERNS[style].findall(text):
+        if clean is not None:
+            text_item = clean(text_item)
+        text_item = text_item.strip()
+        if text_item:
+            items.append(text_item)
+    return items
+
+def iter_list_items(chunks, style: str = NUMBERED, clean=None):
+    """Yields list items from an iterable of text chunks as soon as each one is complete."""
+    parser = ListParser(style, clean)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+async def aiter_list_items(chunks, style: str = NUMBERED, clean=None):
+    """Async counterpart of iter_list_items() for async iterables of chunks."""
+    parser = ListParser(style, clean)
+    async for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+    for item in parser.close():
+        yield item
+
+if __name__ == '__main__':
+    response = "Here you go:\n1. First item\n2. Second (Tasks: a, b)\n- a bullet\n3. Third"
+    print(parse_list(response))
+    print(parse_list(response, ANY, clean=lambda text: re.sub(r"\s*\(Tasks:.*\)\s*$", "", text)))
+    chunks = [response[i:i + 5] for i in range(0, len(response), 5)]
+    print(list(iter_list_items(chunks)))
@@ -0,0 +1,342 @@
+# llm_backend.py
+
+import asyncio
+import random
+import threading
+import time
+
+import tracing
+
+# Shared model-call layer for comms_hub_ai.py, task_manager_ai.py and presentation_builder_ai.py.
+# Every AI function builds a prompt and hands it to a ModelBackend instead of parsing a
+# hardcoded response inline. The default backend is a deterministic StubModel that answers
+# with the simulated Gemini responses each module registers, wrapped in a CoalescingBackend
+# so identical prompts that are in flight at the same time share a single call.
+
+# Canned responses registered by the *_ai modules: list of (marker, response) pairs.
+# A response is either a string or a callable taking the prompt and returning a string.
+_simulated_responses: list[tuple] = []
+
+def register_simulated_response(marker: str, response) -> None:
+    """Registers a canned response used by StubModel for prompts containing `marker`."""
+    _simulated_responses.append((marker, response))
+
+class ModelBackend:
+    """Base class for anything that turns a prompt into a model response."""
+
+    name = "base"
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    async def agenerate(self, prompt: str) -> str:
+        # Backends without a native async client run the blocking call off the event loop.
+        return await asyncio.to_thread(self.generate, prompt)
+
+    def stream(self, prompt: str):
+        """Yields the response in chunks as the model produces them."""
+        # Backends without native streaming deliver the whole response as one chunk.
+        yield self.generate(prompt)
+
+    async def astream(self, prompt: str):
+        """Async counterpart of stream()."""
+        yield await self.agenerate(prompt)
+
+    def discard(self, prompt: str) -> None:
+        """Forgets any stored response to `prompt`, so the next call asks the model again."""
+        # Only caching backends store responses; wrappers pass the call on to their backend.
+
+class StubModel(ModelBackend):
+    """
+    Deterministic local model for demos and tests.
+    Answers with the first canned response whose marker appears in the prompt.
+    """
+
+    name = "stub"
+
+    def __init__(self, responses: list[tuple] = None, default_response: str = "", latency=0.0,
+                 chunk_size: int = 16, chunk_latency: float = 0.0, failure_rate: float = 0.0,
+                 failure_response: str = "Sorry, I could not process that request.", seed: int = None):
+        # When no explicit responses are given, the module-level registry is used,
+        # so responses registered after construction are still picked up.
+        self._responses = responses
+        self.default_response = default_response
+        # Seconds per call, or a callable drawing them from a distribution (see call_policy).
+        self.latency = latency
+        # Streaming splits the response into `chunk_size`-character chunks, `chunk_latency` apart.
+        self.chunk_size = chunk_size
+        self.chunk_latency = chunk_latency
+        # A `failure_rate` fraction of calls answer with `failure_response` (which parses to nothing).
+        self.failure_rate = failure_rate
+        self.failure_response = failure_response
+        self._random = random.Random(seed)
+        self.call_count = 0
+
+    def _delay(self) -> float:
+        return self.latency() if callable(self.latency) else self.latency
+
+    def register(self, marker: str, response) -> None:
+        if self._responses is None:
+            self._responses = list(_simulated_responses)
+        self._responses.append((marker, response))
+
+    def respond(self, prompt: str) -> str:
+        if self.failure_rate and self._random.random() < self.failure_rate:
+            return self.failure_response
+        responses = self._responses if self._responses is not None else _simulated_responses
+        for marker, response in responses:
+            if marker in prompt:
+                return response(prompt) if callable(response) else response
+        return self.default_response
+
+    def generate(self, prompt: str) -> str:
+        self.call_count += 1
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return self.respond(prompt)
+
+    async def agenerate(self, prompt: str) -> str:
+        self.call_count += 1
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        return self.respond(prompt)
+
+    def stream(self, prompt: str):
+        self.call_count += 1
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        response = self.respond(prompt)
+        for start in range(0, len(response), self.chunk_size):
+            if self.chunk_latency and start:
+                time.sleep(self.chunk_latency)
+            yield response[start:start + self.chunk_size]
+
+    async def astream(self, prompt: str):
+        self.call_count += 1
+        delay = self._delay()
+        if delay:
+            await asyncio.sleep(delay)
+        response = self.respond(prompt)
+        for start in range(0, len(response), self.chunk_size):
+            if self.chunk_latency and start:
+                await asyncio.sleep(self.chunk_latency)
+            yield response[start:start + self.chunk_size]
+
+class _InFlightCall:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class CoalescingBackend(ModelBackend):
+    """
+    Wraps a backend so that identical prompts in flight at the same time share one call.
+    The first caller for a prompt makes the call; later callers wait for its result.
+    """
+
+    def __init__(self, backend: ModelBackend):
+        self.backend = backend
+        self.name = backend.name
+        self.coalesced_count = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, _InFlightCall] = {}
+        self._async_inflight: dict[tuple, asyncio.Task] = {}
+
+    def generate(self, prompt: str) -> str:
+        with self._lock:
+            call = self._inflight.get(prompt)
+            leader = call is None
+            if leader:
+                call = self._inflight[prompt] = _InFlightCall()
+            else:
+                self.coalesced_count += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self.backend.generate(prompt)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[prompt]
+            call.done.set()
+        return call.result
+
+    async def agenerate(self, prompt: str) -> str:
+        loop = asyncio.get_running_loop()
+        # Tasks belong to a single event loop, so the loop is part of the key.
+        key = (loop, prompt)
+        task = self._async_inflight.get(key)
+        if task is None:
+            task = loop.create_task(self.backend.agenerate(prompt))
+            self._async_inflight[key] = task
+            task.add_done_callback(lambda _task: self._async_inflight.pop(key, None))
+        else:
+            self.coalesced_count += 1
+            tracing.current_span().set("coalesced", True)
+        # Shield the shared call so one cancelled waiter does not cancel it for the others.
+        return await asyncio.shield(task)
+
+    # Streams are consumed incrementally by a single reader, so they are not coalesced.
+    def stream(self, prompt: str):
+        return self.backend.stream(prompt)
+
+    def astream(self, prompt: str):
+        return self.backend.astream(prompt)
+
+    def discard(self, prompt: str) -> None:
+        self.backend.discard(prompt)
+
+_default_backend: ModelBackend = None
+
+def get_default_backend() -> ModelBackend:
+    """Returns the process-wide backend, creating the coalescing stub on first use."""
+    global _default_backend
+    if _default_backend is None:
+        _default_backend = CoalescingBackend(StubModel())
+    return _default_backend
+
+def set_default_backend(backend: ModelBackend) -> None:
+    """Replaces the process-wide backend used when callers do not pass one explicitly."""
+    global _default_backend
+    _default_backend = backend
+
+def generate(prompt: str, backend: ModelBackend = None) -> str:
+    """Sends a prompt to `backend` (or the default backend) and returns the response text."""
+    return (backend or get_default_backend()).generate(prompt)
+
+async def agenerate(prompt: str, backend: ModelBackend = None) -> str:
+    """Async counterpart of generate()."""
+    return await (backend or get_default_backend()).agenerate(prompt)
+
+CHARS_PER_TOKEN = 4  # Rough average for English text; good enough for budgeting and metrics.
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token-count estimate."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+# Optional retries for responses that parse to nothing or fail to parse; an object with
+# `attempts` and `delay(attempt)`, such as call_policy.RetryPolicy. None disables retries.
+_retry_policy = None
+
+def set_retry_policy(policy) -> None:
+    """Makes run_stage()/arun_stage() retry unusable responses according to `policy` (None disables)."""
+    global _retry_policy
+    _retry_policy = policy
+
+def _parse_response(parse, response: str) -> tuple:
+    if _retry_policy is None:
+        return parse(response), None
+    try:
+        return parse(response), None
+    except Exception as e:
+        return None, e
+
+def _should_retry(attempt: int, result, error) -> bool:
+    policy = _retry_policy
+    return policy is not None and (error is not None or not result) and attempt + 1 < policy.attempts
+
+def _discard(prompt: str, backend: ModelBackend) -> None:
+    # A retry resends the same prompt; a caching backend would otherwise answer it with
+    # the unusable response it has just stored.
+    (backend or get_default_backend()).discard(prompt)
+
+def run_stage(stage: str, build_prompt, args: tuple, parse, backend: ModelBackend = None):
+    """
+    Builds a prompt with build_prompt(*args), sends it to the model and parses the response.
+    When tracing is enabled, the stage and each of its three steps are recorded as spans
+    along with prompt/response sizes and estimated token counts. With a retry policy set,
+    a response that parses to nothing (or raises) is discarded from any response cache and
+    requested again after a jittered delay.
+    """
+    if not tracing.is_enabled() and _retry_policy is None:
+        return parse(generate(build_prompt(*args), backend))
+    with tracing.span(stage) as stage_span:
+        with tracing.span(f"{stage}.prompt_build"):
+            prompt = build_prompt(*args)
+        attempt = 0
+        while True:
+            with tracing.span(f"{stage}.model_call") as call_span:
+                response = generate(prompt, backend)
+                _record_sizes(call_span, prompt, response)
+            with tracing.span(f"{stage}.parse"):
+                result, error = _parse_response(parse, response)
+            if not _should_retry(attempt, result, error):
+                break
+            _discard(prompt, backend)
+            time.sleep(_retry_policy.delay(attempt))
+            attempt += 1
+            stage_span.set("retries", attempt)
+        if error is not None:
+            raise error
+        _record_sizes(stage_span, prompt, response)
+        stage_span.set("items", len(result))
+    return result
+
+async def arun_stage(stage: str, build_prompt, args: tuple, parse, backend: ModelBackend = None):
+    """Async counterpart of run_stage()."""
+    if not tracing.is_enabled() and _retry_policy is None:
+        return parse(await agenerate(build_prompt(*args), backend))
+    with tracing.span(stage) as stage_span:
+        with tracing.span(f"{stage}.prompt_build"):
+            prompt = build_prompt(*args)
+        attempt = 0
+        while True:
+            with tracing.span(f"{stage}.model_call") as call_span:
+                response = await agenerate(prompt, backend)
+                _record_sizes(call_span, prompt, response)
+            with tracing.span(f"{stage}.parse"):
+                result, error = _parse_response(parse, response)
+            if not _should_retry(attempt, result, error):
+                break
+            _discard(prompt, backend)
+            await asyncio.sleep(_retry_policy.delay(attempt))
+            attempt += 1
+            stage_span.set("retries", attempt)
+        if error is not None:
+            raise error
+        _record_sizes(stage_span, prompt, response)
+        stage_span.set("items", len(result))
+    return result
+
+def _record_sizes(span, prompt: str, response: str) -> None:
+    span.set("prompt_chars", len(prompt))
+    span.set("prompt_tokens", estimate_tokens(prompt))
+    span.set("response_chars", len(response))
+    span.set("response_tokens", estimate_tokens(response))
+
+def stream(prompt: str, backend: ModelBackend = None):
+    """Yields response chunks from `backend` (or the default backend) as they arrive."""
+    return (backend or get_default_backend()).stream(prompt)
+
+def astream(prompt: str, backend: ModelBackend = None):
+    """Async counterpart of stream(); returns an async iterator of chunks."""
+    return (backend or get_default_backend()).astream(prompt)
+
+if __name__ == '__main__':
+    stub = StubModel(responses=[("Say hi", "1. Hi there")], latency=0.1)
+    backend = CoalescingBackend(stub)
+
+    async def burst():
+        return await asyncio.gather(*(backend.agenerate("Say hi") for _ in range(50)))
+
+    results = asyncio.run(burst())
+    print(f"{len(results)} concurrent requests -> {stub.call_count} model call(s): {results[0]!r}")
+
+    threads = [threading.Thread(target=backend.generate, args=("Say hi",)) for _ in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"After threaded burst: {stub.call_count} model call(s), {backend.coalesced_count} coalesced")
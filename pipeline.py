@@ -0,0 +1,272 @@
+# pipeline.py
+
+import asyncio
+import inspect
+import time
+
+import llm_backend
+from comms_hub_ai import extract_feature_ideas_from_chat_async
+from presentation_builder_ai import generate_presentation_outline_async
+from task_manager_ai import breakdown_feature_into_tasks_async, suggest_sub_tasks_for_task_async
+
+# Concurrent DAG executor for multi-stage AI workflows.
+# A Pipeline is a set of named nodes; each node declares the nodes it depends on and
+# receives their results as keyword arguments. Every node starts as soon as its own
+# dependencies are done, so end-to-end latency is the length of the critical path
+# rather than the sum of all stages. Map nodes fan a function out over every item of a
+# dependency's (list) result in parallel. Nodes can have timeouts; when any node fails,
+# the remaining nodes are cancelled and the run raises PipelineError.
+
+class PipelineError(Exception):
+    """Raised when a pipeline node fails or times out; `node` names the failing node."""
+
+    def __init__(self, node: str, cause: BaseException):
+        if isinstance(cause, asyncio.TimeoutError):
+            message = f"Pipeline node '{node}' timed out"
+        else:
+            message = f"Pipeline node '{node}' failed: {cause!r}"
+        super().__init__(message)
+        self.node = node
+        self.cause = cause
+
+class _Node:
+    __slots__ = ("name", "func", "deps", "timeout", "map_over", "concurrency")
+
+    def __init__(self, name, func, deps, timeout, map_over=None, concurrency=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.map_over = map_over
+        self.concurrency = concurrency
+
+class PipelineResult:
+    """Node results plus per-node (start, end) times relative to the start of the run."""
+
+    def __init__(self, results: dict, timings: dict, elapsed: float):
+        self.results = results
+        self.timings = timings
+        self.elapsed = elapsed
+
+    def __getitem__(self, name: str):
+        return self.results[name]
+
+    def durations(self) -> dict[str, float]:
+        return {name: end - start for name, (start, end) in self.timings.items()}
+
+    def __repr__(self):
+        return f"PipelineResult(nodes={list(self.results)}, elapsed={self.elapsed:.3f}s)"
+
+async def _call(func, kwargs: dict):
+    # Plain functions run in a worker thread so they never block the event loop.
+    if inspect.iscoroutinefunction(func):
+        return await func(**kwargs)
+    return await asyncio.to_thread(func, **kwargs)
+
+class Pipeline:
+    def __init__(self):
+        self._nodes: dict[str, _Node] = {}
+
+    def add(self, name: str, func, deps=(), timeout: float = None) -> "Pipeline":
+        """Adds a node that calls func(**{dep: result}) once all `deps` are done."""
+        self._check_new(name)
+        self._nodes[name] = _Node(name, func, deps, timeout)
+        return self
+
+    def map(self, name: str, func, over: str, deps=(), timeout: float = None,
+            concurrency: int = None) -> "Pipeline":
+        """
+        Adds a fan-out node: calls func(item, **{dep: result}) for every item of node `over`'s
+        result, all in parallel (at most `concurrency` at a time), and returns the results in
+        item order. `timeout` applies to each call.
+        """
+        self._check_new(name)
+        self._nodes[name] = _Node(name, func, (over, *deps), timeout, map_over=over, concurrency=concurrency)
+        return self
+
+    def _check_new(self, name: str) -> None:
+        if name in self._nodes:
+            raise ValueError(f"Duplicate pipeline node '{name}'")
+
+    def _required(self, provided, targets) -> list[str]:
+        """Nodes needed for `targets`, in dependency order, skipping anything in `provided`."""
+        order = []
+        state = {}  # name -> "visiting" | "done"
+
+        def visit(name):
+            if name in provided or state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline has a cycle through '{name}'")
+            node = self._nodes.get(name)
+            if node is None:
+                raise ValueError(f"Unknown pipeline node or missing input '{name}'")
+            state[name] = "visiting"
+            for dep in node.deps:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+    async def run(self, inputs: dict = None, targets=None, timeout: float = None) -> PipelineResult:
+        """
+        Runs the pipeline. `inputs` pre-fills results by name (a provided node is not run,
+        nor is anything needed only by it). `targets` limits the run to those nodes and their
+        dependencies; by default the targets are the nodes nothing else depends on.
+        `timeout` bounds the whole run.
+        """
+        inputs = dict(inputs or {})
+        if targets is None:
+            depended_on = {dep for node in self._nodes.values() for dep in node.deps}
+            targets = [name for name in self._nodes if name not in depended_on]
+        order = self._required(inputs, targets)
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        futures = {name: loop.create_future() for name in inputs}
+        for name, value in inputs.items():
+            futures[name].set_result(value)
+        timings = {}
+        tasks = {}
+
+        async def run_node(node: _Node):
+            dep_results = {}
+            for dep in node.deps:
+                dep_results[dep] = await futures[dep]
+            node_started = time.perf_counter()
+            try:
+                if node.map_over is None:
+                    call = _call(node.func, dep_results)
+                    result = await asyncio.wait_for(call, node.timeout)
+                else:
+                    result = await self._run_map(node, dep_results)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                raise PipelineError(node.name, e) from e
+            timings[node.name] = (node_started - started, time.perf_counter() - started)
+            return result
+
+        for name in order:
+            futures[name] = loop.create_future()
+        for name in order:
+            task = loop.create_task(run_node(self._nodes[name]), name=f"pipeline:{name}")
+            task.add_done_callback(lambda t, name=name: _propagate(t, futures[name]))
+            tasks[name] = task
+
+        try:
+            await asyncio.wait_for(asyncio.gather(*tasks.values()), timeout)
+        except asyncio.TimeoutError as e:
+            raise PipelineError("<pipeline>", e) from e
+        finally:
+            # Cancels whatever is still running after a failure, timeout or outside cancellation.
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            for future in futures.values():
+                # Mark failures nobody waited on as retrieved; the first one was already raised.
+                if future.done() and not future.cancelled():
+                    future.exception()
+
+        results = {name: futures[name].result() for name in (*inputs, *order)}
+        return PipelineResult(results, timings, time.perf_counter() - started)
+
+    async def _run_map(self, node: _Node, dep_results: dict) -> list:
+        items = dep_results.pop(node.map_over)
+        # Each item is passed as the function's first parameter, by name.
+        item_parameter = next(iter(inspect.signature(node.func).parameters))
+        semaphore = asyncio.Semaphore(node.concurrency) if node.concurrency else None
+
+        async def run_item(item):
+            call = _call(node.func, {item_parameter: item, **dep_results})
+            if semaphore is None:
+                return await asyncio.wait_for(call, node.timeout)
+            async with semaphore:
+                return await asyncio.wait_for(call, node.timeout)
+
+        tasks = [asyncio.ensure_future(run_item(item)) for item in items]
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            # The first failure or timeout stops the remaining items instead of letting them
+            # spend model calls on a run that has already failed.
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+def _propagate(task: asyncio.Task, future: asyncio.Future) -> None:
+    if future.done():
+        return
+    if task.cancelled():
+        future.cancel()
+    elif task.exception() is not None:
+        future.set_exception(task.exception())
+    else:
+        future.set_result(task.result())
+
+# --- Comms Hub -> Task Manager -> Presentation Builder ---
+
+def build_feature_planning_pipeline(backend: llm_backend.ModelBackend = None, stage_timeout: float = None,
+                                    sub_task_concurrency: int = None) -> Pipeline:
+    """
+    The agent_computer_demo flow as a DAG:
+
+        chat_log -> feature_ideas -> feature_idea -> high_level_tasks -> sub_tasks (one call per task)
+                                                                     \\-> presentation_outline
+
+    Sub-task suggestion for every high-level task runs in parallel with each other and with
+    outline generation. Pass `feature_idea` as an input to skip the Comms Hub stage.
+    """
+    async def feature_ideas(chat_log):
+        return await extract_feature_ideas_from_chat_async(chat_log, backend)
+
+    def feature_idea(feature_ideas):
+        return feature_ideas[0] if feature_ideas else "Default Feature Idea if extraction fails"
+
+    async def high_level_tasks(feature_idea):
+        return await breakdown_feature_into_tasks_async(feature_idea, backend)
+
+    async def sub_tasks(high_level_task):
+        return await suggest_sub_tasks_for_task_async(high_level_task, backend)
+
+    async def presentation_outline(feature_idea, high_level_tasks):
+        return await generate_presentation_outline_async(feature_idea, high_level_tasks, backend)
+
+    return (
+        Pipeline()
+        .add("feature_ideas", feature_ideas, deps=["chat_log"], timeout=stage_timeout)
+        .add("feature_idea", feature_idea, deps=["feature_ideas"])
+        .add("high_level_tasks", high_level_tasks, deps=["feature_idea"], timeout=stage_timeout)
+        .map("sub_tasks", sub_tasks, over="high_level_tasks", timeout=stage_timeout,
+             concurrency=sub_task_concurrency)
+        .add("presentation_outline", presentation_outline, deps=["feature_idea", "high_level_tasks"],
+             timeout=stage_timeout)
+    )
+
+async def plan_feature(chat_log: str = None, feature_idea: str = None,
+                       backend: llm_backend.ModelBackend = None, stage_timeout: float = None) -> PipelineResult:
+    """Runs the full planning flow from a chat log, or from a feature idea if one is given."""
+    if chat_log is None and feature_idea is None:
+        raise ValueError("Either chat_log or feature_idea is required")
+    inputs = {"feature_idea": feature_idea} if feature_idea is not None else {"chat_log": chat_log}
+    pipeline = build_feature_planning_pipeline(backend, stage_timeout)
+    return await pipeline.run(inputs)
+
+if __name__ == '__main__':
+    # Every model call takes 0.2s: sequentially this flow would take 1 + 1 + 5 + 1 = 8 calls.
+    stub = llm_backend.StubModel(latency=0.2)
+    mock_chat_log = "Alice: Maybe we could flag messages as tasks?\nBob: A calendar integration would be amazing."
+    result = asyncio.run(plan_feature(chat_log=mock_chat_log, backend=stub))
+    print(result)
+    print(f"{stub.call_count} model calls of 0.2s each finished in {result.elapsed:.2f}s")
+    for task, sub_tasks in zip(result["high_level_tasks"], result["sub_tasks"]):
+        print(f"- {task} ({len(sub_tasks)} sub-tasks)")
+    for name, (start, end) in sorted(result.timings.items(), key=lambda item: item[1]):
+        print(f"  {name:22s} {start:.2f}s -> {end:.2f}s")
+
+    try:
+        asyncio.run(plan_feature(feature_idea="Dark mode", backend=llm_backend.StubModel(latency=0.5), stage_timeout=0.1))
+    except PipelineError as e:
+        print(f"With a 0.1s stage timeout: {e}")
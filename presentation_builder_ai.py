@@ -1,22 +1,63 @@
 # presentation_builder_ai.py
 
+import asyncio
 import re
 
+import list_parser
+import llm_backend
+import prompt_builder
+from demo_models import PresentationSlide
+
 # Aware of demo_models.PresentationSlide (e.g., PresentationSlide(slide_title: str, bullet_points: list[str]))
 # Aware of how feature ideas might come from comms_hub_ai.py
 # Aware of how task lists might come from task_manager_ai.py
 
-def generate_presentation_outline(feature_idea: str, task_list: list[str]) -> list[str]:
+OUTLINE_PROMPT_MARKER = "Please return *only* the slide titles as a numbered list"
+
+def _simulated_outline_response(prompt: str) -> str:
     """
-    Simulates using Gemini to generate a presentation outline (list of slide titles)
-    based on a feature idea and a list of high-level tasks.
+    Simulated Gemini response for outline prompts, served by llm_backend.StubModel.
+    This is a hardcoded example based on the sample_feature_idea and sample_task_list
+    in the `if __name__ == '__main__'` block.
+    Feature: "AI-Powered Recipe Recommendation Engine"
+    Tasks:
+    - "Develop user profiling module for dietary preferences."
+    - "Integrate with external recipe databases."
+    - "Build and train recipe scoring algorithm."
+    - "Design user interface for recipe discovery and meal planning."
+    """
+    match = re.search(r'Product Feature Idea:\s*"(.*)"', prompt)
+    feature_idea = match.group(1) if match else "your feature"
+    return f"""
+    Okay, based on the feature "{feature_idea}" and the provided tasks, here's a suggested presentation outline:
+
+    1.  Igniting Culinary Creativity: Introducing Your Personal AI Recipe Chef
+    2.  The Daily Dilemma: What's for Dinner? (And Why It's Hard)
+    3.  Solution on the Menu: The AI-Powered Recipe Recommendation Engine
+    4.  Taste the Future: Key Features & Personalized Benefits
+    5.  From Concept to Kitchen: Our Development Journey (Tasks: User Profiling, Database Integration, Algorithm Training, UI Design)
+    6.  Beyond the Recipe: Expanding Your Culinary Horizons
+    7.  Questions & Open Kitchen Discussion
     """
 
-    # 1. Prompt Engineering
-    # Convert task_list into a string for the prompt
-    tasks_string = "\n".join([f"- {task}" for task in task_list])
+llm_backend.register_simulated_response(OUTLINE_PROMPT_MARKER, _simulated_outline_response)
+
+SLIDE_PROMPT_MARKER = "Bullet points for this slide only:"
+
+def _simulated_slide_response(prompt: str) -> str:
+    """Simulated Gemini response for slide bullet prompts: three bullets about the slide's title."""
+    match = re.search(r'^\s*Slide \d+ of \d+: "(.*)"', prompt, re.MULTILINE)
+    title = match.group(1) if match else "this slide"
+    return f"""
+    Here are the bullet points for "{title}":
+    - Why "{title}" matters to our users
+    - What we are building for "{title}"
+    - How we will measure success for "{title}"
+    """
 
-    prompt_to_gemini = f"""
+llm_backend.register_simulated_response(SLIDE_PROMPT_MARKER, _simulated_slide_response)
+
+OUTLINE_TEMPLATE = prompt_builder.PromptTemplate(f"""
     I need to create a presentation for a new product feature.
     Please generate a list of 5-7 relevant and engaging slide titles for this presentation.
     The presentation should have a logical flow, such as:
@@ -28,59 +69,159 @@ def generate_presentation_outline(feature_idea: str, task_list: list[str]) -> li
     6.  Call to Action / Next Steps / Q&A
 
     Product Feature Idea:
-    "{feature_idea}"
+    "{{feature_idea}}"
 
     High-Level Project Tasks:
-    {tasks_string}
+    {{tasks_string}}
 
-    Please return *only* the slide titles as a numbered list, each on a new line.
+    {OUTLINE_PROMPT_MARKER}, each on a new line.
     For example:
     1. Title for Slide 1
     2. Title for Slide 2
     ...
+    """)
+
+def _task_bullet(task: str) -> str:
+    return f"- {task}"
+
+def build_outline_prompt(feature_idea: str, task_list: list[str], token_budget: int = None) -> str:
+    """
+    Builds the prompt asking Gemini for a list of slide titles.
+    Task lists over `token_budget` (prompt_builder.DEFAULT_TOKEN_BUDGET by default) keep their
+    leading distinct tasks, with a note summarising the rest.
     """
+    # The task list becomes one "- task" line per task, trimmed to the budget if needed.
+    tasks_string = prompt_builder.Section(task_list, format_item=_task_bullet, prefer="first",
+                                          noun="more tasks")
+    return prompt_builder.render_within_budget(OUTLINE_TEMPLATE, token_budget,
+                                               feature_idea=feature_idea, tasks_string=tasks_string)
 
-    # 2. Simulate Gemini's Response
-    # This is a hardcoded example based on the sample_feature_idea and sample_task_list
-    # in the `if __name__ == '__main__'` block.
-    # Feature: "AI-Powered Recipe Recommendation Engine"
-    # Tasks:
-    # - "Develop user profiling module for dietary preferences."
-    # - "Integrate with external recipe databases."
-    # - "Build and train recipe scoring algorithm."
-    # - "Design user interface for recipe discovery and meal planning."
-
-    simulated_gemini_response = f"""
-    Okay, based on the feature "{feature_idea}" and the provided tasks, here's a suggested presentation outline:
+# Removes any trailing parenthetical task list (like "(Tasks: ...)") from a slide title.
+_TASKS_SUFFIX = re.compile(r"\s*\(Tasks:.*\)\s*$")
 
-    1.  Igniting Culinary Creativity: Introducing Your Personal AI Recipe Chef
-    2.  The Daily Dilemma: What's for Dinner? (And Why It's Hard)
-    3.  Solution on the Menu: The AI-Powered Recipe Recommendation Engine
-    4.  Taste the Future: Key Features & Personalized Benefits
-    5.  From Concept to Kitchen: Our Development Journey (Tasks: User Profiling, Database Integration, Algorithm Training, UI Design)
-    6.  Beyond the Recipe: Expanding Your Culinary Horizons
-    7.  Questions & Open Kitchen Discussion
+def _clean_slide_title(title_candidate: str) -> str:
+    return _TASKS_SUFFIX.sub("", title_candidate)
+
+def parse_slide_titles(response: str) -> list[str]:
+    """Extracts slide titles from a Gemini response."""
+    # Numbered list items; any "Tasks: ..." parenthetical Gemini appends to a title
+    # (e.g. on the "How it Works" slide) is stripped.
+    return list_parser.parse_list(response, list_parser.NUMBERED, clean=_clean_slide_title)
+
+def generate_presentation_outline(feature_idea: str, task_list: list[str], backend: llm_backend.ModelBackend = None) -> list[str]:
+    """
+    Uses Gemini (the stub model by default) to generate a presentation outline (list of slide titles)
+    based on a feature idea and a list of high-level tasks.
     """
-    # In a real scenario: actual_response = call_gemini_api(prompt_to_gemini)
-    # For now, use the simulated response.
-
-    # 3. Parsing: Extract slide titles from the simulated response
-    slide_titles = []
-    # Regex to find lines starting with a number, a period, and a space,
-    # and capture the text after that.
-    # We also want to make sure we don't capture the "Tasks: ..." part if it's on the same line,
-    # so we'll specifically stop before an opening parenthesis that might denote a list of tasks.
-    # A more robust way is to first get the full line, then strip the task part.
-
-    # Initial match for numbered list items
-    matches = re.findall(r"^\s*\d+\.\s+(.+)", simulated_gemini_response, re.MULTILINE)
-    if matches:
-        for title_candidate in matches:
-            # Remove any trailing parenthetical task list (like "(Tasks: ...)")
-            cleaned_title = re.sub(r"\s*\(Tasks:.*\)\s*$", "", title_candidate)
-            slide_titles.append(cleaned_title.strip())
-            
-    return slide_titles
+    return llm_backend.run_stage("presentation_builder.generate_outline", build_outline_prompt,
+                                 (feature_idea, task_list), parse_slide_titles, backend)
+
+async def generate_presentation_outline_async(feature_idea: str, task_list: list[str], backend: llm_backend.ModelBackend = None) -> list[str]:
+    """Async counterpart of generate_presentation_outline()."""
+    return await llm_backend.arun_stage("presentation_builder.generate_outline", build_outline_prompt,
+                                        (feature_idea, task_list), parse_slide_titles, backend)
+
+def generate_presentation_outline_stream(feature_idea: str, task_list: list[str], backend: llm_backend.ModelBackend = None):
+    """Yields each slide title as soon as the model has finished generating its line."""
+    chunks = llm_backend.stream(build_outline_prompt(feature_idea, task_list), backend)
+    yield from list_parser.iter_list_items(chunks, list_parser.NUMBERED, clean=_clean_slide_title)
+
+def generate_presentation_outline_astream(feature_idea: str, task_list: list[str], backend: llm_backend.ModelBackend = None):
+    """Async counterpart of generate_presentation_outline_stream(); returns an async iterator."""
+    chunks = llm_backend.astream(build_outline_prompt(feature_idea, task_list), backend)
+    return list_parser.aiter_list_items(chunks, list_parser.NUMBERED, clean=_clean_slide_title)
+
+# Every slide prompt starts with the same deck context (feature, tasks and the whole outline),
+# so the slides stay consistent with each other and a backend with prompt caching only
+# processes the shared prefix once. Only the short slide-specific suffix differs.
+DECK_CONTEXT_TEMPLATE = prompt_builder.PromptTemplate("""
+    I am writing the slides of a presentation for a new product feature.
+
+    Product Feature Idea:
+    "{feature_idea}"
+
+    High-Level Project Tasks:
+    {tasks_string}
+
+    Presentation Outline:
+    {outline}
+    """)
+
+SLIDE_TEMPLATE = prompt_builder.PromptTemplate(f"""
+    Write 3-5 concise bullet points for the slide below. Do not repeat content that belongs
+    on other slides of the outline.
+
+    Slide {{slide_number}} of {{slide_count}}: "{{slide_title}}"
+
+    {SLIDE_PROMPT_MARKER}
+    - First point
+    - Second point
+    """)
+
+def _numbered_title(numbered: tuple) -> str:
+    return f"{numbered[0]}. {numbered[1]}"
+
+def build_deck_context(feature_idea: str, task_list: list[str], slide_titles: list[str],
+                       token_budget: int = None) -> str:
+    """Builds the prompt prefix shared by every slide of a deck; long task lists are trimmed to the budget."""
+    tasks_string = prompt_builder.Section(task_list, format_item=_task_bullet, prefer="first", noun="more tasks")
+    outline = prompt_builder.Section(list(enumerate(slide_titles, 1)), joiner="\n    ", format_item=_numbered_title,
+                                     prefer="first", noun="more slides")
+    return prompt_builder.render_within_budget(DECK_CONTEXT_TEMPLATE, token_budget, feature_idea=feature_idea,
+                                               tasks_string=tasks_string, outline=outline)
+
+def build_slide_prompt(deck_context: str, slide_number: int, slide_count: int, slide_title: str) -> str:
+    """Builds the prompt asking Gemini for one slide's bullet points."""
+    return deck_context + SLIDE_TEMPLATE.render(slide_number=slide_number, slide_count=slide_count,
+                                                slide_title=slide_title)
+
+def parse_slide_bullets(response: str) -> list[str]:
+    """Extracts a slide's bullet points from a Gemini response."""
+    return list_parser.parse_list(response, list_parser.BULLETED)
+
+async def generate_slide_bullets_async(deck_context: str, slide_number: int, slide_count: int, slide_title: str,
+                                       backend: llm_backend.ModelBackend = None) -> list[str]:
+    """Generates the bullet points of one slide of a deck whose context was built by build_deck_context()."""
+    return await llm_backend.arun_stage("presentation_builder.generate_slide", build_slide_prompt,
+                                        (deck_context, slide_number, slide_count, slide_title),
+                                        parse_slide_bullets, backend)
+
+async def generate_presentation_slides_astream(feature_idea: str, task_list: list[str], slide_titles: list[str] = None,
+                                               backend: llm_backend.ModelBackend = None, concurrency: int = None):
+    """
+    Yields a PresentationSlide with bullet points for every slide, in outline order. The outline
+    is generated first unless `slide_titles` is given. All slides are generated concurrently
+    (at most `concurrency` at once, if set), and each slide is yielded as soon as it and every
+    slide before it are done, so a deck takes about as long as its slowest slide.
+    """
+    if slide_titles is None:
+        slide_titles = await generate_presentation_outline_async(feature_idea, task_list, backend)
+    deck_context = build_deck_context(feature_idea, task_list, slide_titles)
+    semaphore = asyncio.Semaphore(concurrency) if concurrency else None
+
+    async def generate(number: int, title: str) -> list[str]:
+        if semaphore is None:
+            return await generate_slide_bullets_async(deck_context, number, len(slide_titles), title, backend)
+        async with semaphore:
+            return await generate_slide_bullets_async(deck_context, number, len(slide_titles), title, backend)
+
+    pending = [asyncio.ensure_future(generate(number, title)) for number, title in enumerate(slide_titles, 1)]
+    try:
+        for title, bullets in zip(slide_titles, pending):
+            yield PresentationSlide(title, await bullets)
+    finally:
+        # Stopping early (or a failed slide) cancels the slides still being generated and
+        # waits for them to finish unwinding.
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+async def generate_presentation_slides_async(feature_idea: str, task_list: list[str], slide_titles: list[str] = None,
+                                             backend: llm_backend.ModelBackend = None,
+                                             concurrency: int = None) -> list[PresentationSlide]:
+    """Collects generate_presentation_slides_astream() into a list of slides."""
+    return [slide async for slide in generate_presentation_slides_astream(feature_idea, task_list, slide_titles,
+                                                                          backend, concurrency)]
 
 if __name__ == '__main__':
     sample_feature_idea = "AI-Powered Recipe Recommendation Engine"
@@ -119,10 +260,10 @@ if __name__ == '__main__':
     for task in sample_task_list_2:
         print(f"- {task}")
     print("\n--- Generating Presentation Outline (Simulated Gemini for 2nd example) ---")
-    # NOTE: The simulated_gemini_response inside the function is currently STATIC and tailored
+    # NOTE: The simulated response served by the stub model is currently STATIC and tailored
     # to the FIRST example. So, this second call will still use the *logic* of the function,
     # but the *output content* will be from the first example's simulation.
-    # For a dynamic simulation, the simulated_gemini_response itself would need to change
+    # For a dynamic simulation, _simulated_outline_response itself would need to change
     # based on the input, which is beyond the scope of this specific hardcoded simulation.
     presentation_titles_2 = generate_presentation_outline(sample_feature_idea_2, sample_task_list_2)
 
@@ -132,3 +273,19 @@ if __name__ == '__main__':
             print(f"{i}. {title}")
     else:
         print("No slide titles were generated (or parsing failed).")
+
+    # Full slides for the first example: every slide's bullet points are generated at once.
+    import time
+
+    async def stream_deck():
+        stub = llm_backend.StubModel(latency=0.05)
+        started = time.perf_counter()
+        async for slide in generate_presentation_slides_astream(sample_feature_idea, sample_task_list,
+                                                                presentation_titles, stub):
+            print(f"\n[{time.perf_counter() - started:.2f}s] {slide.slide_title}")
+            for bullet in slide.bullet_points:
+                print(f"  - {bullet}")
+        print(f"\n{stub.call_count} slides of 0.05s each in {time.perf_counter() - started:.2f}s")
+
+    print("\n--- Generating Full Slides (Simulated Gemini) ---")
+    asyncio.run(stream_deck())
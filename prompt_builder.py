@@ -0,0 +1,234 @@
+# prompt_builder.py
+
+import re
+import string
+from collections import Counter
+
+from llm_backend import CHARS_PER_TOKEN, estimate_tokens
+
+# Token-budgeted prompt construction.
+# PromptTemplate parses a template once into literal chunks and named slots, so rendering is
+# a single join. render_within_budget() keeps the whole prompt under a token budget: the
+# template text and plain values are fixed costs, and list-valued "sections" (chat lines,
+# task lists) share what is left. A section that does not fit is deduplicated, then filled
+# with its most recent (or first) items, skipping near-duplicates of items already kept,
+# and the dropped items are replaced by a one-line summary note. Prompts that already fit
+# are rendered exactly as the plain template would render them.
+
+DEFAULT_TOKEN_BUDGET = 6000
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can could do for from had has have i if in is it its just like "
+    "maybe me more my no not of on or our so that the their them then there this to too us was we "
+    "what when which who will with would you your yes oh hey ok okay also think".split()
+)
+
+class PromptTemplate:
+    """A `{name}`-style template compiled once into literal chunks and slot names."""
+
+    __slots__ = ("text", "_parts", "fields", "fixed_tokens")
+
+    def __init__(self, text: str):
+        self.text = text
+        self._parts = []
+        fields = []
+        for literal, field, format_spec, conversion in string.Formatter().parse(text):
+            if format_spec or conversion:
+                raise ValueError(f"Template field {field!r} may not use a format spec or conversion")
+            if literal:
+                self._parts.append((True, literal))
+            if field is not None:
+                if not field.isidentifier():
+                    raise ValueError(f"Template field {field!r} must be a plain name")
+                self._parts.append((False, field))
+                fields.append(field)
+        self.fields = tuple(fields)
+        self.fixed_tokens = estimate_tokens("".join(part for is_literal, part in self._parts if is_literal))
+
+    def render(self, **values) -> str:
+        return "".join(part if is_literal else str(values[part]) for is_literal, part in self._parts)
+
+class Section:
+    """
+    A list-valued template slot that may be cut down to fit the budget.
+    `prefer` is "recent" (keep the last items, e.g. chat lines) or "first" (keep the leading
+    items, e.g. ordered task lists). `original`, if given, is the exact text to use when
+    every item fits. `weight` sets its share of the budget relative to other sections.
+    """
+
+    __slots__ = ("items", "joiner", "format_item", "prefer", "original", "weight", "noun")
+
+    def __init__(self, items, joiner: str = "\n", format_item=None, prefer: str = "recent",
+                 original: str = None, weight: float = 1.0, noun: str = "items"):
+        if prefer not in ("recent", "first"):
+            raise ValueError("prefer must be 'recent' or 'first'")
+        self.items = list(items)
+        self.joiner = joiner
+        self.format_item = format_item
+        self.prefer = prefer
+        self.original = original
+        self.weight = weight
+        self.noun = noun
+
+    def render_all(self) -> str:
+        if self.original is not None:
+            return self.original
+        return self.joiner.join(self._format(item) for item in self.items)
+
+    def _format(self, item: str) -> str:
+        return self.format_item(item) if self.format_item is not None else item
+
+def _signature(text: str) -> frozenset:
+    # Content words only: numbers and filler words do not make two lines distinct.
+    return frozenset(word for word in _WORD.findall(text.lower())
+                     if word not in _STOPWORDS and not word.isdigit())
+
+def _similar(a: frozenset, b: frozenset, threshold: float) -> bool:
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= threshold
+
+def truncate_text(text: str, token_budget: int, marker: str = " [...] ") -> str:
+    """Shortens `text` to about `token_budget` tokens, keeping its start and end."""
+    if estimate_tokens(text) <= token_budget:
+        return text
+    keep_chars = max(0, token_budget * CHARS_PER_TOKEN - len(marker))
+    head = keep_chars * 2 // 3
+    tail = keep_chars - head
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+def topic_words(text: str) -> list[str]:
+    """The lower-cased content words of `text`: no stopwords, numbers or words under three letters."""
+    return [word for word in _WORD.findall(text.lower())
+            if word not in _STOPWORDS and len(word) > 2 and not word.isdigit()]
+
+def summarize_omitted(items: list[str], noun: str, max_keywords: int = 6) -> str:
+    """A one-line extractive note standing in for dropped items: count plus frequent topics."""
+    counts = Counter()
+    # Topics come from an evenly spread sample, so huge sections stay cheap to summarise.
+    step = max(1, len(items) // 256)
+    for item in items[::step]:
+        counts.update(topic_words(item))
+    keywords = [word for word, _ in counts.most_common(max_keywords)]
+    note = f"[{len(items)} {noun} omitted"
+    if keywords:
+        note += f"; frequent topics: {', '.join(keywords)}"
+    return note + "]"
+
+def fit_section(section: Section, token_budget: int, similarity: float = 0.8,
+                max_item_tokens: int = None) -> str:
+    """Renders `section` in at most `token_budget` estimated tokens."""
+    full = section.render_all()
+    if estimate_tokens(full) <= token_budget:
+        return full
+
+    order = range(len(section.items) - 1, -1, -1) if section.prefer == "recent" else range(len(section.items))
+    joiner_tokens = estimate_tokens(section.joiner) if section.joiner else 0
+    item_cap = max_item_tokens or max(8, token_budget // 4)
+    seen_keys = set()
+    kept_signatures = []
+    seen_signatures = set()
+    kept = []      # (index, rendered text)
+    omitted = []   # item texts, for the summary note
+    # Reserve room for the omission note.
+    remaining = token_budget - 24
+
+    # Walk from the preferred end, keeping items that fit and are neither exact duplicates
+    # (ignoring case and punctuation) nor near-duplicates of items already kept. Once the budget
+    # is (nearly) spent, everything not yet visited is omitted without further checks.
+    for position, index in enumerate(order):
+        if remaining < 4:
+            omitted.extend(map(section.items.__getitem__, order[position:]))
+            break
+        item = section.items[index]
+        key = " ".join(_WORD.findall(item.lower()))
+        if key in seen_keys:
+            omitted.append(item)
+            continue
+        seen_keys.add(key)
+        signature = _signature(item)
+        # Identical content words are a set lookup; the fuzzy comparison only looks at the
+        # most recently kept items, so this stays linear.
+        if signature in seen_signatures or any(_similar(signature, other, similarity)
+                                               for other in kept_signatures[-64:]):
+            omitted.append(item)
+            continue
+        text = truncate_text(section._format(item), item_cap)
+        cost = estimate_tokens(text) + joiner_tokens
+        if cost > remaining:
+            omitted.append(item)
+            continue
+        remaining -= cost
+        kept.append((index, text))
+        kept_signatures.append(signature)
+        seen_signatures.add(signature)
+
+    kept.sort()
+    lines = [text for _, text in kept]
+    if omitted:
+        note = summarize_omitted(omitted, section.noun)
+        if section.prefer == "recent":
+            lines.insert(0, note)
+        else:
+            lines.append(note)
+    return section.joiner.join(lines)
+
+def render_within_budget(template: PromptTemplate, token_budget: int = None, **values) -> str:
+    """
+    Renders `template` so the result stays within `token_budget` (DEFAULT_TOKEN_BUDGET when
+    None). Section values are fitted into the budget left after the template text and the
+    plain values; plain values larger than that are truncated themselves.
+    """
+    token_budget = DEFAULT_TOKEN_BUDGET if token_budget is None else token_budget
+    sections = {name: value for name, value in values.items() if isinstance(value, Section)}
+    plain = {name: str(value) for name, value in values.items() if not isinstance(value, Section)}
+
+    available = token_budget - template.fixed_tokens
+    plain_tokens = sum(estimate_tokens(value) for value in plain.values())
+    if plain_tokens > available // 2 and plain:
+        # Oversized plain values (e.g. a pasted essay as a feature idea) get at most half the room.
+        share = max(1, (available // 2) // len(plain))
+        plain = {name: truncate_text(value, share) for name, value in plain.items()}
+        plain_tokens = sum(estimate_tokens(value) for value in plain.values())
+    available -= plain_tokens
+
+    rendered = {}
+    if sections:
+        # Sections that fit in their share give the leftover to the others.
+        full = {name: section.render_all() for name, section in sections.items()}
+        needs = {name: estimate_tokens(text) for name, text in full.items()}
+        if sum(needs.values()) <= available:
+            rendered = full
+        else:
+            pending = dict(sections)
+            while pending:
+                total_weight = sum(section.weight for section in pending.values())
+                shares = {name: int(available * section.weight / total_weight) for name, section in pending.items()}
+                fitting = [name for name in pending if needs[name] <= shares[name]]
+                if not fitting:
+                    for name, section in pending.items():
+                        rendered[name] = fit_section(section, max(0, shares[name]))
+                    break
+                for name in fitting:
+                    rendered[name] = full[name]
+                    available -= needs[name]
+                    del pending[name]
+    return template.render(**plain, **rendered)
+
+if __name__ == '__main__':
+    from comms_hub_ai import build_feature_extraction_prompt
+    from presentation_builder_ai import build_outline_prompt
+
+    chat_lines = []
+    for i in range(5000):
+        chat_lines.append(f"Alice: the calendar integration keeps coming up, message {i % 50}")
+        chat_lines.append("Bob: Maybe we could flag messages as tasks?")
+    chat_lines.append("Carol: Honestly the thing I want most is a dark mode.")
+    prompt = build_feature_extraction_prompt("\n".join(chat_lines), token_budget=400)
+    print(f"Chat prompt: {estimate_tokens(prompt)} tokens (budget 400), from {len(chat_lines)} lines")
+    print(prompt)
+
+    tasks = [f"Task {i}: build and ship component number {i}" for i in range(2000)]
+    outline_prompt = build_outline_prompt("AI Meeting Scheduler", tasks, token_budget=500)
+    print(f"Outline prompt: {estimate_tokens(outline_prompt)} tokens (budget 500), from {len(tasks)} tasks")
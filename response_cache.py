@@ -0,0 +1,277 @@
+# response_cache.py
+
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import llm_backend
+import tracing
+
+# Prompt-keyed response cache for model calls.
+# The prompts built by the *_ai modules are deterministic, so the same feature idea or task list
+# always produces the same prompt text. Keys are a hash of the whitespace-normalized prompt plus
+# the model name and generation parameters. Entries live in a size-bounded in-memory LRU tier with
+# TTL expiry, and optionally in an on-disk SQLite tier that survives process restarts.
+
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapses runs of whitespace so indentation differences do not change the cache key."""
+    return _WHITESPACE.sub(" ", prompt).strip()
+
+def make_cache_key(prompt: str, model: str = "", params: dict = None) -> str:
+    """Returns a stable hex key for a prompt/model/params combination."""
+    hasher = hashlib.sha256()
+    hasher.update(model.encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(json.dumps(params or {}, sort_keys=True, separators=(",", ":")).encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(normalize_prompt(prompt).encode("utf-8"))
+    return hasher.hexdigest()
+
+class CacheStats:
+    """Hit/miss/eviction counters for a ResponseCache."""
+
+    __slots__ = ("hits", "disk_hits", "misses", "evictions", "expirations")
+
+    def __init__(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        stats = {name: getattr(self, name) for name in self.__slots__}
+        stats["hit_rate"] = self.hit_rate()
+        return stats
+
+    def __repr__(self):
+        return f"CacheStats({self.as_dict()})"
+
+class ResponseCache:
+    """
+    Two-tier response cache: an in-memory LRU bounded by `max_entries`, and an optional
+    SQLite file at `disk_path`. `ttl` is in seconds; None means entries never expire.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = None, disk_path: str = None):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._entries: OrderedDict = OrderedDict()  # key -> (response, expires_at)
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path is not None:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires_at REAL)"
+            )
+            self._db.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def has_disk_tier(self) -> bool:
+        return self._db is not None
+
+    def get(self, key: str):
+        """Returns the cached response for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.stats.hits += 1
+                    return response
+                del self._entries[key]
+                self.stats.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    response, expires_at = row
+                    if expires_at is None or expires_at > now:
+                        # Promote into the memory tier so the next lookup skips the disk.
+                        self._store_in_memory(key, response, expires_at)
+                        self.stats.hits += 1
+                        self.stats.disk_hits += 1
+                        return response
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.stats.expirations += 1
+
+            self.stats.misses += 1
+            return None
+
+    def put(self, key: str, response: str, ttl: float = None) -> None:
+        """Stores a response. `ttl` overrides the cache-wide TTL for this entry."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._store_in_memory(key, response, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, expires_at) VALUES (?, ?, ?)",
+                    (key, response, expires_at),
+                )
+                self._db.commit()
+
+    def discard(self, key: str) -> bool:
+        """Removes `key` from both tiers; returns whether it was cached."""
+        with self._lock:
+            found = self._entries.pop(key, None) is not None
+            if self._db is not None:
+                cursor = self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                found = found or cursor.rowcount > 0
+        return found
+
+    def _store_in_memory(self, key: str, response: str, expires_at) -> None:
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def purge_expired(self) -> int:
+        """Drops expired entries from both tiers and returns how many were removed."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for key in [k for k, (_, exp) in self._entries.items() if exp is not None and exp <= now]:
+                del self._entries[key]
+                removed += 1
+            if self._db is not None:
+                cursor = self._db.execute(
+                    "DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+                )
+                self._db.commit()
+                removed += cursor.rowcount
+        self.stats.expirations += removed
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+class CachingBackend(llm_backend.ModelBackend):
+    """
+    Serves repeated prompts from a ResponseCache and only calls `backend` on a miss.
+    Empty responses are not cached, and discard() drops a response that turned out unusable.
+    """
+
+    def __init__(self, backend: llm_backend.ModelBackend, cache: ResponseCache = None, params: dict = None):
+        self.backend = backend
+        self.name = backend.name
+        self.cache = cache if cache is not None else ResponseCache()
+        self.params = params or {}
+
+    def cache_key(self, prompt: str) -> str:
+        return make_cache_key(prompt, self.name, self.params)
+
+    def _put(self, key: str, response: str) -> None:
+        if response.strip():
+            self.cache.put(key, response)
+
+    def discard(self, prompt: str) -> None:
+        self.cache.discard(self.cache_key(prompt))
+        self.backend.discard(prompt)
+
+    def generate(self, prompt: str) -> str:
+        key = self.cache_key(prompt)
+        response = self.cache.get(key)
+        tracing.current_span().set("cache", "miss" if response is None else "hit")
+        if response is None:
+            response = self.backend.generate(prompt)
+            self._put(key, response)
+        return response
+
+    async def _aget(self, key: str):
+        # SQLite lookups and writes block, so the disk tier is used off the event loop.
+        if self.cache.has_disk_tier:
+            return await asyncio.to_thread(self.cache.get, key)
+        return self.cache.get(key)
+
+    async def _aput(self, key: str, response: str) -> None:
+        if self.cache.has_disk_tier:
+            await asyncio.to_thread(self._put, key, response)
+        else:
+            self._put(key, response)
+
+    async def agenerate(self, prompt: str) -> str:
+        key = self.cache_key(prompt)
+        response = await self._aget(key)
+        tracing.current_span().set("cache", "miss" if response is None else "hit")
+        if response is None:
+            response = await self.backend.agenerate(prompt)
+            await self._aput(key, response)
+        return response
+
+    def stream(self, prompt: str):
+        key = self.cache_key(prompt)
+        response = self.cache.get(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        for chunk in self.backend.stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self._put(key, "".join(chunks))
+
+    async def astream(self, prompt: str):
+        key = self.cache_key(prompt)
+        response = await self._aget(key)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        async for chunk in self.backend.astream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        await self._aput(key, "".join(chunks))
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    from task_manager_ai import breakdown_feature_into_tasks
+
+    stub = llm_backend.StubModel()
+    path = os.path.join(tempfile.mkdtemp(), "responses.sqlite")
+    backend = CachingBackend(llm_backend.CoalescingBackend(stub), ResponseCache(max_entries=2, ttl=3600, disk_path=path))
+
+    for idea in ["Dark mode", "Dark   mode", "Message search", "Email sharing", "Dark mode"]:
+        breakdown_feature_into_tasks(idea, backend=backend)
+    print(f"Model calls: {stub.call_count}, {backend.cache.stats}")
+
+    # A fresh cache over the same file answers from the disk tier.
+    restarted = CachingBackend(stub, ResponseCache(max_entries=2, disk_path=path))
+    breakdown_feature_into_tasks("Message search", backend=restarted)
+    print(f"After restart: model calls: {stub.call_count}, {restarted.cache.stats}")
@@ -0,0 +1,440 @@
+# scheduler.py
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+import llm_backend
+import tracing
+from llm_backend import estimate_tokens
+
+# Admission control for model calls.
+# Every call waits for a ticket from a Scheduler before it reaches the model. Tickets are
+# handed out by a dispatcher thread that enforces:
+#   - a concurrency limit (calls in flight at once);
+#   - token buckets for requests per minute and (estimated) tokens per minute;
+#   - priority classes: interactive work goes before batch work, with one batch call let
+#     through after every `interactive_burst` interactive calls so batch never starves;
+#   - fairness: within a class, tenants take turns (round robin), so one tenant's bulk
+#     job cannot fill every slot;
+#   - bounded queues: once a class has `max_queued` waiting calls, producers block (or get
+#     SchedulerFull with block=False) until a slot frees up.
+# The priority and tenant of a call come from request_context(), a context variable that
+# follows threads and asyncio tasks like tracing spans do. SchedulingBackend wraps any
+# backend, and install() puts the scheduler in front of the default backend, so every
+# *_ai function goes through it unchanged.
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+DEFAULT_TENANT = "default"
+
+_request = contextvars.ContextVar("scheduler_request", default=(INTERACTIVE, DEFAULT_TENANT))
+
+@contextmanager
+def request_context(priority: str = None, tenant: str = None):
+    """Sets the priority class and/or tenant for model calls made inside the block."""
+    current_priority, current_tenant = _request.get()
+    priority = priority or current_priority
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}; expected one of {PRIORITIES}")
+    token = _request.set((priority, tenant or current_tenant))
+    try:
+        yield
+    finally:
+        _request.reset(token)
+
+class SchedulerFull(Exception):
+    """Raised by a non-blocking submit when the priority class's queue is full."""
+
+class TokenBucket:
+    """Refills at `rate` per second up to `capacity`; a debit may take the level below zero."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` (capped at capacity, so huge requests still run) is available."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.level -= amount
+
+def _per_minute(limit: float):
+    return TokenBucket(limit / 60.0, limit) if limit else None
+
+def _set_done(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+class _Waiter:
+    """A wake-up that works for a blocked thread (Event) or an awaiting coroutine (Future)."""
+
+    __slots__ = ("event", "loop", "future")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_set_done, self.future)
+
+class Ticket:
+    """One admitted (or waiting) model call."""
+
+    __slots__ = ("priority", "tenant", "tokens", "enqueued", "wait", "state", "_waiter")
+
+    def __init__(self, priority: str, tenant: str, tokens: int, waiter: _Waiter):
+        self.priority = priority
+        self.tenant = tenant
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.wait = 0.0
+        self.state = "queued"  # -> "granted" -> "released"
+        self._waiter = waiter
+
+class Scheduler:
+    def __init__(self, max_concurrency: int = 8, requests_per_minute: float = None,
+                 tokens_per_minute: float = None, max_queued: int = 256, interactive_burst: int = 16):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self.interactive_burst = interactive_burst
+        self._request_bucket = _per_minute(requests_per_minute)
+        self._token_bucket = _per_minute(tokens_per_minute)
+        self._condition = threading.Condition()
+        # priority -> OrderedDict(tenant -> deque of tickets); the first tenant is served next.
+        self._queues = {priority: OrderedDict() for priority in PRIORITIES}
+        self._queued = dict.fromkeys(PRIORITIES, 0)
+        self._space_waiters = {priority: deque() for priority in PRIORITIES}
+        self._in_flight = 0
+        self._interactive_streak = 0
+        self._dispatcher = None
+        self._closed = False
+        # Metrics.
+        self._wait_histograms = {priority: tracing.Histogram() for priority in PRIORITIES}
+        self._counters = {priority: dict.fromkeys(("submitted", "dispatched", "rejected", "cancelled"), 0)
+                          for priority in PRIORITIES}
+        self._tenant_dispatched: dict[str, int] = {}
+
+    # --- Submitting ---
+
+    def _enqueue(self, tokens: int, priority: str, tenant: str, waiter: _Waiter) -> Ticket:
+        ticket = Ticket(priority, tenant, tokens, waiter)
+        self._queues[priority].setdefault(tenant, deque()).append(ticket)
+        self._queued[priority] += 1
+        self._counters[priority]["submitted"] += 1
+        if self._dispatcher is None:
+            self._dispatcher = threading.Thread(target=self._run, name="model-call-scheduler", daemon=True)
+            self._dispatcher.start()
+        self._condition.notify_all()
+        return ticket
+
+    def _resolve_request(self, priority: str, tenant: str) -> tuple:
+        default_priority, default_tenant = _request.get()
+        return priority or default_priority, tenant or default_tenant
+
+    def acquire(self, tokens: int = 0, priority: str = None, tenant: str = None, block: bool = True,
+                timeout: float = None) -> Ticket:
+        """
+        Blocks until a call costing `tokens` may run and returns its ticket; pass the ticket
+        to release() afterwards. Raises SchedulerFull (block=False) or TimeoutError.
+        """
+        priority, tenant = self._resolve_request(priority, tenant)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self._queued[priority] >= self.max_queued:
+                if not block:
+                    self._counters[priority]["rejected"] += 1
+                    raise SchedulerFull(f"{priority} queue is full ({self.max_queued} waiting)")
+                space = _Waiter()
+                self._space_waiters[priority].append(space)
+                self._condition.release()
+                try:
+                    woken = space.event.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                finally:
+                    self._condition.acquire()
+                if not woken:
+                    self._discard_space_waiter(priority, space)
+                    raise TimeoutError("Timed out waiting for queue space")
+            ticket = self._enqueue(tokens, priority, tenant, _Waiter())
+        if not ticket._waiter.event.wait(None if deadline is None else max(0.0, deadline - time.monotonic())):
+            if self._abandon(ticket):
+                raise TimeoutError("Timed out waiting for a model call slot")
+        return ticket
+
+    async def aacquire(self, tokens: int = 0, priority: str = None, tenant: str = None,
+                       block: bool = True) -> Ticket:
+        """Async counterpart of acquire(); cancelling the caller gives up its place in line."""
+        priority, tenant = self._resolve_request(priority, tenant)
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self._queued[priority] < self.max_queued:
+                    ticket = self._enqueue(tokens, priority, tenant, _Waiter(loop))
+                    break
+                if not block:
+                    self._counters[priority]["rejected"] += 1
+                    raise SchedulerFull(f"{priority} queue is full ({self.max_queued} waiting)")
+                space = _Waiter(loop)
+                self._space_waiters[priority].append(space)
+            try:
+                await space.future
+            except asyncio.CancelledError:
+                with self._condition:
+                    self._discard_space_waiter(priority, space)
+                raise
+        try:
+            await ticket._waiter.future
+        except asyncio.CancelledError:
+            if not self._abandon(ticket):
+                # Granted just as the caller gave up: hand the slot straight back.
+                self.release(ticket)
+            raise
+        return ticket
+
+    def _discard_space_waiter(self, priority: str, space: _Waiter) -> None:
+        try:
+            self._space_waiters[priority].remove(space)
+        except ValueError:
+            # Already woken: pass the wake-up on so the freed space is not lost.
+            self._wake_space_waiter(priority)
+
+    def _wake_space_waiter(self, priority: str) -> None:
+        if self._space_waiters[priority]:
+            self._space_waiters[priority].popleft().wake()
+
+    def _abandon(self, ticket: Ticket) -> bool:
+        """Withdraws a ticket whose caller gave up; False if it was granted in the meantime."""
+        with self._condition:
+            if ticket.state != "queued":
+                return False
+            tenants = self._queues[ticket.priority]
+            tickets = tenants[ticket.tenant]
+            tickets.remove(ticket)
+            if not tickets:
+                del tenants[ticket.tenant]
+            self._queued[ticket.priority] -= 1
+            self._counters[ticket.priority]["cancelled"] += 1
+            ticket.state = "released"
+            self._wake_space_waiter(ticket.priority)
+            self._condition.notify_all()
+            return True
+
+    def release(self, ticket: Ticket, extra_tokens: int = 0) -> None:
+        """
+        Frees the ticket's slot. `extra_tokens` (e.g. the response size) is charged to the
+        tokens-per-minute bucket on top of the estimate paid up front.
+        """
+        with self._condition:
+            if ticket.state != "granted":
+                return
+            ticket.state = "released"
+            self._in_flight -= 1
+            if extra_tokens and self._token_bucket is not None:
+                self._token_bucket.take(extra_tokens, time.monotonic())
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int = 0, priority: str = None, tenant: str = None):
+        """`with scheduler.slot(tokens):` holds a ticket for the duration of the block."""
+        ticket = self.acquire(tokens, priority, tenant)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 0, priority: str = None, tenant: str = None):
+        """Async counterpart of slot()."""
+        ticket = await self.aacquire(tokens, priority, tenant)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    # --- Dispatching ---
+
+    def _next_priority(self):
+        interactive_waiting = self._queued[INTERACTIVE] > 0
+        batch_waiting = self._queued[BATCH] > 0
+        if interactive_waiting and (not batch_waiting or self._interactive_streak < self.interactive_burst):
+            return INTERACTIVE
+        return BATCH if batch_waiting else None
+
+    def _dispatch_ready(self):
+        """Grants every ticket that may run now; returns seconds until a rate limit frees up, or None."""
+        while self._in_flight < self.max_concurrency:
+            priority = self._next_priority()
+            if priority is None:
+                return None
+            tenants = self._queues[priority]
+            tenant, tickets = next(iter(tenants.items()))
+            ticket = tickets[0]
+            now = time.monotonic()
+            delay = 0.0
+            if self._request_bucket is not None:
+                delay = self._request_bucket.delay(1, now)
+            if self._token_bucket is not None:
+                delay = max(delay, self._token_bucket.delay(ticket.tokens, now))
+            if delay > 0:
+                return delay
+
+            tickets.popleft()
+            # Round robin: the tenant just served goes to the back of the line.
+            if tickets:
+                tenants.move_to_end(tenant)
+            else:
+                del tenants[tenant]
+            self._queued[priority] -= 1
+            if priority == INTERACTIVE and self._queued[BATCH]:
+                self._interactive_streak += 1
+            else:
+                self._interactive_streak = 0
+            if self._request_bucket is not None:
+                self._request_bucket.take(1, now)
+            if self._token_bucket is not None:
+                self._token_bucket.take(ticket.tokens, now)
+            self._in_flight += 1
+            ticket.state = "granted"
+            ticket.wait = now - ticket.enqueued
+            self._wait_histograms[priority].record(ticket.wait)
+            self._counters[priority]["dispatched"] += 1
+            self._tenant_dispatched[tenant] = self._tenant_dispatched.get(tenant, 0) + 1
+            ticket._waiter.wake()
+            self._wake_space_waiter(priority)
+        return None
+
+    def _run(self) -> None:
+        with self._condition:
+            while not self._closed:
+                self._condition.wait(self._dispatch_ready())
+
+    def close(self) -> None:
+        """Stops the dispatcher thread; calls still queued are never granted."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    # --- Metrics ---
+
+    def metrics(self) -> dict:
+        """Queue depths, in-flight calls, counters and queue-wait percentiles per priority class."""
+        with self._condition:
+            return {
+                "in_flight": self._in_flight,
+                "queue_depth": dict(self._queued),
+                "tenants_waiting": {priority: len(tenants) for priority, tenants in self._queues.items()},
+                "counters": {priority: dict(counters) for priority, counters in self._counters.items()},
+                "wait_seconds": {priority: histogram.summary() for priority, histogram in self._wait_histograms.items()},
+                "dispatched_by_tenant": dict(self._tenant_dispatched),
+            }
+
+class SchedulingBackend(llm_backend.ModelBackend):
+    """Wraps a backend so every call first waits for a ticket from `scheduler`."""
+
+    def __init__(self, backend: llm_backend.ModelBackend, scheduler: Scheduler = None):
+        self.backend = backend
+        self.scheduler = scheduler or Scheduler()
+        self.name = backend.name
+
+    def generate(self, prompt: str) -> str:
+        ticket = self.scheduler.acquire(estimate_tokens(prompt))
+        tracing.current_span().set("queue_wait", ticket.wait)
+        response = ""
+        try:
+            response = self.backend.generate(prompt)
+        finally:
+            self.scheduler.release(ticket, estimate_tokens(response))
+        return response
+
+    async def agenerate(self, prompt: str) -> str:
+        ticket = await self.scheduler.aacquire(estimate_tokens(prompt))
+        tracing.current_span().set("queue_wait", ticket.wait)
+        response = ""
+        try:
+            response = await self.backend.agenerate(prompt)
+        finally:
+            self.scheduler.release(ticket, estimate_tokens(response))
+        return response
+
+    def stream(self, prompt: str):
+        ticket = self.scheduler.acquire(estimate_tokens(prompt))
+        streamed = 0
+        try:
+            for chunk in self.backend.stream(prompt):
+                streamed += len(chunk)
+                yield chunk
+        finally:
+            self.scheduler.release(ticket, streamed // llm_backend.CHARS_PER_TOKEN)
+
+    async def astream(self, prompt: str):
+        ticket = await self.scheduler.aacquire(estimate_tokens(prompt))
+        streamed = 0
+        try:
+            async for chunk in self.backend.astream(prompt):
+                streamed += len(chunk)
+                yield chunk
+        finally:
+            self.scheduler.release(ticket, streamed // llm_backend.CHARS_PER_TOKEN)
+
+    def discard(self, prompt: str) -> None:
+        self.backend.discard(prompt)
+
+def install(scheduler: Scheduler = None) -> Scheduler:
+    """Puts `scheduler` (a new default one if None) in front of the default backend."""
+    backend = SchedulingBackend(llm_backend.get_default_backend(), scheduler)
+    llm_backend.set_default_backend(backend)
+    return backend.scheduler
+
+if __name__ == '__main__':
+    from task_manager_ai import breakdown_feature_into_tasks_async
+
+    async def demo():
+        scheduler = Scheduler(max_concurrency=2)
+        backend = SchedulingBackend(llm_backend.StubModel(latency=0.02), scheduler)
+
+        async def call(feature: str, priority: str, tenant: str):
+            with request_context(priority, tenant):
+                return await breakdown_feature_into_tasks_async(feature, backend)
+
+        # A bulk job of 60 batch calls from one tenant and 20 from another are already queued
+        # when 5 interactive requests arrive.
+        bulk = [asyncio.ensure_future(call(f"Bulk idea {i}", BATCH, "bulk-importer")) for i in range(60)]
+        bulk += [asyncio.ensure_future(call(f"Nightly idea {i}", BATCH, "nightly-report")) for i in range(20)]
+        await asyncio.sleep(0.05)
+        interactive = [asyncio.ensure_future(call(f"User idea {i}", INTERACTIVE, f"user-{i}")) for i in range(5)]
+        await asyncio.gather(*bulk, *interactive)
+
+        metrics = scheduler.metrics()
+        for priority, stats in metrics["wait_seconds"].items():
+            print(f"{priority:12s} calls={stats['count']:3d} wait p50={stats['p50'] * 1000:7.1f}ms "
+                  f"max={stats['max'] * 1000:7.1f}ms")
+        print(f"Dispatched by tenant: {metrics['dispatched_by_tenant']}")
+
+        limited = Scheduler(max_concurrency=8, requests_per_minute=600)
+        limited_backend = SchedulingBackend(llm_backend.StubModel(), limited)
+        started = time.perf_counter()
+        await asyncio.gather(*(limited_backend.agenerate(f"Prompt {i}") for i in range(620)))
+        print(f"620 calls at 600 requests/minute (a minute's burst, then 10/s) took "
+              f"{time.perf_counter() - started:.1f}s")
+
+    asyncio.run(demo())
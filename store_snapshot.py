@@ -0,0 +1,235 @@
+# store_snapshot.py
+
+import mmap
+import os
+import struct
+import sys
+import zlib
+
+import demo_models
+from demo_models import ChatStore, SlideStore, TaskStore
+
+# Binary snapshots of the demo_models chat, task and slide stores.
+# Warming a worker by replaying add_chat_message() and friends costs a Python call per record.
+# A snapshot instead writes each store's columns out as they sit in memory, and restoring
+# reads them back as whole buffers.
+#
+# Layout (integers little-endian; column data in the writer's byte order, see flags):
+#   header     <8s magic "DMSTORE\0"><u16 version><u16 flags><u32 section count>
+#   directory  per section: <4s tag "CHAT"/"TASK"/"SLID"><u64 offset><u64 length>
+#   sections   per column: <1s kind><7 pad><u64 length><payload, zero-padded to 8 bytes>
+#              kind "T" is a string table (<u32 count>, then <u32 length><utf-8> per string),
+#              used for repeated senders and statuses; "s" is a UTF-8 string buffer, addressed
+#              by the "Q" offsets column after it; other kinds are array typecodes.
+#   trailer    <u32 CRC-32 of every preceding byte>
+# With lazy=True the file is mmap'd and the columns are memoryviews into it. Only the string
+# tables are decoded up front, records are decoded when they are read, and a task store's
+# query indexes are rebuilt on the first query. A restored store copies its columns into
+# growable buffers on its first write.
+
+MAGIC = b"DMSTORE\0"
+VERSION = 1
+_HEADER = struct.Struct("<8sHHI")
+_SECTION = struct.Struct("<4sQQ")
+_COLUMN = struct.Struct("<c7xQ")
+_LENGTH = struct.Struct("<I")
+_TRAILER = struct.Struct("<I")
+_BIG_ENDIAN = 0x1
+
+_SECTIONS = ((b"CHAT", ChatStore), (b"TASK", TaskStore), (b"SLID", SlideStore))
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot this version can read, or it is corrupt."""
+
+class Snapshot:
+    """The stores loaded from one snapshot file."""
+
+    def __init__(self, path: str, version: int, chat: ChatStore, tasks: TaskStore, slides: SlideStore):
+        self.path = path
+        self.version = version
+        self.chat = chat
+        self.tasks = tasks
+        self.slides = slides
+
+    def __repr__(self):
+        return (f"Snapshot({self.path!r}, version={self.version}, messages={len(self.chat)}, "
+                f"tasks={len(self.tasks)}, slides={len(self.slides)})")
+
+# --- Writing ---
+
+def _padding(length: int) -> int:
+    return -length % 8
+
+def _encode_strings(values: list[str]) -> bytes:
+    parts = [_LENGTH.pack(len(values))]
+    for value in values:
+        encoded = value.encode("utf-8")
+        parts.append(_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+def _encode_section(store) -> list:
+    """The section's byte chunks; column buffers are referenced, not copied."""
+    chunks = []
+    for kind, column in zip(store._SNAPSHOT_LAYOUT, store._snapshot_columns()):
+        payload = _encode_strings(column) if kind == "T" else memoryview(column).cast("B")
+        chunks.append(_COLUMN.pack(kind.encode("ascii"), len(payload)))
+        chunks.append(payload)
+        chunks.append(bytes(_padding(len(payload))))
+    return chunks
+
+def _as_chat_store(store) -> ChatStore:
+    # Other chat backends (e.g. chat_log_store.ChatLogStore) are copied into a column store first.
+    if isinstance(store, ChatStore):
+        return store
+    copy = ChatStore()
+    for index in range(len(store)):
+        message = store.record(index)
+        copy.append(message.sender, message.text, message.timestamp)
+    return copy
+
+def save_snapshot(path: str, chat=None, tasks: TaskStore = None, slides: SlideStore = None) -> int:
+    """
+    Writes the chat, task and slide stores (demo_models' active ones by default) to `path`
+    and returns the file size. The file is replaced atomically.
+    """
+    stores = (_as_chat_store(demo_models.get_chat_store() if chat is None else chat),
+              demo_models.get_task_store() if tasks is None else tasks,
+              demo_models.get_slide_store() if slides is None else slides)
+    sections = [(tag, _encode_section(store)) for (tag, _), store in zip(_SECTIONS, stores)]
+    flags = _BIG_ENDIAN if sys.byteorder == "big" else 0
+    head = [_HEADER.pack(MAGIC, VERSION, flags, len(sections))]
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    for tag, chunks in sections:
+        length = sum(len(chunk) for chunk in chunks)
+        head.append(_SECTION.pack(tag, offset, length))
+        offset += length
+
+    temporary = f"{path}.tmp"
+    checksum = 0
+    with open(temporary, "wb") as snapshot_file:
+        for chunk in head + [chunk for _, chunks in sections for chunk in chunks]:
+            checksum = zlib.crc32(chunk, checksum)
+            snapshot_file.write(chunk)
+        snapshot_file.write(_TRAILER.pack(checksum))
+    os.replace(temporary, path)
+    return offset + _TRAILER.size
+
+# --- Reading ---
+
+def _decode_strings(payload: memoryview) -> list[str]:
+    (count,) = _LENGTH.unpack_from(payload)
+    position = _LENGTH.size
+    values = []
+    for _ in range(count):
+        (length,) = _LENGTH.unpack_from(payload, position)
+        position += _LENGTH.size
+        values.append(str(payload[position:position + length], "utf-8"))
+        position += length
+    return values
+
+def _decode_section(data: memoryview, layout: tuple, lazy: bool) -> list:
+    columns = []
+    position = 0
+    for expected in layout:
+        if position + _COLUMN.size > len(data):
+            raise SnapshotError("Snapshot section is truncated")
+        kind, length = _COLUMN.unpack_from(data, position)
+        kind = kind.decode("ascii", "replace")
+        if kind != expected:
+            raise SnapshotError(f"Unexpected column kind {kind!r} (expected {expected!r})")
+        position += _COLUMN.size
+        payload = data[position:position + length]
+        if len(payload) != length:
+            raise SnapshotError("Snapshot section is truncated")
+        position += length + _padding(length)
+        if kind == "T":
+            columns.append(_decode_strings(payload))
+        elif kind == "s":
+            columns.append(payload if lazy else bytearray(payload))
+        else:
+            columns.append(payload.cast(kind) if lazy else demo_models._owned_array(kind, payload))
+    return columns
+
+def load_snapshot(path: str, lazy: bool = True, verify: bool = True) -> Snapshot:
+    """
+    Loads the stores in a snapshot without installing them. With `lazy`, the file is mmap'd
+    and records are decoded on access; otherwise it is read into owned buffers. `verify`
+    checks the trailing CRC-32, which reads the whole file once; pass False to skip it.
+    """
+    with open(path, "rb") as snapshot_file:
+        if lazy and os.fstat(snapshot_file.fileno()).st_size:
+            buffer = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = snapshot_file.read()
+    data = memoryview(buffer)
+    if len(data) < _HEADER.size + _TRAILER.size:
+        raise SnapshotError(f"{path} is too short to be a snapshot")
+    magic, version, flags, section_count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a snapshot")
+    if version > VERSION:
+        raise SnapshotError(f"Snapshot version {version} is newer than this reader (version {VERSION})")
+    if bool(flags & _BIG_ENDIAN) != (sys.byteorder == "big"):
+        raise SnapshotError("Snapshot was written on a machine with a different byte order")
+    if verify and zlib.crc32(data[:-_TRAILER.size]) != _TRAILER.unpack_from(data, len(data) - _TRAILER.size)[0]:
+        raise SnapshotError(f"Checksum mismatch in {path}")
+
+    directory = {}
+    for number in range(section_count):
+        tag, offset, length = _SECTION.unpack_from(data, _HEADER.size + number * _SECTION.size)
+        directory[tag] = data[offset:offset + length]
+    # Sections a snapshot lacks load as empty stores; unknown sections are skipped.
+    stores = [store_class._from_snapshot(_decode_section(directory[tag], store_class._SNAPSHOT_LAYOUT, lazy), lazy)
+              if tag in directory else store_class()
+              for tag, store_class in _SECTIONS]
+    return Snapshot(path, version, *stores)
+
+def restore_snapshot(path: str, lazy: bool = True, verify: bool = True) -> Snapshot:
+    """Loads a snapshot and makes its stores demo_models' active chat, task and slide stores."""
+    snapshot = load_snapshot(path, lazy, verify)
+    demo_models.set_chat_store(snapshot.chat)
+    demo_models.set_task_store(snapshot.tasks)
+    demo_models.set_slide_store(snapshot.slides)
+    return snapshot
+
+if __name__ == '__main__':
+    import tempfile
+    import time
+
+    senders = ("Alice", "Bob", "Charlie")
+    for i in range(1_000_000):
+        demo_models.add_chat_message(senders[i % 3], f"Message number {i}", 1_700_000_000.0 + i)
+    for i in range(100_000):
+        demo_models.create_project_task(f"Task {i}", [f"Sub-task {i}.a", f"Sub-task {i}.b"])
+    demo_models.create_task_tree(demo_models.TaskNode("Feature", [demo_models.TaskNode("Design"),
+                                                                  demo_models.TaskNode("Build")]))
+    demo_models.update_task_status(5, "Done")
+    demo_models.add_presentation_slide("Introduction", ["Point A", "Point B"])
+
+    path = os.path.join(tempfile.mkdtemp(), "stores.snapshot")
+    started = time.perf_counter()
+    size = save_snapshot(path)
+    print(f"Saved {size / 1e6:.1f} MB in {time.perf_counter() - started:.3f}s")
+
+    started = time.perf_counter()
+    replay = ChatStore()
+    for message in demo_models.get_chat_history():
+        replay.append(message.sender, message.text, message.timestamp)
+    print(f"Replaying {len(replay)} messages: {time.perf_counter() - started:.3f}s")
+
+    expected = (list(demo_models.get_chat_history(offset=500_000, limit=2)),
+                list(demo_models.query_tasks(status="Done")), demo_models.get_task_tree(100_000),
+                list(demo_models.get_presentation_slides()))
+    for lazy in (True, False):
+        started = time.perf_counter()
+        snapshot = restore_snapshot(path, lazy=lazy)
+        loaded = time.perf_counter() - started
+        restored = (list(demo_models.get_chat_history(offset=500_000, limit=2)),
+                    list(demo_models.query_tasks(status="Done")), demo_models.get_task_tree(100_000),
+                    list(demo_models.get_presentation_slides()))
+        print(f"Restored {snapshot} ({'mmap' if lazy else 'read'}) in {loaded:.3f}s; matches: {restored == expected}")
+
+    demo_models.add_chat_message("Dana", "Written after restoring")
+    print(f"After a write: {demo_models.get_chat_message_count()} messages, "
+          f"last {list(demo_models.get_chat_history(limit=1, reverse=True))}")
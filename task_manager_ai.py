@@ -1,86 +1,206 @@
 # task_manager_ai.py
 
-import re
+import asyncio
+
+import batching
+import list_parser
+import llm_backend
+import prompt_builder
 
 # Aware of demo_models.ProjectTask, e.g., ProjectTask(task_name: str, sub_tasks: list[str], status: str)
 # Aware of comms_hub_ai.py for how feature ideas might be generated.
 
-def breakdown_feature_into_tasks(feature_idea: str) -> list[str]:
+# Simulated Gemini response for feature breakdown, served by llm_backend.StubModel.
+# This is a hardcoded example based on `sample_feature_idea` in `if __name__ == '__main__'`
+# If feature_idea is "AI-powered In-Chat Meeting Scheduler & Summarizer"
+SIMULATED_GEMINI_RESPONSE_FEATURE = """
+    Okay, here are the high-level tasks for "AI-powered In-Chat Meeting Scheduler & Summarizer":
+    1. Design and integrate natural language processing (NLP) for understanding scheduling requests and chat content.
+    2. Develop calendar integration module for checking availability and booking meetings.
+    3. Implement AI model for chat summarization to identify key discussion points and action items.
+    4. Create user interface elements for initiating scheduling, viewing summaries, and managing settings.
+    5. Build backend infrastructure to support asynchronous processing of summarization and scheduling tasks.
     """
-    Simulates using Gemini to break down a feature idea into high-level tasks.
+
+# Simulated Gemini response for sub-tasks. This is a hardcoded example. Let's assume high_level_task is
+# "Implement AI model for chat summarization to identify key discussion points and action items."
+SIMULATED_GEMINI_RESPONSE_SUBTASKS = """
+    Understood. Here are some sub-tasks for "Implement AI model for chat summarization to identify key discussion points and action items":
+    - Research and select appropriate pre-trained summarization models (e.g., T5, BART).
+    - Fine-tune selected model on a dataset of representative chat conversations.
+    - Develop an API endpoint for the summarization service.
+    - Integrate the summarization API with the main application chat interface.
     """
 
-    # 1. Prompt Engineering for breaking down a feature
-    prompt_to_gemini_for_feature = f"""
+FEATURE_PROMPT_MARKER = "High-level tasks:"
+SUBTASK_PROMPT_MARKER = "Sub-tasks:"
+llm_backend.register_simulated_response(FEATURE_PROMPT_MARKER, SIMULATED_GEMINI_RESPONSE_FEATURE)
+llm_backend.register_simulated_response(SUBTASK_PROMPT_MARKER, SIMULATED_GEMINI_RESPONSE_SUBTASKS)
+
+FEATURE_BREAKDOWN_TEMPLATE = prompt_builder.PromptTemplate(f"""
     Analyze the following product feature idea and generate a list of 3-5 distinct,
     high-level project tasks required to implement it.
     Present these tasks as a clearly formatted numbered list, each task on a new line.
 
-    Feature Idea: "{feature_idea}"
+    Feature Idea: "{{feature_idea}}"
 
-    High-level tasks:
-    """
+    {FEATURE_PROMPT_MARKER}
+    """)
 
-    # 2. Simulate Gemini's Response for feature breakdown
-    # This is a hardcoded example based on `sample_feature_idea` in `if __name__ == '__main__'`
-    # If feature_idea is "AI-powered In-Chat Meeting Scheduler & Summarizer"
-    simulated_gemini_response_feature = """
-    Okay, here are the high-level tasks for "AI-powered In-Chat Meeting Scheduler & Summarizer":
-    1. Design and integrate natural language processing (NLP) for understanding scheduling requests and chat content.
-    2. Develop calendar integration module for checking availability and booking meetings.
-    3. Implement AI model for chat summarization to identify key discussion points and action items.
-    4. Create user interface elements for initiating scheduling, viewing summaries, and managing settings.
-    5. Build backend infrastructure to support asynchronous processing of summarization and scheduling tasks.
+def build_feature_breakdown_prompt(feature_idea: str, token_budget: int = None) -> str:
+    """Builds the prompt for breaking a feature idea down into high-level tasks."""
+    return prompt_builder.render_within_budget(FEATURE_BREAKDOWN_TEMPLATE, token_budget, feature_idea=feature_idea)
+
+def parse_feature_tasks(response: str) -> list[str]:
+    """Extracts the numbered high-level tasks from a Gemini response."""
+    return list_parser.parse_list(response, list_parser.NUMBERED)
+
+SUB_TASK_TEMPLATE = prompt_builder.PromptTemplate(f"""
+    Given the following high-level project task, break it down into 2-4 specific sub-tasks.
+    Present these sub-tasks as a clearly formatted bulleted or dashed list, each on a new line.
+
+    High-Level Task: "{{high_level_task}}"
+
+    {SUBTASK_PROMPT_MARKER}
+    """)
+
+def build_sub_task_prompt(high_level_task: str, token_budget: int = None) -> str:
+    """Builds the prompt for suggesting sub-tasks for a high-level task."""
+    return prompt_builder.render_within_budget(SUB_TASK_TEMPLATE, token_budget, high_level_task=high_level_task)
+
+def parse_sub_tasks(response: str) -> list[str]:
+    """Extracts the bulleted sub-tasks ("- ", "* " or "\u2022 ") from a Gemini response."""
+    return list_parser.parse_list(response, list_parser.BULLETED)
+
+def breakdown_feature_into_tasks(feature_idea: str, backend: llm_backend.ModelBackend = None) -> list[str]:
     """
-    # In a real scenario: actual_response = call_gemini_api(prompt_to_gemini_for_feature)
-    # For now, use the simulated response.
-
-    # 3. Parsing the simulated response for feature tasks
-    tasks = []
-    # Regex to find lines starting with a number, a period, and a space
-    matches = re.findall(r"^\s*\d+\.\s+(.+)", simulated_gemini_response_feature, re.MULTILINE)
-    if matches:
-        for match in matches:
-            tasks.append(match.strip())
-    return tasks
-
-def suggest_sub_tasks_for_task(high_level_task: str) -> list[str]:
+    Uses Gemini (the stub model by default) to break down a feature idea into high-level tasks.
     """
-    (Optional Stretch Goal) Simulates using Gemini to suggest sub-tasks for a high-level task.
+    return llm_backend.run_stage("task_manager.breakdown_feature", build_feature_breakdown_prompt,
+                                 (feature_idea,), parse_feature_tasks, backend)
+
+async def breakdown_feature_into_tasks_async(feature_idea: str, backend: llm_backend.ModelBackend = None) -> list[str]:
+    """Async counterpart of breakdown_feature_into_tasks()."""
+    return await llm_backend.arun_stage("task_manager.breakdown_feature", build_feature_breakdown_prompt,
+                                        (feature_idea,), parse_feature_tasks, backend)
+
+def suggest_sub_tasks_for_task(high_level_task: str, backend: llm_backend.ModelBackend = None) -> list[str]:
     """
+    (Optional Stretch Goal) Uses Gemini (the stub model by default) to suggest sub-tasks for a high-level task.
+    """
+    return llm_backend.run_stage("task_manager.suggest_sub_tasks", build_sub_task_prompt,
+                                 (high_level_task,), parse_sub_tasks, backend)
 
-    # 1. Prompt Engineering for suggesting sub-tasks
-    prompt_to_gemini_for_subtasks = f"""
-    Given the following high-level project task, break it down into 2-4 specific sub-tasks.
-    Present these sub-tasks as a clearly formatted bulleted or dashed list, each on a new line.
+async def suggest_sub_tasks_for_task_async(high_level_task: str, backend: llm_backend.ModelBackend = None) -> list[str]:
+    """Async counterpart of suggest_sub_tasks_for_task()."""
+    return await llm_backend.arun_stage("task_manager.suggest_sub_tasks", build_sub_task_prompt,
+                                        (high_level_task,), parse_sub_tasks, backend)
+
+# --- Batched variants: many features or tasks per model call (see batching.py) ---
 
-    High-Level Task: "{high_level_task}"
+BATCH_FEATURE_PROMPT_MARKER = "High-level tasks for each feature idea:"
+BATCH_SUBTASK_PROMPT_MARKER = "Sub-tasks for each task:"
+llm_backend.register_simulated_response(BATCH_FEATURE_PROMPT_MARKER,
+                                        batching.simulated_batch_response(SIMULATED_GEMINI_RESPONSE_FEATURE))
+llm_backend.register_simulated_response(BATCH_SUBTASK_PROMPT_MARKER,
+                                        batching.simulated_batch_response(SIMULATED_GEMINI_RESPONSE_SUBTASKS))
+
+BATCH_FEATURE_BREAKDOWN_TEMPLATE = prompt_builder.PromptTemplate(f"""
+    For each product feature idea below, generate a list of 3-5 distinct,
+    high-level project tasks required to implement it.
+    Answer every feature idea in order. Start each answer with the feature idea's header line
+    exactly as given (such as "[[ITEM 1]]"), followed by its tasks as a clearly formatted
+    numbered list, each task on a new line.
 
-    Sub-tasks:
+    {{items}}
+
+    {BATCH_FEATURE_PROMPT_MARKER}
+    """)
+
+BATCH_SUB_TASK_TEMPLATE = prompt_builder.PromptTemplate(f"""
+    For each high-level project task below, break it down into 2-4 specific sub-tasks.
+    Answer every task in order. Start each answer with the task's header line exactly as
+    given (such as "[[ITEM 1]]"), followed by its sub-tasks as a clearly formatted bulleted
+    or dashed list, each on a new line.
+
+    {{items}}
+
+    {BATCH_SUBTASK_PROMPT_MARKER}
+    """)
+
+def breakdown_features_into_tasks(feature_ideas: list[str], backend: llm_backend.ModelBackend = None,
+                                  token_budget: int = None, max_items: int = batching.DEFAULT_MAX_ITEMS) -> list[list[str]]:
+    """
+    Batched breakdown_feature_into_tasks(): returns the high-level tasks for every feature
+    idea, in order, using as few model calls as fit in `token_budget`.
     """
+    return batching.run_batched("task_manager.breakdown_feature", feature_ideas, BATCH_FEATURE_BREAKDOWN_TEMPLATE,
+                                parse_feature_tasks, breakdown_feature_into_tasks, backend, token_budget, max_items)
 
-    # 2. Simulate Gemini's Response for sub-tasks
-    # This is a hardcoded example. Let's assume high_level_task is
-    # "Implement AI model for chat summarization to identify key discussion points and action items."
-    simulated_gemini_response_subtasks = """
-    Understood. Here are some sub-tasks for "Implement AI model for chat summarization to identify key discussion points and action items":
-    - Research and select appropriate pre-trained summarization models (e.g., T5, BART).
-    - Fine-tune selected model on a dataset of representative chat conversations.
-    - Develop an API endpoint for the summarization service.
-    - Integrate the summarization API with the main application chat interface.
+async def breakdown_features_into_tasks_async(feature_ideas: list[str], backend: llm_backend.ModelBackend = None,
+                                              token_budget: int = None,
+                                              max_items: int = batching.DEFAULT_MAX_ITEMS) -> list[list[str]]:
+    """Async counterpart of breakdown_features_into_tasks()."""
+    return await batching.arun_batched("task_manager.breakdown_feature", feature_ideas, BATCH_FEATURE_BREAKDOWN_TEMPLATE,
+                                       parse_feature_tasks, breakdown_feature_into_tasks_async, backend,
+                                       token_budget, max_items)
+
+def suggest_sub_tasks_for_tasks(high_level_tasks: list[str], backend: llm_backend.ModelBackend = None,
+                                token_budget: int = None, max_items: int = batching.DEFAULT_MAX_ITEMS) -> list[list[str]]:
+    """
+    Batched suggest_sub_tasks_for_task(): returns the sub-tasks for every high-level task,
+    in order, using as few model calls as fit in `token_budget`.
+    """
+    return batching.run_batched("task_manager.suggest_sub_tasks", high_level_tasks, BATCH_SUB_TASK_TEMPLATE,
+                                parse_sub_tasks, suggest_sub_tasks_for_task, backend, token_budget, max_items)
+
+async def suggest_sub_tasks_for_tasks_async(high_level_tasks: list[str], backend: llm_backend.ModelBackend = None,
+                                            token_budget: int = None,
+                                            max_items: int = batching.DEFAULT_MAX_ITEMS) -> list[list[str]]:
+    """Async counterpart of suggest_sub_tasks_for_tasks()."""
+    return await batching.arun_batched("task_manager.suggest_sub_tasks", high_level_tasks, BATCH_SUB_TASK_TEMPLATE,
+                                       parse_sub_tasks, suggest_sub_tasks_for_task_async, backend,
+                                       token_budget, max_items)
+
+def breakdown_feature_into_tasks_stream(feature_idea: str, backend: llm_backend.ModelBackend = None):
+    """Yields each high-level task as soon as the model has finished generating its line."""
+    chunks = llm_backend.stream(build_feature_breakdown_prompt(feature_idea), backend)
+    yield from list_parser.iter_list_items(chunks, list_parser.NUMBERED)
+
+def breakdown_feature_into_tasks_astream(feature_idea: str, backend: llm_backend.ModelBackend = None):
+    """Async counterpart of breakdown_feature_into_tasks_stream(); returns an async iterator."""
+    chunks = llm_backend.astream(build_feature_breakdown_prompt(feature_idea), backend)
+    return list_parser.aiter_list_items(chunks, list_parser.NUMBERED)
+
+def suggest_sub_tasks_for_task_stream(high_level_task: str, backend: llm_backend.ModelBackend = None):
+    """Yields each sub-task as soon as the model has finished generating its line."""
+    chunks = llm_backend.stream(build_sub_task_prompt(high_level_task), backend)
+    yield from list_parser.iter_list_items(chunks, list_parser.BULLETED)
+
+def suggest_sub_tasks_for_task_astream(high_level_task: str, backend: llm_backend.ModelBackend = None):
+    """Async counterpart of suggest_sub_tasks_for_task_stream(); returns an async iterator."""
+    chunks = llm_backend.astream(build_sub_task_prompt(high_level_task), backend)
+    return list_parser.aiter_list_items(chunks, list_parser.BULLETED)
+
+async def plan_feature_async(feature_idea: str, backend: llm_backend.ModelBackend = None) -> dict[str, list[str]]:
+    """
+    Breaks a feature into high-level tasks and suggests sub-tasks for each one.
+    Sub-task suggestion for a task starts as soon as that task's line has streamed in,
+    while the model is still generating the remaining tasks.
+    Returns {high_level_task: sub_tasks} in task order; a task listed twice is planned once.
     """
-    # In a real scenario: actual_response = call_gemini_api(prompt_to_gemini_for_subtasks)
-    # For now, use the simulated response.
-
-    # 3. Parsing the simulated response for sub-tasks
-    sub_tasks = []
-    # Regex to find lines starting with a dash or bullet (optional space)
-    # It will capture the text after "- " or "* "
-    matches = re.findall(r"^\s*[-\*\u2022]\s+(.+)", simulated_gemini_response_subtasks, re.MULTILINE)
-    if matches:
-        for match in matches:
-            sub_tasks.append(match.strip())
-    return sub_tasks
+    pending = {}
+    try:
+        async for task in breakdown_feature_into_tasks_astream(feature_idea, backend):
+            if task not in pending:
+                pending[task] = asyncio.ensure_future(suggest_sub_tasks_for_task_async(task, backend))
+        results = await asyncio.gather(*pending.values())
+    finally:
+        # After a failure, the suggestions still running are stopped and their errors retrieved.
+        for future in pending.values():
+            future.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
+    return dict(zip(pending, results))
 
 if __name__ == '__main__':
     sample_feature_idea = "AI-powered In-Chat Meeting Scheduler & Summarizer"
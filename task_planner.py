@@ -0,0 +1,126 @@
+# task_planner.py
+
+import asyncio
+
+import idea_dedup
+import llm_backend
+from demo_models import TaskNode
+from task_manager_ai import breakdown_feature_into_tasks_async, suggest_sub_tasks_for_task_async
+
+# Recursive task-tree expansion.
+# A feature is broken into high-level tasks, and each task is asked for its sub-tasks,
+# down to `depth` levels with at most `width` children per node. Siblings expand in
+# parallel, with at most `concurrency` model calls in flight. Subtrees are memoized by
+# normalized task text and remaining depth, so a task that turns up under several
+# parents (e.g. "Develop an API endpoint") is expanded once. An expansion that is still
+# running is shared too. The result is a demo_models.TaskNode tree, which
+# demo_models.create_task_tree() stores in the task store.
+
+class TaskPlanner:
+    """
+    Expands features into task trees. The subtree memo lives as long as the planner, so
+    expanding several related features with one planner reuses work across them.
+    """
+
+    def __init__(self, backend: llm_backend.ModelBackend = None, depth: int = 3, width: int = 5,
+                 concurrency: int = 8):
+        if depth < 1:
+            raise ValueError("depth must be at least 1")
+        self.backend = backend
+        self.depth = depth
+        self.width = width
+        self.concurrency = concurrency
+        self.model_calls = 0
+        self.memo_hits = 0
+        self._memo = {}      # (normalized task, remaining depth) -> finished TaskNode
+        self._running = {}   # (normalized task, remaining depth) -> asyncio.Task of an expansion in progress
+        self._semaphore = None
+
+    async def _call(self, function, text: str) -> list[str]:
+        async with self._semaphore:
+            self.model_calls += 1
+            results = await function(text, self.backend)
+        return results[:self.width]
+
+    async def _expand(self, task: str, remaining: int) -> TaskNode:
+        """The subtree below `task`, `remaining` levels deep (0 means a leaf)."""
+        if remaining == 0:
+            return TaskNode(task)
+        key = (idea_dedup.normalize(task), remaining)
+        node = self._memo.get(key)
+        running = self._running.get(key)
+        if node is not None or running is not None:
+            self.memo_hits += 1
+        if node is None:
+            if running is None:
+                running = self._running[key] = asyncio.ensure_future(self._expand_children(task, remaining))
+                running.add_done_callback(lambda _: self._running.pop(key, None))
+            node = await asyncio.shield(running)
+            self._memo[key] = node
+        # Repeats share the memoized children but keep their own spelling.
+        return node if node.task_name == task else TaskNode(task, node.children)
+
+    async def _expand_children(self, task: str, remaining: int) -> TaskNode:
+        sub_tasks = await self._call(suggest_sub_tasks_for_task_async, task)
+        children = await asyncio.gather(*(self._expand(sub_task, remaining - 1) for sub_task in sub_tasks))
+        return TaskNode(task, list(children))
+
+    async def expand_async(self, feature_idea: str) -> TaskNode:
+        """A tree rooted at `feature_idea` whose children are its high-level tasks."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = await self._call(breakdown_feature_into_tasks_async, feature_idea)
+        children = await asyncio.gather(*(self._expand(task, self.depth - 1) for task in tasks))
+        return TaskNode(feature_idea, list(children))
+
+    def expand(self, feature_idea: str) -> TaskNode:
+        """Blocking counterpart of expand_async(); must not be called from a running event loop."""
+        # The semaphore belongs to one event loop; finished subtrees carry over.
+        self._semaphore = None
+        return asyncio.run(self.expand_async(feature_idea))
+
+async def expand_feature_async(feature_idea: str, depth: int = 3, width: int = 5,
+                               backend: llm_backend.ModelBackend = None, concurrency: int = 8) -> TaskNode:
+    """Expands one feature into a task tree `depth` levels deep (high-level tasks are level 1)."""
+    return await TaskPlanner(backend, depth, width, concurrency).expand_async(feature_idea)
+
+def expand_feature(feature_idea: str, depth: int = 3, width: int = 5,
+                   backend: llm_backend.ModelBackend = None, concurrency: int = 8) -> TaskNode:
+    return TaskPlanner(backend, depth, width, concurrency).expand(feature_idea)
+
+def count_nodes(node: TaskNode) -> int:
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+if __name__ == '__main__':
+    import time
+
+    import demo_models
+
+    feature = "AI-powered In-Chat Meeting Scheduler & Summarizer"
+    stub = llm_backend.StubModel(latency=0.02)
+
+    planner = TaskPlanner(stub, depth=3, width=5)
+    started = time.perf_counter()
+    tree = planner.expand(feature)
+    elapsed = time.perf_counter() - started
+    print(f"{count_nodes(tree)} tasks from {planner.model_calls} model calls "
+          f"({planner.memo_hits} memoized subtrees) in {elapsed:.2f}s")
+
+    def show(node, indent=0):
+        print(f"{'  ' * indent}- {node.task_name}")
+        for child in node.children[:2]:
+            show(child, indent + 1)
+        if len(node.children) > 2:
+            print(f"{'  ' * (indent + 1)}... {len(node.children) - 2} more")
+
+    show(tree)
+
+    root = demo_models.create_task_tree(tree)
+    print(f"Stored {len(demo_models._project_tasks)} tasks; root {root.task_id} has sub-tasks {root.sub_tasks[:2]}...")
+    print(f"Round trip matches: {demo_models.get_task_tree(root.task_id) == tree}")
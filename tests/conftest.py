@@ -0,0 +1,24 @@
+# tests/conftest.py
+
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import demo_models  # noqa: E402
+
+@pytest.fixture(autouse=True)
+def fresh_stores():
+    """Gives every test empty demo_models stores and puts the originals back afterwards."""
+    stores = (demo_models.get_chat_store(), demo_models.get_task_store(), demo_models.get_slide_store())
+    demo_models.set_chat_store(demo_models.ChatStore())
+    demo_models.set_task_store(demo_models.TaskStore())
+    demo_models.set_slide_store(demo_models.SlideStore())
+    yield
+    chat, tasks, slides = stores
+    demo_models.set_chat_store(chat)
+    demo_models.set_task_store(tasks)
+    demo_models.set_slide_store(slides)
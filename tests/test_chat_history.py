@@ -0,0 +1,81 @@
+# tests/test_chat_history.py
+
+import pytest
+
+import demo_models
+import llm_backend
+from chat_history import BoundedChatStore
+from chat_ingest import ingest_chat_buffer
+from comms_hub_ai import IncrementalFeatureExtractor
+
+class RecordingModel(llm_backend.StubModel):
+    """StubModel that keeps every prompt it was sent."""
+
+    def __init__(self):
+        super().__init__()
+        self.prompts = []
+
+    def generate(self, prompt: str) -> str:
+        self.prompts.append(prompt)
+        return super().generate(prompt)
+
+def add_messages(start: int, stop: int) -> None:
+    for i in range(start, stop):
+        demo_models.add_chat_message("Alice", f"message {i} asks for calendar sync", float(i))
+
+def test_bounded_store_keeps_recent_messages_and_absolute_indexes():
+    store = BoundedChatStore(capacity=8, compact_every=4)
+    positions = [store.append("Alice", f"message {i}") for i in range(11)]
+    assert positions == [0, 1, 2, 3, 4, 5, 6, 7, 4, 5, 6]
+    assert len(store) == 7
+    assert store.first_index == store.evicted == 4
+    assert [message.text for message in store.view()] == [f"message {i}" for i in range(4, 11)]
+
+def test_bounded_store_validates_arguments():
+    with pytest.raises(ValueError):
+        BoundedChatStore(capacity=0)
+    with pytest.raises(ValueError):
+        BoundedChatStore(capacity=4, compact_every=5)
+
+def test_incremental_extractor_follows_a_compacting_store():
+    demo_models.set_chat_store(BoundedChatStore(capacity=8, compact_every=4))
+    model = RecordingModel()
+    extractor = IncrementalFeatureExtractor(backend=model, overlap_lines=0)
+    add_messages(0, 8)
+    extractor.update()
+    assert extractor.checkpoint.offset == 8
+
+    # The next append compacts the store, which shifts positions but not absolute indexes.
+    add_messages(8, 11)
+    model.prompts.clear()
+    extractor.update()
+    assert extractor.checkpoint.offset == 11
+    prompt = "".join(model.prompts)
+    assert all(f"message {i} " in prompt for i in range(8, 11))
+    assert "message 7 " not in prompt
+
+    model.prompts.clear()
+    extractor.update()
+    assert model.prompts == []
+
+def test_overlap_lines_are_sent_as_context_only():
+    model = RecordingModel()
+    extractor = IncrementalFeatureExtractor(backend=model, overlap_lines=2)
+    add_messages(0, 4)
+    extractor.update()
+    add_messages(4, 6)
+    model.prompts.clear()
+    extractor.update()
+    (prompt,) = model.prompts
+    context, _, new = prompt.partition("New Chat Log:")
+    assert "context only" in context
+    assert "message 2 " in context and "message 3 " in context
+    assert "message 2 " not in new and "message 3 " not in new
+    assert "message 4 " in new and "message 5 " in new
+
+def test_bulk_ingestion_into_a_compacting_store_reports_absolute_indexes():
+    demo_models.set_chat_store(BoundedChatStore(capacity=8, compact_every=4))
+    add_messages(0, 6)
+    stats = ingest_chat_buffer(b"Bob: one\nBob: two\nBob: three\n")
+    assert stats.messages_by("Bob") == [6, 7, 8]
+    assert demo_models.get_chat_first_index() + demo_models.get_chat_message_count() == 9
@@ -0,0 +1,71 @@
+# tests/test_chat_ingest.py
+
+import pytest
+
+import demo_models
+from chat_ingest import IngestStats, ingest_chat_buffer, ingest_chat_file
+
+SAMPLE = b"""
+preamble without a sender
+Alice: Hey team, I'm finding it hard to keep track of action items.
+Bob: Messages get buried.
+Charlie: Or categorize them by project? @Alice what do you think?
+  Alice:   Here is what I had in mind:
+    - tags per project
+
+    - a filter at https://example.com/filters
+Bob:\tA calendar integration, the standup is at 10:30 anyway. Mail bob@example.com
+Dana:
+  a message that starts on the next line
+"""
+
+def history():
+    return [(message.sender, message.text) for message in demo_models.get_chat_history()]
+
+def test_headers_and_continuations():
+    stats = ingest_chat_buffer(SAMPLE, timestamp=1.0)
+    assert history() == [
+        ("Alice", "Hey team, I'm finding it hard to keep track of action items."),
+        ("Bob", "Messages get buried."),
+        ("Charlie", "Or categorize them by project? @Alice what do you think?"),
+        ("Alice", "Here is what I had in mind:\n- tags per project\n- a filter at https://example.com/filters"),
+        ("Bob", "A calendar integration, the standup is at 10:30 anyway. Mail bob@example.com"),
+        ("Dana", "a message that starts on the next line"),
+    ]
+    assert stats.messages == 6
+    assert stats.messages_by("Bob") == [1, 4]
+    assert stats.speaker("Alice").messages == 2
+
+def test_mentions_skip_email_addresses():
+    stats = ingest_chat_buffer(SAMPLE)
+    assert stats.mentions_of("@alice") == [2]
+    assert stats.mentions_of("example.com") == []
+
+def test_crlf_and_long_sender_lines():
+    long_prefix = b"x" * 49
+    ingest_chat_buffer(b"Alice: one\r\n" + long_prefix + b": still Alice\r\nBob: two\r\n")
+    assert history() == [("Alice", "one\n" + long_prefix.decode() + ": still Alice"), ("Bob", "two")]
+
+@pytest.mark.parametrize("batch_bytes", [1, 7, 64, 1 << 20])
+def test_batches_cut_at_message_boundaries(batch_bytes):
+    whole = IngestStats()
+    ingest_chat_buffer(SAMPLE, whole)
+    expected = history()
+    demo_models.get_chat_store().clear()
+    stats = ingest_chat_buffer(SAMPLE, batch_bytes=batch_bytes)
+    assert history() == expected
+    assert stats.messages_by("Alice") == whole.messages_by("Alice")
+
+def test_invalid_utf8_is_replaced_on_read():
+    ingest_chat_buffer(b"Alice: caf\xe9\n")
+    assert history() == [("Alice", "caf�")]
+
+def test_file_ingestion(tmp_path):
+    path = tmp_path / "export.txt"
+    path.write_bytes(SAMPLE)
+    stats = ingest_chat_file(str(path))
+    assert stats.messages == 6
+    assert stats.bytes == len(SAMPLE)
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    assert ingest_chat_file(str(empty)).messages == 0
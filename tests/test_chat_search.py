@@ -0,0 +1,62 @@
+# tests/test_chat_search.py
+
+import pytest
+
+import demo_models
+from chat_search import ChatSearchIndex
+
+MESSAGES = [
+    ("Alice", "The calendar integration keeps failing"),
+    ("Bob", "Calendar sync is slow, and the calendar view is cluttered"),
+    ("Charlie", "Can we tag messages by project?"),
+    ("Alice", "Integration with the calendar would help"),
+    ("Dana", "Tag messages so the integration of calendar items is easier"),
+]
+
+@pytest.fixture
+def index():
+    for number, (sender, text) in enumerate(MESSAGES):
+        demo_models.add_chat_message(sender, text, 100.0 + number)
+    index = ChatSearchIndex().attach()
+    yield index
+    index.detach()
+
+def hits(index, query, **filters):
+    return [hit.message_index for hit in index.search(query, **filters)]
+
+def test_bm25_ranks_by_term_frequency(index):
+    assert hits(index, "calendar")[0] == 1
+    assert set(hits(index, "calendar")) == {0, 1, 3, 4}
+    assert hits(index, "nothing matches") == []
+
+def test_phrases_must_match_verbatim(index):
+    assert hits(index, '"calendar integration"') == [0]
+    assert hits(index, '"tag messages"') in ([2, 4], [4, 2])
+
+def test_filters(index):
+    assert sorted(hits(index, "calendar", senders=["Alice"])) == [0, 3]
+    assert sorted(hits(index, "calendar", since=101.0, until=104.0)) == [1, 3]
+
+def test_new_messages_are_indexed_as_they_are_added(index):
+    demo_models.add_chat_message("Eve", "Dark mode for the calendar please", 200.0)
+    assert 5 in hits(index, "dark mode")
+    assert len(index) == 6
+
+def test_index_resyncs_after_the_store_is_cleared(index):
+    demo_models.get_chat_store().clear()
+    demo_models.add_chat_message("Eve", "Only message about exports", 1.0)
+    assert hits(index, "calendar") == []
+    assert hits(index, "exports") == [0]
+
+def test_long_posting_lists_use_skips_correctly():
+    for number in range(1_000):
+        text = "rare phrase here" if number % 97 == 0 else f"filler text number {number}"
+        demo_models.add_chat_message("Bot", text, float(number))
+    index = ChatSearchIndex().attach()
+    try:
+        expected = [number for number in range(1_000) if number % 97 == 0]
+        assert sorted(hits(index, '"rare phrase"', limit=100)) == expected
+        assert sorted(hits(index, '"text number"', since=990.0, limit=100)) == [
+            number for number in range(990, 1_000) if number % 97]
+    finally:
+        index.detach()
@@ -0,0 +1,45 @@
+# tests/test_idea_dedup.py
+
+from idea_dedup import DedupIndex, dedupe
+
+IDEAS = [
+    "Message tagging or categorization system.",
+    "Enhanced notification preferences for different chat types.",
+    "message tagging or categorization system",
+    "Message tagging / categorization system",
+    "Calendar integration for scheduling discussed events.",
+    "Enhanced notification preferences for different chat types",
+]
+
+def test_dedupe_keeps_first_seen_order():
+    assert dedupe(IDEAS) == [
+        "Message tagging or categorization system.",
+        "Enhanced notification preferences for different chat types.",
+        "Calendar integration for scheduling discussed events.",
+    ]
+
+def test_groups_count_every_spelling():
+    index = DedupIndex()
+    for idea in IDEAS:
+        index.add(idea)
+    index.add("Calendar integration for scheduling discussed events.", count=3)
+    groups = {representative: (total, len(members)) for representative, total, members in index.groups()}
+    assert groups["Calendar integration for scheduling discussed events."] == (4, 1)
+    assert groups["Message tagging or categorization system."] == (3, 2)  # two spellings normalize alike
+
+def test_cluster_of_does_not_change_the_index():
+    index = DedupIndex()
+    first = index.add(IDEAS[0])
+    assert index.cluster_of("Message tagging / categorization system") == first
+    assert index.cluster_of("Dark mode for the mobile app") is None
+    assert len(index) == 1
+
+def test_full_buckets_still_take_new_clusters():
+    index = DedupIndex()
+    # Many spellings of one idea fill its buckets; a different idea sharing some bands must
+    # still become findable.
+    for number in range(300):
+        index.add(f"Message tagging or categorization system variant {number}")
+    other = index.add("Message tagging or categorization dashboard for admins")
+    assert index.cluster_of("Message tagging or categorization dashboard for admins") == other
+    assert index.bucket_skips > 0
@@ -0,0 +1,45 @@
+# tests/test_list_parser.py
+
+import asyncio
+
+import pytest
+
+from list_parser import ANY, BULLETED, NUMBERED, ListParser, aiter_list_items, iter_list_items, parse_list
+
+RESPONSE = "Here you go:\n1. First item\n2. Second (Tasks: a, b)\n- a bullet\n  3.   Third  \n4.\n5. "
+
+def test_parse_list_styles():
+    assert parse_list(RESPONSE) == ["First item", "Second (Tasks: a, b)", "Third"]
+    assert parse_list(RESPONSE, BULLETED) == ["a bullet"]
+    assert parse_list(RESPONSE, ANY) == ["First item", "Second (Tasks: a, b)", "a bullet", "Third"]
+
+def test_parse_list_clean():
+    assert parse_list("1. **Bold** item", clean=lambda text: text.replace("*", "")) == ["Bold item"]
+
+def test_unknown_style():
+    with pytest.raises(ValueError):
+        parse_list("1. x", "roman")
+    with pytest.raises(ValueError):
+        ListParser("roman")
+
+@pytest.mark.parametrize("size", [1, 2, 5, 16, len(RESPONSE)])
+def test_incremental_parse_matches_one_pass(size):
+    chunks = [RESPONSE[start:start + size] for start in range(0, len(RESPONSE), size)]
+    assert list(iter_list_items(chunks)) == parse_list(RESPONSE)
+
+def test_items_are_returned_once_their_line_is_complete():
+    parser = ListParser(NUMBERED)
+    assert parser.feed("1. Fir") == []
+    assert parser.feed("st\n2. Sec") == ["First"]
+    assert parser.close() == ["Sec"]
+    assert parser.close() == []
+
+def test_async_items():
+    async def chunks():
+        for chunk in ("- one\n- t", "wo\n", "- three"):
+            yield chunk
+
+    async def collect():
+        return [item async for item in aiter_list_items(chunks(), BULLETED)]
+
+    assert asyncio.run(collect()) == ["one", "two", "three"]
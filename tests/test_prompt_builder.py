@@ -0,0 +1,29 @@
+# tests/test_prompt_builder.py
+
+from prompt_builder import PromptTemplate, Section, estimate_tokens, fit_section, render_within_budget
+
+def test_section_that_fits_is_rendered_whole():
+    section = Section(["Alice: hi", "Bob: hello"], original="Alice: hi\nBob: hello")
+    assert fit_section(section, 100) == "Alice: hi\nBob: hello"
+
+def test_distinct_item_after_many_duplicates_is_kept():
+    # A long run of duplicates must not stop the walk before later distinct items.
+    items = ["Alice: standup at ten"] * 300 + ["Bob: the export button is broken on mobile"]
+    fitted = fit_section(Section(items, prefer="first"), 900)
+    assert "Alice: standup at ten" in fitted
+    assert "Bob: the export button is broken on mobile" in fitted
+
+def test_recent_items_are_preferred_within_budget():
+    items = [f"Message {i} about topic{i} and subject{i}" for i in range(200)]
+    fitted = fit_section(Section(items), 100)
+    assert estimate_tokens(fitted) <= 100
+    assert items[-1] in fitted
+    assert items[0] not in fitted
+
+def test_render_within_budget():
+    template = PromptTemplate("Chat:\n{chat_log}\nIdeas:")
+    lines = [f"User{i}: idea number {i} for feature{i}" for i in range(500)]
+    prompt = render_within_budget(template, 200, chat_log=Section(lines))
+    assert prompt.startswith("Chat:\n") and prompt.endswith("Ideas:")
+    assert estimate_tokens(prompt) <= 200
+    assert lines[-1] in prompt
@@ -0,0 +1,72 @@
+# tests/test_scheduler.py
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from scheduler import BATCH, INTERACTIVE, Scheduler, SchedulerFull
+
+@pytest.fixture
+def scheduler():
+    scheduler = Scheduler(max_concurrency=2, max_queued=4)
+    yield scheduler
+    scheduler.close()
+
+def test_concurrency_is_bounded(scheduler):
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def call():
+        nonlocal running, peak
+        with scheduler.slot():
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+    assert scheduler.metrics()["counters"][INTERACTIVE]["dispatched"] == 8
+
+def test_full_queue_rejects_without_blocking(scheduler):
+    held = [scheduler.acquire(priority=BATCH) for _ in range(2)]
+    queued = [threading.Thread(target=lambda: scheduler.release(scheduler.acquire(priority=BATCH)))
+              for _ in range(4)]
+    for thread in queued:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while scheduler.metrics()["queue_depth"][BATCH] < 4 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    with pytest.raises(SchedulerFull):
+        scheduler.acquire(priority=BATCH, block=False)
+    for ticket in held:
+        scheduler.release(ticket)
+    for thread in queued:
+        thread.join()
+    assert scheduler.metrics()["counters"][BATCH]["rejected"] == 1
+
+def test_cancelled_async_waiter_gives_up_its_place(scheduler):
+    async def run():
+        held = [await scheduler.aacquire() for _ in range(2)]
+        waiter = asyncio.ensure_future(scheduler.aacquire())
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        for ticket in held:
+            scheduler.release(ticket)
+        async with scheduler.aslot():
+            return scheduler.metrics()
+
+    metrics = asyncio.run(run())
+    assert metrics["counters"][INTERACTIVE]["cancelled"] == 1
+    assert metrics["in_flight"] == 1
@@ -0,0 +1,56 @@
+# tests/test_store_snapshot.py
+
+import pytest
+
+import demo_models
+from store_snapshot import SnapshotError, load_snapshot, restore_snapshot, save_snapshot
+
+@pytest.fixture
+def populated():
+    for i in range(50):
+        demo_models.add_chat_message(("Alice", "Bob", "Zoë")[i % 3], f"Message {i} ✓", 1_700_000_000.0 + i)
+    for i in range(20):
+        demo_models.create_project_task(f"Task {i}", [f"Sub-task {i}.a", f"Sub-task {i}.b"])
+    demo_models.create_task_tree(demo_models.TaskNode("Feature", [demo_models.TaskNode("Design"),
+                                                                  demo_models.TaskNode("Build")]))
+    demo_models.update_task_status(5, "Done")
+    demo_models.add_presentation_slide("Introduction", ["Point A", "Point B"])
+
+def state():
+    return (list(demo_models.get_chat_history()), list(demo_models.get_project_tasks()),
+            list(demo_models.get_presentation_slides()),
+            [task.task_id for task in demo_models.query_tasks(status="Done")],
+            [task.task_name for task in demo_models.find_parent_tasks("Sub-task 3.a")])
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_round_trip(tmp_path, populated, lazy):
+    expected = state()
+    path = str(tmp_path / "stores.snapshot")
+    save_snapshot(path)
+    snapshot = restore_snapshot(path, lazy=lazy)
+    assert len(snapshot.chat) == 50
+    assert state() == expected
+    assert demo_models.get_task_tree(20) == demo_models.TaskNode("Feature", [demo_models.TaskNode("Design"),
+                                                                             demo_models.TaskNode("Build")])
+
+def test_restored_stores_accept_writes(tmp_path, populated):
+    path = str(tmp_path / "stores.snapshot")
+    save_snapshot(path)
+    restore_snapshot(path)
+    demo_models.add_chat_message("Dana", "Written after restoring", 1.0)
+    task = demo_models.create_project_task("New task")
+    assert demo_models.get_chat_history(limit=1, reverse=True)[0].text == "Written after restoring"
+    assert demo_models.get_chat_message_count() == 51
+    assert demo_models.query_tasks(name="new task") == [task]
+
+def test_corrupt_snapshot_is_rejected(tmp_path, populated):
+    path = tmp_path / "stores.snapshot"
+    save_snapshot(str(path))
+    data = bytearray(path.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+    path.write_bytes(b"not a snapshot")
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
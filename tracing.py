@@ -0,0 +1,270 @@
+# tracing.py
+
+import contextvars
+import json
+import os
+import threading
+import time
+
+# Lightweight span tracing for the AI pipeline.
+# Spans nest through a context variable, so they follow both threads and asyncio tasks.
+# Finished spans go to the registered exporters: JsonFileExporter writes OpenTelemetry-style
+# JSON lines, and HistogramRegistry aggregates durations (and size/token attributes) in
+# memory. With no exporter registered, span() returns a shared no-op object and nothing
+# is allocated or timed, so instrumentation can stay in hot paths.
+
+_exporters: list = []
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def is_enabled() -> bool:
+    return bool(_exporters)
+
+def enable(*exporters) -> None:
+    """Starts tracing to the given exporters (in addition to any already registered)."""
+    _exporters.extend(exporters)
+
+def disable() -> None:
+    """Stops tracing and flushes/closes file exporters."""
+    for exporter in _exporters:
+        close = getattr(exporter, "close", None)
+        if close is not None:
+            close()
+    _exporters.clear()
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, key: str, value) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class Span:
+    # start_ns/end_ns come from the monotonic perf_counter_ns(), so durations are not skewed
+    # by wall-clock adjustments; start_unix_ns is the one wall-clock reading, for export.
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "start_unix_ns",
+                 "attributes", "error", "_token")
+
+    def __init__(self, name: str, attributes: dict):
+        parent = _current_span.get()
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        if parent is None:
+            self.trace_id = os.urandom(16).hex()
+            self.parent_id = None
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.start_unix_ns = 0
+        self.error = None
+        self._token = None
+
+    def set(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        self.start_unix_ns = time.time_ns()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.end_ns = time.perf_counter_ns()
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.error = repr(exc)
+        for exporter in _exporters:
+            exporter.export(self)
+        return False
+
+def span(name: str, **attributes):
+    """Context manager timing a block as a span; a shared no-op when tracing is disabled."""
+    if not _exporters:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+def current_span():
+    """The innermost active span (or a no-op), for adding attributes from nested code."""
+    active = _current_span.get()
+    return active if active is not None else _NOOP_SPAN
+
+# --- Exporters ---
+
+def _otel_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class JsonFileExporter:
+    """Appends one OpenTelemetry (OTLP/JSON span shape) object per line to `path`."""
+
+    def __init__(self, path: str, service_name: str = "agent-computer-ai"):
+        self.path = path
+        self.service_name = service_name
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, finished: Span) -> None:
+        record = {
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "traceId": finished.trace_id,
+            "spanId": finished.span_id,
+            "parentSpanId": finished.parent_id or "",
+            "name": finished.name,
+            "startTimeUnixNano": str(finished.start_unix_ns),
+            "endTimeUnixNano": str(finished.start_unix_ns + finished.end_ns - finished.start_ns),
+            "attributes": [{"key": key, "value": _otel_value(value)} for key, value in finished.attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR", "message": finished.error} if finished.error else {"code": "STATUS_CODE_OK"},
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+class Histogram:
+    """Fixed exponential buckets (factor 2 from 10us); percentiles are bucket upper bounds."""
+
+    BOUNDS = tuple(1e-5 * 2 ** i for i in range(25))  # 10us .. ~168s
+
+    __slots__ = ("count", "total", "minimum", "maximum", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+
+    def record(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        low, high = 0, len(self.BOUNDS)
+        while low < high:
+            middle = (low + high) // 2
+            if value <= self.BOUNDS[middle]:
+                high = middle
+            else:
+                low = middle + 1
+        self.buckets[low] += 1
+
+    def percentile(self, fraction: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(self.BOUNDS[index], self.maximum) if index < len(self.BOUNDS) else self.maximum
+        return self.maximum
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.minimum if self.count else 0.0,
+            "max": self.maximum,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+        }
+
+class HistogramRegistry:
+    """
+    In-process metrics: a duration histogram per span name, a histogram per numeric
+    attribute (e.g. "model_call:prompt_tokens"), and counters for string attributes
+    (e.g. "model_call:cache=hit").
+    """
+
+    def __init__(self):
+        self.histograms: dict[str, Histogram] = {}
+        self.counters: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, key: str) -> Histogram:
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram()
+        return histogram
+
+    def export(self, finished: Span) -> None:
+        with self._lock:
+            self._histogram(finished.name).record(finished.duration)
+            for key, value in finished.attributes.items():
+                if isinstance(value, bool) or isinstance(value, str):
+                    counter = f"{finished.name}:{key}={value}"
+                    self.counters[counter] = self.counters.get(counter, 0) + 1
+                elif isinstance(value, (int, float)):
+                    self._histogram(f"{finished.name}:{key}").record(value)
+            if finished.error:
+                counter = f"{finished.name}:error"
+                self.counters[counter] = self.counters.get(counter, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": {key: histogram.summary() for key, histogram in sorted(self.histograms.items())},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+if __name__ == '__main__':
+    import asyncio
+    import tempfile
+
+    # Import by name so this script and llm_backend share one copy of the module state.
+    import llm_backend
+    import tracing
+    from pipeline import plan_feature
+    from response_cache import CachingBackend
+
+    registry = tracing.HistogramRegistry()
+    trace_path = os.path.join(tempfile.mkdtemp(), "spans.jsonl")
+    tracing.enable(registry, tracing.JsonFileExporter(trace_path))
+
+    backend = CachingBackend(llm_backend.StubModel(latency=0.01))
+    for _ in range(3):
+        asyncio.run(plan_feature(chat_log="Alice: can we tag messages?", backend=backend))
+    tracing.disable()
+
+    snapshot = registry.snapshot()
+    for name, stats in snapshot["histograms"].items():
+        if ":" not in name:
+            print(f"{name:50s} n={stats['count']:3d} p50={stats['p50'] * 1000:7.2f}ms max={stats['max'] * 1000:7.2f}ms")
+    for name, count in snapshot["counters"].items():
+        print(f"{name:50s} {count}")
+    with open(trace_path) as trace_file:
+        print(f"{sum(1 for _ in trace_file)} spans written to {trace_path}")
+
+    iterations = 200_000
+    stub = llm_backend.StubModel()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        len(stub.generate(str("x")))
+    direct = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(iterations):
+        llm_backend.run_stage("disabled", str, ("x",), len, stub)
+    staged = time.perf_counter() - started
+    print(f"Tracing disabled: run_stage adds {(staged - direct) / iterations * 1e9:.0f}ns per call")